@@ -1,12 +1,13 @@
 import asyncio
 from decimal import Decimal
-from bot.database import async_session, init_db
+from bot.database import async_session
+from bot.migrations import migrate
 from bot.models import Product, ProductPrice, ProductKey, User, UserStatus
 from sqlalchemy import select
 
 async def add_test_data():
     print("🚀 Initializing database...")
-    await init_db()
+    await migrate()
     
     async with async_session() as session:
         result = await session.execute(select(Product))
@@ -34,42 +35,42 @@ async def add_test_data():
         
         print("💰 Adding product prices...")
         prices = [
-            ProductPrice(product_id=products[0].id, duration="1 Day", price=Decimal("0.25")),
-            ProductPrice(product_id=products[0].id, duration="3 Days", price=Decimal("0.50")),
-            ProductPrice(product_id=products[0].id, duration="7 Days", price=Decimal("1.00")),
-            ProductPrice(product_id=products[0].id, duration="1 Month", price=Decimal("3.50")),
-            ProductPrice(product_id=products[0].id, duration="3 Months", price=Decimal("9.99")),
-            ProductPrice(product_id=products[1].id, duration="1 Day", price=Decimal("0.75")),
-            ProductPrice(product_id=products[1].id, duration="3 Days", price=Decimal("1.50")),
-            ProductPrice(product_id=products[1].id, duration="7 Days", price=Decimal("3.00")),
-            ProductPrice(product_id=products[1].id, duration="1 Month", price=Decimal("10.00")),
-            ProductPrice(product_id=products[1].id, duration="3 Months", price=Decimal("25.50")),
-            ProductPrice(product_id=products[2].id, duration="1 Day", price=Decimal("0.35")),
-            ProductPrice(product_id=products[2].id, duration="3 Days", price=Decimal("0.85")),
-            ProductPrice(product_id=products[2].id, duration="7 Days", price=Decimal("1.75")),
-            ProductPrice(product_id=products[2].id, duration="1 Month", price=Decimal("5.00")),
-            ProductPrice(product_id=products[2].id, duration="3 Months", price=Decimal("14.99")),
+            ProductPrice(product_id=products[0].id, duration="1 Day", duration_days=1, price=Decimal("0.25")),
+            ProductPrice(product_id=products[0].id, duration="3 Days", duration_days=3, price=Decimal("0.50")),
+            ProductPrice(product_id=products[0].id, duration="7 Days", duration_days=7, price=Decimal("1.00")),
+            ProductPrice(product_id=products[0].id, duration="1 Month", duration_days=30, price=Decimal("3.50")),
+            ProductPrice(product_id=products[0].id, duration="3 Months", duration_days=90, price=Decimal("9.99")),
+            ProductPrice(product_id=products[1].id, duration="1 Day", duration_days=1, price=Decimal("0.75")),
+            ProductPrice(product_id=products[1].id, duration="3 Days", duration_days=3, price=Decimal("1.50")),
+            ProductPrice(product_id=products[1].id, duration="7 Days", duration_days=7, price=Decimal("3.00")),
+            ProductPrice(product_id=products[1].id, duration="1 Month", duration_days=30, price=Decimal("10.00")),
+            ProductPrice(product_id=products[1].id, duration="3 Months", duration_days=90, price=Decimal("25.50")),
+            ProductPrice(product_id=products[2].id, duration="1 Day", duration_days=1, price=Decimal("0.35")),
+            ProductPrice(product_id=products[2].id, duration="3 Days", duration_days=3, price=Decimal("0.85")),
+            ProductPrice(product_id=products[2].id, duration="7 Days", duration_days=7, price=Decimal("1.75")),
+            ProductPrice(product_id=products[2].id, duration="1 Month", duration_days=30, price=Decimal("5.00")),
+            ProductPrice(product_id=products[2].id, duration="3 Months", duration_days=90, price=Decimal("14.99")),
         ]
         session.add_all(prices)
         await session.flush()
         
         print("🔑 Adding product keys...")
         keys = [
-            ProductKey(product_id=products[0].id, key_value="VPN-KEY-001-PREMIUM", duration="1 Day"),
-            ProductKey(product_id=products[0].id, key_value="VPN-KEY-002-PREMIUM", duration="1 Day"),
-            ProductKey(product_id=products[0].id, key_value="VPN-KEY-003-PREMIUM", duration="3 Days"),
-            ProductKey(product_id=products[0].id, key_value="VPN-KEY-004-PREMIUM", duration="3 Days"),
-            ProductKey(product_id=products[0].id, key_value="VPN-KEY-005-PREMIUM", duration="7 Days"),
-            ProductKey(product_id=products[1].id, key_value="STORAGE-001-CLOUD", duration="1 Day"),
-            ProductKey(product_id=products[1].id, key_value="STORAGE-002-CLOUD", duration="1 Day"),
-            ProductKey(product_id=products[1].id, key_value="STORAGE-003-CLOUD", duration="3 Days"),
-            ProductKey(product_id=products[1].id, key_value="STORAGE-004-CLOUD", duration="7 Days"),
-            ProductKey(product_id=products[1].id, key_value="STORAGE-005-CLOUD", duration="7 Days"),
-            ProductKey(product_id=products[2].id, key_value="EMAIL-PROTECT-001", duration="1 Day"),
-            ProductKey(product_id=products[2].id, key_value="EMAIL-PROTECT-002", duration="1 Day"),
-            ProductKey(product_id=products[2].id, key_value="EMAIL-PROTECT-003", duration="3 Days"),
-            ProductKey(product_id=products[2].id, key_value="EMAIL-PROTECT-004", duration="7 Days"),
-            ProductKey(product_id=products[2].id, key_value="EMAIL-PROTECT-005", duration="7 Days"),
+            ProductKey(product_id=products[0].id, key_value="VPN-KEY-001-PREMIUM", duration="1 Day", duration_days=1),
+            ProductKey(product_id=products[0].id, key_value="VPN-KEY-002-PREMIUM", duration="1 Day", duration_days=1),
+            ProductKey(product_id=products[0].id, key_value="VPN-KEY-003-PREMIUM", duration="3 Days", duration_days=3),
+            ProductKey(product_id=products[0].id, key_value="VPN-KEY-004-PREMIUM", duration="3 Days", duration_days=3),
+            ProductKey(product_id=products[0].id, key_value="VPN-KEY-005-PREMIUM", duration="7 Days", duration_days=7),
+            ProductKey(product_id=products[1].id, key_value="STORAGE-001-CLOUD", duration="1 Day", duration_days=1),
+            ProductKey(product_id=products[1].id, key_value="STORAGE-002-CLOUD", duration="1 Day", duration_days=1),
+            ProductKey(product_id=products[1].id, key_value="STORAGE-003-CLOUD", duration="3 Days", duration_days=3),
+            ProductKey(product_id=products[1].id, key_value="STORAGE-004-CLOUD", duration="7 Days", duration_days=7),
+            ProductKey(product_id=products[1].id, key_value="STORAGE-005-CLOUD", duration="7 Days", duration_days=7),
+            ProductKey(product_id=products[2].id, key_value="EMAIL-PROTECT-001", duration="1 Day", duration_days=1),
+            ProductKey(product_id=products[2].id, key_value="EMAIL-PROTECT-002", duration="1 Day", duration_days=1),
+            ProductKey(product_id=products[2].id, key_value="EMAIL-PROTECT-003", duration="3 Days", duration_days=3),
+            ProductKey(product_id=products[2].id, key_value="EMAIL-PROTECT-004", duration="7 Days", duration_days=7),
+            ProductKey(product_id=products[2].id, key_value="EMAIL-PROTECT-005", duration="7 Days", duration_days=7),
         ]
         session.add_all(keys)
         await session.commit()
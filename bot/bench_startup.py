@@ -0,0 +1,107 @@
+"""
+Startup benchmark: how long a fresh process takes until it has handled its first update.
+
+Each run starts a new interpreter, runs the bot's real startup (migration check, Redis ping,
+getMe, ...) against the configured environment and feeds one synthetic update through the
+dispatcher. Nothing is sent to Telegram besides getMe, and the webhook is left alone.
+
+    python -m bot.bench_startup --runs 5
+    python -m bot.bench_startup --runs 5 --budget 3   # exit 1 if the median is over 3 seconds
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+
+MARKER = "BENCH "
+
+
+def _probe_update():
+    from aiogram.types import Chat, Message, Update, User
+    
+    # No router handles edited messages, so this goes through the middlewares and nothing else
+    user = User(id=1, is_bot=False, first_name="bench")
+    return Update(update_id=0, edited_message=Message(
+        message_id=1,
+        date=datetime.utcnow(),
+        chat=Chat(id=1, type="private"),
+        from_user=user,
+        text="bench"
+    ))
+
+
+async def _measure() -> Dict[str, float]:
+    from bot.main import create_bot, create_dispatcher
+    from bot.services.metrics import metrics
+    imported = time.time()
+    
+    bot = create_bot()
+    dp = create_dispatcher()
+    workflow = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+    try:
+        await dp.emit_startup(bot=bot, **workflow)
+        await dp.feed_update(bot, _probe_update())
+        first_update = time.time()
+    finally:
+        await dp.emit_shutdown(bot=bot, **workflow)
+        await bot.session.close()
+    
+    result = {"imported": imported, "first_update": first_update}
+    for name, timing in metrics.snapshot()["timings"].items():
+        if name.startswith("startup."):
+            result[name] = timing["max_ms"] / 1000
+    return result
+
+
+def _run_once() -> Dict[str, float]:
+    started = time.time()
+    process = subprocess.run(
+        [sys.executable, "-m", "bot.bench_startup", "--once"],
+        capture_output=True,
+        text=True
+    )
+    lines = [line for line in process.stdout.splitlines() if line.startswith(MARKER)]
+    if process.returncode != 0 or not lines:
+        sys.stderr.write(process.stdout[-2000:] + process.stderr[-2000:])
+        raise SystemExit(f"Benchmark run failed with exit code {process.returncode}")
+    
+    result = json.loads(lines[-1][len(MARKER):])
+    result["imports"] = result.pop("imported") - started
+    result["time_to_first_update"] = result.pop("first_update") - started
+    return result
+
+
+def _report(runs: List[Dict[str, float]]) -> float:
+    print(f"{'phase':<28}{'median':>10}{'min':>10}{'max':>10}")
+    for name in sorted({name for run in runs for name in run}):
+        values = [run[name] for run in runs if name in run]
+        print(f"{name:<28}{statistics.median(values):>9.3f}s{min(values):>9.3f}s{max(values):>9.3f}s")
+    return statistics.median(run["time_to_first_update"] for run in runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time from process start to the first handled update")
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes to start (default 3)")
+    parser.add_argument("--budget", type=float, help="fail when the median time to first update exceeds this many seconds")
+    parser.add_argument("--once", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.once:
+        print(MARKER + json.dumps(asyncio.run(_measure())), flush=True)
+        return
+    
+    runs = [_run_once() for _ in range(max(1, args.runs))]
+    median = _report(runs)
+    if args.budget is not None and median > args.budget:
+        print(f"❌ Median time to first update {median:.2f}s is over the {args.budget:.2f}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
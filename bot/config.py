@@ -9,6 +9,8 @@ load_dotenv()
 @dataclass
 class DatabaseConfig:
     url: str = os.getenv("DATABASE_URL", "")
+    # Apply pending migrations on startup; turn off when they run as a separate deploy step
+    auto_migrate: bool = os.getenv("AUTO_MIGRATE", "true").strip().lower() not in ("0", "false", "no")
     
     @property
     def async_url(self) -> str:
@@ -31,6 +33,14 @@ class DatabaseConfig:
 class RedisConfig:
     rest_url: str = os.getenv("UPSTASH_REDIS_REST_URL", "") or os.getenv("REDIS_REST_URL", "")
     rest_token: str = os.getenv("UPSTASH_REDIS_REST_TOKEN", "") or os.getenv("REDIS_REST_TOKEN", "")
+    url: str = os.getenv("REDIS_URL", "")
+
+
+@dataclass
+class FSMConfig:
+    storage: str = os.getenv("FSM_STORAGE", "memory").strip().lower()  # memory | redis | postgres
+    state_ttl: int = int(os.getenv("FSM_STATE_TTL") or "86400")
+    local_ttl: int = int(os.getenv("FSM_LOCAL_TTL") or "0")
 
 
 @dataclass
@@ -41,6 +51,35 @@ class BotConfig:
     root_admin_id: int = int(os.getenv("ROOT_ADMIN_ID") or "0")
     report_channel: str = os.getenv("REPORT_CHANNEL", "")
     maintenance_mode: bool = False
+    reservation_ttl: int = int(os.getenv("KEY_RESERVATION_TTL") or "300")
+    profile_flush_interval: float = float(os.getenv("PROFILE_FLUSH_INTERVAL") or "5")
+    stats_cache_ttl: int = int(os.getenv("STATS_CACHE_TTL") or "30")
+    key_archive_days: int = int(os.getenv("KEY_ARCHIVE_DAYS") or "30")
+    key_archive_interval: float = float(os.getenv("KEY_ARCHIVE_INTERVAL") or "3600")
+    cache_warm_users: int = int(os.getenv("CACHE_WARM_USERS") or "500")
+    max_in_flight_updates: int = int(
+        os.getenv("MAX_IN_FLIGHT_UPDATES") or os.getenv("WEBHOOK_CONCURRENCY") or "100"
+    )
+
+
+@dataclass
+class WebhookConfig:
+    enabled: bool = os.getenv("BOT_MODE", "polling").strip().lower() == "webhook"
+    base_url: str = os.getenv("WEBHOOK_URL", "").rstrip("/")
+    path: str = os.getenv("WEBHOOK_PATH", "/webhook")
+    secret: str = os.getenv("WEBHOOK_SECRET", "")
+    max_connections: int = int(os.getenv("WEBHOOK_MAX_CONNECTIONS") or "40")
+    
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}{self.path}"
+
+
+@dataclass
+class ShardingConfig:
+    workers: int = int(os.getenv("BOT_WORKERS") or "1")
+    base_port: int = int(os.getenv("WORKER_BASE_PORT") or "5101")
+    drain_timeout: int = int(os.getenv("SHUTDOWN_DRAIN_TIMEOUT") or "30")
 
 
 @dataclass
@@ -48,11 +87,17 @@ class Config:
     db: DatabaseConfig = None
     redis: RedisConfig = None
     bot: BotConfig = None
+    webhook: WebhookConfig = None
+    fsm: FSMConfig = None
+    sharding: ShardingConfig = None
     
     def __post_init__(self):
         self.db = DatabaseConfig()
         self.redis = RedisConfig()
         self.bot = BotConfig()
+        self.webhook = WebhookConfig()
+        self.fsm = FSMConfig()
+        self.sharding = ShardingConfig()
 
 
 config = Config()
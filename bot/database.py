@@ -1,9 +1,7 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.pool import NullPool
-from loguru import logger
 
 from .config import config
-from .models import Base
 
 
 engine = create_async_engine(
@@ -22,13 +20,6 @@ async_session = async_sessionmaker(
 )
 
 
-async def init_db():
-    logger.info("🗄️ Initializing database...")
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    logger.info("✅ Database initialized successfully")
-
-
 async def get_session() -> AsyncSession:
     async with async_session() as session:
         yield session
@@ -0,0 +1,230 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from loguru import logger
+
+from bot.config import config
+from bot.models import FSMRecord
+
+
+# (state, data) for one storage key
+Record = Tuple[Optional[str], Dict[str, Any]]
+
+# Failed flushes are retried with backoff between these bounds (seconds)
+FLUSH_RETRY_DELAY = 0.5
+FLUSH_RETRY_MAX_DELAY = 10
+# Seconds a state change waits for its flush; after that it stays pending and is retried
+FLUSH_WAIT = 5
+
+
+class PostgresFSMBackend:
+    """FSM records in the fsm_states table, expired lazily through expires_at"""
+    
+    PURGE_INTERVAL = 600
+    
+    def __init__(self, session_factory, ttl: int):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self._last_purge = 0.0
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, Record]:
+        stmt = select(FSMRecord.key, FSMRecord.state, FSMRecord.data).where(
+            FSMRecord.key.in_(keys),
+            FSMRecord.expires_at > datetime.utcnow()
+        )
+        async with self.session_factory() as session:
+            result = await session.execute(stmt)
+            rows = result.all()
+        return {row.key: (row.state, json.loads(row.data) if row.data else {}) for row in rows}
+    
+    async def set_many(self, records: Dict[str, Record]):
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        stmt = insert(FSMRecord).values([
+            {
+                "key": key,
+                "state": state,
+                "data": json.dumps(data) if data else None,
+                "expires_at": expires_at,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for key, (state, data) in records.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FSMRecord.key],
+            set_={
+                "state": stmt.excluded.state,
+                "data": stmt.excluded.data,
+                "expires_at": stmt.excluded.expires_at,
+                "updated_at": stmt.excluded.updated_at,
+            }
+        )
+        async with self.session_factory() as session:
+            await session.execute(stmt)
+            if time.monotonic() - self._last_purge > self.PURGE_INTERVAL:
+                self._last_purge = time.monotonic()
+                await session.execute(delete(FSMRecord).where(FSMRecord.expires_at <= now))
+            await session.commit()
+    
+    async def close(self):
+        pass
+
+
+class RedisFSMBackend:
+    """FSM records as JSON blobs in native Redis, expired by the server via EX"""
+    
+    def __init__(self, url: str, ttl: int):
+        from redis.asyncio import Redis
+        self.redis = Redis.from_url(url)
+        self.ttl = ttl
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, Record]:
+        values = await self.redis.mget(keys)
+        records = {}
+        for key, value in zip(keys, values):
+            if value:
+                payload = json.loads(value)
+                records[key] = (payload.get("state"), payload.get("data") or {})
+        return records
+    
+    async def set_many(self, records: Dict[str, Record]):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, (state, data) in records.items():
+                if state is None and not data:
+                    pipe.delete(key)
+                else:
+                    pipe.set(key, json.dumps({"state": state, "data": data}), ex=self.ttl)
+            await pipe.execute()
+    
+    async def close(self):
+        await self.redis.aclose()
+
+
+class TieredStorage(BaseStorage):
+    """
+    aiogram storage backed by Redis or Postgres with an in-process tier in front.
+    
+    Reads load state and data for a key in one round trip and are served locally for
+    `local_ttl` seconds afterwards (0 keeps nothing locally, which is safe when several
+    workers can see the same user). Writes made during one event-loop tick are coalesced
+    and flushed to the backend in a single batch; a batch the backend rejects stays
+    pending, is still served to readers, and is retried until it lands.
+    """
+    
+    def __init__(self, backend, local_ttl: int = 0):
+        self.backend = backend
+        self.local_ttl = local_ttl
+        self.key_builder = DefaultKeyBuilder(with_destiny=True)
+        self._local: Dict[str, Tuple[float, Record]] = {}
+        self._pending: Dict[str, Record] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_sweep = time.monotonic()
+    
+    async def _load(self, key: StorageKey) -> Tuple[str, Record]:
+        raw_key = self.key_builder.build(key)
+        
+        if raw_key in self._pending:
+            return raw_key, self._pending[raw_key]
+        
+        cached = self._local.get(raw_key)
+        if cached and time.monotonic() - cached[0] < self.local_ttl:
+            return raw_key, cached[1]
+        
+        records = await self.backend.get_many([raw_key])
+        record = records.get(raw_key, (None, {}))
+        self._remember(raw_key, record)
+        return raw_key, record
+    
+    def _remember(self, raw_key: str, record: Record):
+        if not self.local_ttl:
+            return
+        now = time.monotonic()
+        self._local[raw_key] = (now, record)
+        # Drop expired entries now and then, so users seen once don't stay in memory
+        if now - self._last_sweep > self.local_ttl:
+            self._last_sweep = now
+            self._local = {k: v for k, v in self._local.items() if now - v[0] < self.local_ttl}
+    
+    def _write(self, raw_key: str, record: Record):
+        self._remember(raw_key, record)
+        self._pending[raw_key] = record
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush())
+    
+    async def _flush(self):
+        await asyncio.sleep(0)
+        failures = 0
+        while self._pending:
+            batch, self._pending = self._pending, {}
+            try:
+                await self.backend.set_many(batch)
+                failures = 0
+            except Exception as e:
+                failures += 1
+                logger.error(f"FSM storage flush failed for {len(batch)} keys (attempt {failures}): {e}")
+                # Keys written again meanwhile already hold newer records
+                for raw_key, record in batch.items():
+                    self._pending.setdefault(raw_key, record)
+                await asyncio.sleep(min(FLUSH_RETRY_DELAY * 2 ** (failures - 1), FLUSH_RETRY_MAX_DELAY))
+    
+    async def flush(self, timeout: float = FLUSH_WAIT):
+        if self._flush_task is None or self._flush_task.done():
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._flush_task), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ FSM storage flush still pending for {len(self._pending)} keys, retrying in the background")
+    
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        raw_key, (_, data) = await self._load(key)
+        value = state.state if isinstance(state, State) else state
+        self._write(raw_key, (value, data))
+        await self.flush()
+    
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, (state, _) = await self._load(key)
+        return state
+    
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        raw_key, (state, _) = await self._load(key)
+        self._write(raw_key, (state, dict(data)))
+        await self.flush()
+    
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, (_, data) = await self._load(key)
+        return dict(data)
+    
+    async def close(self) -> None:
+        await self.flush()
+        if self._flush_task is not None and not self._flush_task.done():
+            logger.error(f"❌ FSM storage closed with {len(self._pending)} unsaved keys")
+            self._flush_task.cancel()
+        await self.backend.close()
+
+
+def create_fsm_storage() -> BaseStorage:
+    backend_name = config.fsm.storage
+    
+    if backend_name == "redis":
+        if not config.redis.url:
+            logger.warning("⚠️ FSM_STORAGE=redis but REDIS_URL is not set, falling back to memory")
+            return MemoryStorage()
+        logger.info("🗂 FSM storage: Redis")
+        backend = RedisFSMBackend(config.redis.url, ttl=config.fsm.state_ttl)
+        return TieredStorage(backend, local_ttl=config.fsm.local_ttl)
+    
+    if backend_name == "postgres":
+        from bot.database import async_session
+        logger.info("🗂 FSM storage: PostgreSQL")
+        backend = PostgresFSMBackend(async_session, ttl=config.fsm.state_ttl)
+        return TieredStorage(backend, local_ttl=config.fsm.local_ttl)
+    
+    return MemoryStorage()
@@ -1,3 +1,4 @@
+from html import escape
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
@@ -12,7 +13,11 @@ from bot.services.admin_service import AdminService
 from bot.services.product_service import ProductService
 from bot.services.order_service import OrderService
 from bot.services.seller_service import SellerService
+from bot.services.sales_service import SalesService
+from bot.services.stats_service import stats_service
+from bot.services.jobs import Job, job_manager, delete_keys_work, delete_product_work
 from bot.templates.messages import Templates
+from bot.utils.durations import parse_duration
 from bot.keyboards.admin_kb import (
     admin_main_keyboard,
     back_to_admin_keyboard,
@@ -34,6 +39,9 @@ from bot.keyboards.admin_kb import (
     broadcast_cancel_keyboard,
     statistics_keyboard,
     user_management_keyboard,
+    user_search_keyboard,
+    key_batches_keyboard,
+    confirm_delete_batch_keyboard,
     broadcast_cancel_inline_keyboard
 )
 from bot.config import config
@@ -61,6 +69,7 @@ class AdminStates(StatesGroup):
     waiting_broadcast_photo = State()
     waiting_usermgmt_user = State()
     waiting_usermgmt_amount = State()
+    waiting_user_search = State()
 
 broadcast_cancelled = {}
 
@@ -130,32 +139,22 @@ async def show_statistics(callback: CallbackQuery):
         await callback.answer("⚠️ Access denied!", show_alert=True)
         return
     
-    async with async_session() as session:
-        user_service = UserService(session)
-        order_service = OrderService(session)
-        product_service = ProductService(session)
-        
-        all_users = await user_service.get_all_users()
-        premium_count = await user_service.get_premium_users_count()
-        total_orders = await order_service.get_orders_count()
-        total_revenue = await order_service.get_total_revenue()
-        keys_data = await product_service.get_keys_count()
-        
-        text = Templates.statistics(
-            total_users=len(all_users),
-            premium_users=premium_count,
-            total_orders=total_orders,
-            total_revenue=total_revenue,
-            keys_available=keys_data["available"],
-            keys_total=keys_data["total"],
-            resellers_count=0
-        )
-        
-        await callback.message.edit_text(
-            text,
-            parse_mode=ParseMode.HTML,
-            reply_markup=statistics_keyboard()
-        )
+    stats = await stats_service.get_snapshot()
+    text = Templates.statistics(
+        total_users=stats["total_users"],
+        premium_users=stats["premium_users"],
+        total_orders=stats["total_orders"],
+        total_revenue=stats["total_revenue"],
+        keys_available=stats["available_keys"],
+        keys_total=stats["total_keys"],
+        resellers_count=stats["resellers"]
+    )
+    
+    await callback.message.edit_text(
+        text,
+        parse_mode=ParseMode.HTML,
+        reply_markup=statistics_keyboard()
+    )
     await callback.answer()
 
 
@@ -318,31 +317,30 @@ async def manage_single_product(callback: CallbackQuery, state: FSMContext):
     elif action == "delete" and product_id:
         async with async_session() as session:
             product_service = ProductService(session)
-            await product_service.delete_product(product_id)
-            
-            products = await product_service.get_all_products(active_only=False)
-            products_data = [
-                {"id": p.id, "name": p.name, "is_active": p.is_active}
-                for p in products
-            ]
-            
-            text = f"""
-{Templates.DIVIDER}
-🛠 <b>MANAGE PRODUCTS</b>
-{Templates.DIVIDER}
-
-Total products: {len(products)}
-
-Select a product to manage:
-"""
-            
-            await callback.message.edit_text(
-                text,
-                parse_mode=ParseMode.HTML,
-                reply_markup=products_manage_keyboard(products_data)
-            )
-            await callback.answer("🗑 Product deleted!")
-            return
+            product = await product_service.get_product(product_id)
+            if not product:
+                await callback.answer("❌ Product not found!", show_alert=True)
+                return
+            if await product_service.product_has_orders(product_id):
+                await callback.answer(
+                    "❌ This product has orders and can't be deleted. Deactivate it instead.",
+                    show_alert=True
+                )
+                return
+            product_name = product.name
+        
+        await callback.message.edit_text(
+            Templates.info(f"🗑 Deleting <b>{escape(product_name)}</b>..."),
+            parse_mode=ParseMode.HTML
+        )
+        job_manager.submit(
+            "delete_product",
+            f"Delete product {product_id}",
+            delete_product_work(product_id),
+            report=_job_reporter(callback.message, f"Product <b>{escape(product_name)}</b> deleted with {{done}} keys.")
+        )
+        await callback.answer()
+        return
     
     elif action == "edit_name" and product_id:
         await state.set_state(AdminStates.waiting_product_name)
@@ -440,26 +438,6 @@ async def receive_product_image(message: Message, state: FSMContext):
         )
 
 
-def parse_duration(duration_str: str) -> tuple:
-    """Parse duration string like '1d', '7d', '1m', '3m' to readable format and sort key"""
-    import re
-    match = re.match(r'^(\d+)(d|m)$', duration_str.lower().strip())
-    if not match:
-        return None, None, None
-    
-    num = int(match.group(1))
-    unit = match.group(2)
-    
-    if unit == 'd':
-        readable = f"{num} Day{'s' if num > 1 else ''}"
-        sort_key = num
-    else:
-        readable = f"{num} Month{'s' if num > 1 else ''}"
-        sort_key = num * 30
-    
-    return duration_str.lower(), readable, sort_key
-
-
 @router.message(AdminStates.waiting_price_duration)
 async def add_price_duration(message: Message, state: FSMContext):
     if not await is_admin_check(message.from_user.id):
@@ -488,7 +466,7 @@ async def add_price_duration(message: Message, state: FSMContext):
             duration_input, price_str = parts
             
             parsed = parse_duration(duration_input)
-            if not parsed[0]:
+            if not parsed:
                 errors.append(f"Invalid duration: {duration_input}")
                 continue
             
@@ -498,10 +476,11 @@ async def add_price_duration(message: Message, state: FSMContext):
                 errors.append(f"Invalid price: {price_str}")
                 continue
             
-            duration_code, readable_duration, _ = parsed
+            duration_days, readable_duration = parsed
             
             await product_service.add_price(
                 product_id=product_id,
+                duration_days=duration_days,
                 duration=readable_duration,
                 price=price
             )
@@ -586,27 +565,47 @@ async def manage_product_keys(callback: CallbackQuery, state: FSMContext):
         await callback.answer()
         return
     
+    elif action == "batches" and product_id:
+        async with async_session() as session:
+            product_service = ProductService(session)
+            batches = await product_service.get_key_batches(product_id)
+            
+            text = f"{Templates.DIVIDER}\n📦 <b>RECENT KEY BATCHES</b>\n{Templates.DIVIDER}\n"
+            if not batches:
+                text += "\n<i>No batches imported yet.</i>\n"
+            for b in batches:
+                text += (
+                    f"\n<b>#{b['id']}</b> · {b['created_at'].strftime('%Y-%m-%d %H:%M')} · {b['source']}\n"
+                    f"   Imported: {b['imported']} · Left: {b['remaining']} · Used: {b['used']}\n"
+                )
+            
+            await callback.message.edit_text(
+                text,
+                parse_mode=ParseMode.HTML,
+                reply_markup=key_batches_keyboard(product_id, batches)
+            )
+        await callback.answer()
+        return
+    
     elif action == "view" and product_id:
+        cursor = parts[4] if len(parts) > 4 else None
         async with async_session() as session:
             product_service = ProductService(session)
-            keys = await product_service.get_keys_for_product(product_id)
+            page = await product_service.get_keys_page(product_id, cursor=cursor, limit=20)
             
-            if not keys:
+            if not page.items:
                 await callback.answer("No keys found for this product!", show_alert=True)
                 return
             
             text = f"{Templates.DIVIDER}\n🔑 <b>KEYS</b>\n{Templates.DIVIDER}\n\n"
-            for k in keys[:20]:
+            for k in page.items:
                 status = "✅" if not k.is_used else "❌"
                 text += f"{status} {k.duration}: <code>{k.key_value[:20]}...</code>\n"
             
-            if len(keys) > 20:
-                text += f"\n... and {len(keys) - 20} more keys"
-            
             await callback.message.edit_text(
                 text,
                 parse_mode=ParseMode.HTML,
-                reply_markup=product_keys_keyboard(product_id)
+                reply_markup=product_keys_keyboard(product_id, page.prev_cursor, page.next_cursor)
             )
         await callback.answer()
         return
@@ -647,7 +646,7 @@ async def add_keys(message: Message, state: FSMContext):
     product_id = data.get("keys_product_id")
     
     lines = message.text.strip().split("\n")
-    added = 0
+    new_keys = []
     errors = []
     
     async with async_session() as session:
@@ -664,8 +663,8 @@ async def add_keys(message: Message, state: FSMContext):
             await state.clear()
             return
         
-        # Create a set of valid durations from product prices
-        valid_durations = {p.duration for p in product.prices}
+        # Durations (in days) the product has a price for, with their labels
+        valid_durations = {p.duration_days: p.duration for p in product.prices}
         
         for line in lines:
             line = line.strip()
@@ -682,20 +681,21 @@ async def add_keys(message: Message, state: FSMContext):
             
             # Parse duration code (e.g., 1d, 7d, 1m, 3m)
             parsed = parse_duration(duration_code)
-            if not parsed[0]:
+            if not parsed:
                 errors.append(f"Invalid duration: {duration_code}")
                 continue
             
-            _, readable_duration, _ = parsed
+            duration_days, readable_duration = parsed
             
             # Check if this duration exists in product prices
-            if readable_duration not in valid_durations:
+            if duration_days not in valid_durations:
                 errors.append(f"Duration '{readable_duration}' not in price list for this product")
                 continue
             
-            await product_service.add_key(product_id, key_value, readable_duration)
-            added += 1
+            new_keys.append((key_value, duration_days, valid_durations[duration_days]))
         
+        await product_service.add_keys_batch(product_id, new_keys, source="bot", created_by=message.from_user.id)
+        added = len(new_keys)
         await state.clear()
         
         result_text = f"Added {added} keys successfully!"
@@ -835,6 +835,23 @@ This will delete keys that were added in the most recent bulk addition.
     await callback.answer()
 
 
+def _job_reporter(message: Message, done_text: str):
+    """Edit `message` with a job's progress; `done_text` may use {done} for the item count"""
+    async def report(job: Job):
+        if job.status == "running":
+            text = Templates.info(f"⏳ {job.description}: <b>{job.done}</b> deleted so far...")
+        elif job.status == "done":
+            text = Templates.success(done_text.replace("{done}", str(job.done)))
+        else:
+            text = Templates.error(f"{job.description} stopped after {job.done} items: {escape(job.error or '')}")
+        await message.edit_text(
+            text,
+            parse_mode=ParseMode.HTML,
+            reply_markup=None if job.status == "running" else back_to_admin_keyboard()
+        )
+    return report
+
+
 @router.callback_query(F.data.startswith("admin:keys:confirm_all:"))
 async def execute_delete_all_keys(callback: CallbackQuery):
     if not await is_admin_check(callback.from_user.id):
@@ -844,15 +861,16 @@ async def execute_delete_all_keys(callback: CallbackQuery):
     parts = callback.data.split(":")
     product_id = int(parts[3])
     
-    async with async_session() as session:
-        product_service = ProductService(session)
-        deleted_count = await product_service.delete_all_keys(product_id)
-        
-        await callback.message.edit_text(
-            Templates.success(f"Deleted <b>{deleted_count}</b> keys successfully!"),
-            parse_mode=ParseMode.HTML,
-            reply_markup=back_to_admin_keyboard()
-        )
+    await callback.message.edit_text(
+        Templates.info("🗑 Deleting keys..."),
+        parse_mode=ParseMode.HTML
+    )
+    job_manager.submit(
+        "delete_keys",
+        f"Delete keys of product {product_id}",
+        delete_keys_work(product_id),
+        report=_job_reporter(callback.message, "Deleted <b>{done}</b> keys successfully!")
+    )
     await callback.answer()
 
 
@@ -865,15 +883,16 @@ async def execute_delete_claimed_keys(callback: CallbackQuery):
     parts = callback.data.split(":")
     product_id = int(parts[3])
     
-    async with async_session() as session:
-        product_service = ProductService(session)
-        deleted_count = await product_service.delete_claimed_keys(product_id)
-        
-        await callback.message.edit_text(
-            Templates.success(f"Deleted <b>{deleted_count}</b> claimed keys successfully!"),
-            parse_mode=ParseMode.HTML,
-            reply_markup=back_to_admin_keyboard()
-        )
+    await callback.message.edit_text(
+        Templates.info("🗑 Deleting claimed keys..."),
+        parse_mode=ParseMode.HTML
+    )
+    job_manager.submit(
+        "delete_keys",
+        f"Delete claimed keys of product {product_id}",
+        delete_keys_work(product_id, claimed_only=True),
+        report=_job_reporter(callback.message, "Deleted <b>{done}</b> claimed keys successfully!")
+    )
     await callback.answer()
 
 
@@ -906,20 +925,76 @@ async def execute_delete_last_keys(callback: CallbackQuery):
 
 
 
+@router.callback_query(F.data.startswith("admin:keys:delete_batch:"))
+async def confirm_delete_key_batch(callback: CallbackQuery):
+    if not await is_admin_check(callback.from_user.id):
+        await callback.answer("⚠️ Access denied!", show_alert=True)
+        return
+    
+    batch_id = int(callback.data.split(":")[3])
+    
+    async with async_session() as session:
+        product_service = ProductService(session)
+        batch = await product_service.get_key_batch(batch_id)
+        if not batch:
+            await callback.answer("Batch not found!", show_alert=True)
+            return
+        
+        text = f"""
+⚠️ <b>CONFIRM DELETE BATCH #{batch.id}</b>
+
+This will delete every key imported in this batch ({batch.keys_count} keys, {batch.created_at.strftime('%Y-%m-%d %H:%M')}).
+
+⚠️ <i>This action cannot be undone!</i>
+"""
+        
+        await callback.message.edit_text(
+            text,
+            parse_mode=ParseMode.HTML,
+            reply_markup=confirm_delete_batch_keyboard(batch.id, batch.product_id)
+        )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("admin:keys:confirm_batch:"))
+async def execute_delete_key_batch(callback: CallbackQuery):
+    if not await is_admin_check(callback.from_user.id):
+        await callback.answer("⚠️ Access denied!", show_alert=True)
+        return
+    
+    batch_id = int(callback.data.split(":")[3])
+    
+    async with async_session() as session:
+        product_service = ProductService(session)
+        deleted_count = await product_service.delete_key_batch(batch_id)
+        
+        await callback.message.edit_text(
+            Templates.success(f"Deleted batch <b>#{batch_id}</b> with <b>{deleted_count}</b> keys!"),
+            parse_mode=ParseMode.HTML,
+            reply_markup=back_to_admin_keyboard()
+        )
+    await callback.answer()
+
+
 @router.callback_query(F.data == "admin:admins")
+@router.callback_query(F.data.startswith("admin:admins:page:"))
 async def manage_admins(callback: CallbackQuery):
     if not await is_admin_check(callback.from_user.id):
         await callback.answer("⚠️ Access denied!", show_alert=True)
         return
     
+    cursor = callback.data.split(":")[3] if callback.data.startswith("admin:admins:page:") else None
+    
     async with async_session() as session:
         admin_service = AdminService(session)
         user_service = UserService(session)
-        admins = await admin_service.get_all_admins()
+        page = await admin_service.get_admins_page(cursor=cursor, limit=20)
+        admins_count = await admin_service.get_admins_count()
+        users = await user_service.get_users_by_telegram_ids([a.telegram_id for a in page.items])
         
         admins_data = []
-        for a in admins:
-            user = await user_service.get_user_by_telegram_id(a.telegram_id)
+        for a in page.items:
+            user = users.get(a.telegram_id)
             admins_data.append({
                 "id": a.id, 
                 "telegram_id": a.telegram_id, 
@@ -933,7 +1008,7 @@ async def manage_admins(callback: CallbackQuery):
 🧑‍⚖ <b>MANAGE ADMINS</b>
 {Templates.DIVIDER}
 
-Total admins: {len(admins)}
+Total admins: {admins_count}
 
 Select an admin to manage:
 """
@@ -941,7 +1016,7 @@ Select an admin to manage:
         await callback.message.edit_text(
             text,
             parse_mode=ParseMode.HTML,
-            reply_markup=admins_keyboard(admins_data, config.bot.root_admin_id)
+            reply_markup=admins_keyboard(admins_data, config.bot.root_admin_id, page.prev_cursor, page.next_cursor)
         )
     await callback.answer()
 
@@ -1003,8 +1078,7 @@ async def show_admin_detail(callback: CallbackQuery):
     async with async_session() as session:
         admin_service = AdminService(session)
         user_service = UserService(session)
-        admins = await admin_service.get_all_admins()
-        admin = next((a for a in admins if a.id == admin_id), None)
+        admin = await admin_service.get_admin_by_id(admin_id)
         
         if admin:
             # Get user info if available
@@ -1039,8 +1113,7 @@ async def remove_admin(callback: CallbackQuery):
     
     async with async_session() as session:
         admin_service = AdminService(session)
-        admin = await admin_service.get_all_admins()
-        target = next((a for a in admin if a.id == admin_id), None)
+        target = await admin_service.get_admin_by_id(admin_id)
         
         if target and target.telegram_id == config.bot.root_admin_id:
             await callback.answer("❌ Cannot remove root admin!", show_alert=True)
@@ -1524,8 +1597,7 @@ async def show_user_credits(callback: CallbackQuery):
     
     async with async_session() as session:
         user_service = UserService(session)
-        users = await user_service.get_all_users()
-        user = next((u for u in users if u.id == user_id), None)
+        user = await user_service.get_user_by_id(user_id)
         
         if user:
             text = f"""
@@ -1600,10 +1672,24 @@ async def process_credits(message: Message, state: FSMContext):
     
     async with async_session() as session:
         user_service = UserService(session)
-        await user_service.update_balance(user_id, amount)
+        new_balance = await user_service.change_balance(
+            user_id,
+            amount,
+            kind="admin_credit" if action == "add" else "admin_debit",
+            actor_id=message.from_user.id,
+            require_funds=True
+        )
         
         await state.clear()
         
+        if new_balance is None:
+            await message.answer(
+                Templates.error("Insufficient balance, nothing was removed!"),
+                parse_mode=ParseMode.HTML,
+                reply_markup=back_to_admin_keyboard()
+            )
+            return
+        
         action_text = "added to" if action == "add" else "removed from"
         await message.answer(
             Templates.success(f"${abs(amount):.2f} {action_text} user balance!"),
@@ -1630,15 +1716,19 @@ async def manage_prices(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "admin:premium")
+@router.callback_query(F.data.startswith("admin:premium:page:"))
 async def manage_premium_users(callback: CallbackQuery):
     if not await is_admin_check(callback.from_user.id):
         await callback.answer("⚠️ Access denied!", show_alert=True)
         return
     
+    cursor = callback.data.split(":")[3] if callback.data.startswith("admin:premium:page:") else None
+    
     async with async_session() as session:
         user_service = UserService(session)
-        all_users = await user_service.get_all_users()
-        premium_users = [u for u in all_users if u.status.value == "premium"]
+        page = await user_service.get_users_page(cursor=cursor, limit=20, premium_only=True)
+        premium_users = page.items
+        premium_count = await user_service.get_premium_users_count()
         
         users_data = [
             {
@@ -1656,7 +1746,7 @@ async def manage_premium_users(callback: CallbackQuery):
 ⭐ <b>MANAGE PREMIUM USERS</b>
 {Templates.DIVIDER}
 
-Total premium users: {len(premium_users)}
+Total premium users: {premium_count}
 
 Select a user to manage:
 """
@@ -1664,7 +1754,7 @@ Select a user to manage:
         await callback.message.edit_text(
             text,
             parse_mode=ParseMode.HTML,
-            reply_markup=premium_users_keyboard(users_data)
+            reply_markup=premium_users_keyboard(users_data, page.prev_cursor, page.next_cursor)
         )
     await callback.answer()
 
@@ -1729,8 +1819,7 @@ async def show_premium_user(callback: CallbackQuery):
     
     async with async_session() as session:
         user_service = UserService(session)
-        users = await user_service.get_all_users()
-        user = next((u for u in users if u.id == user_id), None)
+        user = await user_service.get_user_by_id(user_id)
         
         if user:
             text = f"""
@@ -1864,9 +1953,7 @@ async def process_broadcast_text(message: Message, state: FSMContext):
     
     async with async_session() as session:
         user_service = UserService(session)
-        all_users = await user_service.get_all_users()
-        
-        total = len(all_users)
+        total = await user_service.get_users_count()
         sent = 0
         failed = 0
         
@@ -1876,7 +1963,7 @@ async def process_broadcast_text(message: Message, state: FSMContext):
             reply_markup=broadcast_cancel_inline_keyboard()
         )
         
-        for i, user in enumerate(all_users):
+        async for chat_id in user_service.iter_user_chat_ids():
             if broadcast_cancelled.get(admin_id, False):
                 await progress_msg.edit_text(
                     f"🛑 <b>Broadcast Cancelled!</b>\n\n✅ Sent: {sent}\n❌ Failed: {failed}\n⏳ Remaining: {total - sent - failed}",
@@ -1889,16 +1976,16 @@ async def process_broadcast_text(message: Message, state: FSMContext):
             
             try:
                 await message.bot.send_message(
-                    chat_id=user.telegram_id,
+                    chat_id=chat_id,
                     text=message.text,
                     parse_mode=ParseMode.HTML
                 )
                 sent += 1
             except Exception as e:
-                logger.warning(f"Failed to send broadcast to {user.telegram_id}: {e}")
+                logger.warning(f"Failed to send broadcast to {chat_id}: {e}")
                 failed += 1
             
-            if (i + 1) % 10 == 0 or i == total - 1:
+            if (sent + failed) % 10 == 0 or sent + failed == total:
                 try:
                     await progress_msg.edit_text(
                         Templates.broadcast_progress(total, sent, failed),
@@ -1935,9 +2022,7 @@ async def process_broadcast_photo(message: Message, state: FSMContext):
     
     async with async_session() as session:
         user_service = UserService(session)
-        all_users = await user_service.get_all_users()
-        
-        total = len(all_users)
+        total = await user_service.get_users_count()
         sent = 0
         failed = 0
         
@@ -1947,7 +2032,7 @@ async def process_broadcast_photo(message: Message, state: FSMContext):
             reply_markup=broadcast_cancel_inline_keyboard()
         )
         
-        for i, user in enumerate(all_users):
+        async for chat_id in user_service.iter_user_chat_ids():
             if broadcast_cancelled.get(admin_id, False):
                 await progress_msg.edit_text(
                     f"🛑 <b>Broadcast Cancelled!</b>\n\n✅ Sent: {sent}\n❌ Failed: {failed}\n⏳ Remaining: {total - sent - failed}",
@@ -1960,17 +2045,17 @@ async def process_broadcast_photo(message: Message, state: FSMContext):
             
             try:
                 await message.bot.send_photo(
-                    chat_id=user.telegram_id,
+                    chat_id=chat_id,
                     photo=photo_file_id,
                     caption=caption,
                     parse_mode=ParseMode.HTML
                 )
                 sent += 1
             except Exception as e:
-                logger.warning(f"Failed to send broadcast photo to {user.telegram_id}: {e}")
+                logger.warning(f"Failed to send broadcast photo to {chat_id}: {e}")
                 failed += 1
             
-            if (i + 1) % 10 == 0 or i == total - 1:
+            if (sent + failed) % 10 == 0 or sent + failed == total:
                 try:
                     await progress_msg.edit_text(
                         Templates.broadcast_progress(total, sent, failed),
@@ -2016,6 +2101,30 @@ async def show_top_sellers(callback: CallbackQuery):
     await callback.answer()
 
 
+@router.callback_query(F.data.startswith("admin:stats:sales:"))
+async def show_sales_chart(callback: CallbackQuery):
+    if not await is_admin_check(callback.from_user.id):
+        await callback.answer("⚠️ Access denied!", show_alert=True)
+        return
+    
+    days = int(callback.data.split(":")[-1])
+    
+    async with async_session() as session:
+        sales_service = SalesService(session)
+        # A day is shown by hour; longer ranges by day
+        series = await sales_service.get_series(days, "hour" if days == 1 else "day")
+        products = await sales_service.get_breakdown(days)
+        
+        text = Templates.sales_chart(series, products, days)
+        
+        await callback.message.edit_text(
+            text,
+            parse_mode=ParseMode.HTML,
+            reply_markup=statistics_keyboard()
+        )
+    await callback.answer()
+
+
 # =============================================
 # USER MANAGEMENT HANDLERS
 # =============================================
@@ -2044,6 +2153,40 @@ Select an action:
     await callback.answer()
 
 
+@router.callback_query(F.data == "admin:finduser")
+async def find_user_prompt(callback: CallbackQuery, state: FSMContext):
+    if not await is_admin_check(callback.from_user.id):
+        await callback.answer("⚠️ Access denied!", show_alert=True)
+        return
+    
+    await state.set_state(AdminStates.waiting_user_search)
+    await callback.message.edit_text(
+        Templates.info("Send a <b>Telegram ID</b>, <b>@username</b> or part of a name to search for:"),
+        parse_mode=ParseMode.HTML,
+        reply_markup=back_to_admin_keyboard()
+    )
+    await callback.answer()
+
+
+@router.message(AdminStates.waiting_user_search)
+async def process_user_search(message: Message, state: FSMContext):
+    if not await is_admin_check(message.from_user.id):
+        return
+    
+    query = (message.text or "").strip()
+    await state.clear()
+    
+    async with async_session() as session:
+        user_service = UserService(session)
+        users = await user_service.search_users(query)
+        
+        await message.answer(
+            Templates.user_search_results(query, users),
+            parse_mode=ParseMode.HTML,
+            reply_markup=user_search_keyboard()
+        )
+
+
 @router.callback_query(F.data.startswith("admin:usermgmt:"))
 async def user_management_action(callback: CallbackQuery, state: FSMContext):
     if not await is_admin_check(callback.from_user.id):
@@ -2175,10 +2318,24 @@ async def process_usermgmt_amount(message: Message, state: FSMContext):
         if action == "removebalance":
             amount = -amount
         
-        await user_service.update_balance(user_id, amount)
+        new_balance = await user_service.change_balance(
+            user_id,
+            amount,
+            kind="admin_credit" if action == "addbalance" else "admin_debit",
+            actor_id=message.from_user.id,
+            require_funds=True
+        )
         
         await state.clear()
         
+        if new_balance is None:
+            await message.answer(
+                Templates.error(f"<b>{user_name}</b> doesn't have that much balance, nothing was removed!"),
+                parse_mode=ParseMode.HTML,
+                reply_markup=back_to_admin_keyboard()
+            )
+            return
+        
         action_text = "added to" if action == "addbalance" else "removed from"
         await message.answer(
             Templates.success(f"${abs(amount):.2f} {action_text} <b>{user_name}</b>'s balance!"),
@@ -2248,7 +2405,12 @@ async def cmd_addbalance(message: Message):
     
     async with async_session() as session:
         user_service = UserService(session)
-        await user_service.update_balance(user.id, amount)
+        await user_service.change_balance(
+            user.id,
+            amount,
+            kind="admin_credit",
+            actor_id=message.from_user.id
+        )
     
     await message.answer(
         Templates.success(f"${amount:.2f} added to <b>{user.first_name or user.username or user.telegram_id}</b>'s balance!"),
@@ -2281,7 +2443,20 @@ async def cmd_removebalance(message: Message):
     
     async with async_session() as session:
         user_service = UserService(session)
-        await user_service.update_balance(user.id, -amount)
+        new_balance = await user_service.change_balance(
+            user.id,
+            -amount,
+            kind="admin_debit",
+            actor_id=message.from_user.id,
+            require_funds=True
+        )
+    
+    if new_balance is None:
+        await message.answer(
+            Templates.error(f"<b>{user.first_name or user.username or user.telegram_id}</b> only has ${float(user.balance):.2f}, nothing was removed!"),
+            parse_mode=ParseMode.HTML
+        )
+        return
     
     await message.answer(
         Templates.success(f"${amount:.2f} removed from <b>{user.first_name or user.username or user.telegram_id}</b>'s balance!"),
@@ -1,8 +1,11 @@
 import os
+import secrets
+import tempfile
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, FSInputFile
 from aiogram.filters import Command
 from aiogram.enums import ParseMode, ContentType
+from aiogram.exceptions import TelegramBadRequest
 from loguru import logger
 
 from bot.database import async_session
@@ -10,6 +13,7 @@ from bot.services.user_service import UserService
 from bot.services.product_service import ProductService
 from bot.services.order_service import OrderService
 from bot.services.seller_service import SellerService
+from bot.services.media_service import MediaService
 from bot.templates.messages import Templates
 from bot.keyboards.user_kb import (
     main_menu_keyboard,
@@ -17,13 +21,17 @@ from bot.keyboards.user_kb import (
     products_keyboard,
     product_detail_keyboard,
     confirm_purchase_keyboard,
-    trusted_sellers_keyboard
+    trusted_sellers_keyboard,
+    my_orders_keyboard
 )
+from bot.utils.navigation import navigate
 from bot.config import config
 from bot.models import UserStatus
 
 router = Router()
 
+ORDERS_PAGE_SIZE = 5
+
 BANNER_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "banner.jpg")
 
 
@@ -64,6 +72,47 @@ async def check_maintenance(callback_or_message, user_id: int) -> bool:
     return False
 
 
+async def send_banner(bot, chat_id: int, text: str, reply_markup=None) -> Message:
+    """Send the banner with a caption, uploading the file only if Telegram has no file_id for it yet"""
+    if not os.path.exists(BANNER_PATH):
+        return await bot.send_message(
+            chat_id=chat_id,
+            text=text,
+            parse_mode=ParseMode.HTML,
+            reply_markup=reply_markup
+        )
+    
+    async with async_session() as session:
+        media_service = MediaService(session)
+        photo = await media_service.get_input(BANNER_PATH)
+        
+        try:
+            sent = await bot.send_photo(
+                chat_id=chat_id,
+                photo=photo,
+                caption=text,
+                parse_mode=ParseMode.HTML,
+                reply_markup=reply_markup
+            )
+        except TelegramBadRequest as e:
+            if isinstance(photo, FSInputFile):
+                raise
+            logger.warning(f"Cached banner file_id rejected, re-uploading: {e}")
+            await media_service.forget(BANNER_PATH)
+            photo = FSInputFile(BANNER_PATH)
+            sent = await bot.send_photo(
+                chat_id=chat_id,
+                photo=photo,
+                caption=text,
+                parse_mode=ParseMode.HTML,
+                reply_markup=reply_markup
+            )
+        
+        if isinstance(photo, FSInputFile):
+            await media_service.remember_from_message(BANNER_PATH, sent)
+    return sent
+
+
 async def edit_message(callback: CallbackQuery, text: str, reply_markup=None):
     if callback.message.content_type == ContentType.PHOTO:
         await callback.message.edit_caption(
@@ -103,25 +152,17 @@ async def cmd_start(message: Message):
         text = Templates.user_dashboard(
             first_name=user.first_name or "User",
             telegram_id=user.telegram_id,
-            balance=float(user.balance) if user.balance is not None else 0.0,
+            balance=float(await user_service.get_balance(user.id)),
             status=user.status.value,
             last_purchase=user.last_purchase_at
         )
         
-        if os.path.exists(BANNER_PATH):
-            photo = FSInputFile(BANNER_PATH)
-            await message.answer_photo(
-                photo=photo,
-                caption=text,
-                parse_mode=ParseMode.HTML,
-                reply_markup=main_menu_keyboard(is_premium=is_premium)
-            )
-        else:
-            await message.answer(
-                text,
-                parse_mode=ParseMode.HTML,
-                reply_markup=main_menu_keyboard(is_premium=is_premium)
-            )
+        await send_banner(
+            message.bot,
+            message.chat.id,
+            text,
+            reply_markup=main_menu_keyboard(is_premium=is_premium)
+        )
 
 
 @router.callback_query(F.data == "back_to_menu")
@@ -136,7 +177,8 @@ async def back_to_menu(callback: CallbackQuery):
         user = await user_service.get_or_create_user(
             telegram_id=callback.from_user.id,
             username=callback.from_user.username,
-            first_name=callback.from_user.first_name
+            first_name=callback.from_user.first_name,
+            last_name=callback.from_user.last_name
         )
         
         is_premium = user.status == UserStatus.PREMIUM
@@ -144,40 +186,17 @@ async def back_to_menu(callback: CallbackQuery):
         text = Templates.user_dashboard(
             first_name=user.first_name or "User",
             telegram_id=user.telegram_id,
-            balance=float(user.balance) if user.balance is not None else 0.0,
+            balance=float(await user_service.get_balance(user.id)),
             status=user.status.value,
             last_purchase=user.last_purchase_at
         )
         
-        if callback.message.content_type == ContentType.PHOTO:
-            chat_id = callback.message.chat.id
-            try:
-                await callback.message.delete()
-            except Exception:
-                pass
-            
-            if os.path.exists(BANNER_PATH):
-                photo = FSInputFile(BANNER_PATH)
-                await callback.bot.send_photo(
-                    chat_id=chat_id,
-                    photo=photo,
-                    caption=text,
-                    parse_mode=ParseMode.HTML,
-                    reply_markup=main_menu_keyboard(is_premium=is_premium)
-                )
-            else:
-                await callback.bot.send_message(
-                    chat_id=chat_id,
-                    text=text,
-                    parse_mode=ParseMode.HTML,
-                    reply_markup=main_menu_keyboard(is_premium=is_premium)
-                )
-        else:
-            await callback.message.edit_text(
-                text,
-                parse_mode=ParseMode.HTML,
-                reply_markup=main_menu_keyboard(is_premium=is_premium)
-            )
+        await navigate(
+            callback,
+            text,
+            reply_markup=main_menu_keyboard(is_premium=is_premium),
+            photo_path=BANNER_PATH
+        )
     await callback.answer()
 
 
@@ -205,15 +224,9 @@ async def show_trusted_sellers(callback: CallbackQuery):
         
         text = Templates.trusted_sellers(sellers_data)
         
-        chat_id = callback.message.chat.id
-        try:
-            await callback.message.delete()
-        except Exception:
-            pass
-        await callback.bot.send_message(
-            chat_id=chat_id,
-            text=text,
-            parse_mode=ParseMode.HTML,
+        await navigate(
+            callback,
+            text,
             reply_markup=trusted_sellers_keyboard(config.bot.manager_username, config.bot.admin_username)
         )
     await callback.answer()
@@ -233,50 +246,12 @@ async def show_products(callback: CallbackQuery):
         user = await user_service.get_user_by_telegram_id(callback.from_user.id)
         is_premium = user and user.status == UserStatus.PREMIUM
         
-        products = await product_service.get_all_products(active_only=True)
-        
-        products_data = [
-            {
-                "id": p.id,
-                "name": p.name,
-                "description": p.description,
-                "prices": [{"id": pr.id, "duration": pr.duration, "price": float(pr.price) if pr.price is not None else 0.0} for pr in p.prices]
-            }
-            for p in products
-        ]
+        products_data = await product_service.get_catalog()
         
         text = Templates.products_list(products_data, is_premium=is_premium)
         keyboard = products_keyboard(products_data, is_premium=is_premium)
         
-        if callback.message.content_type == ContentType.PHOTO:
-            chat_id = callback.message.chat.id
-            try:
-                await callback.message.delete()
-            except Exception:
-                pass
-            
-            if os.path.exists(BANNER_PATH):
-                photo = FSInputFile(BANNER_PATH)
-                await callback.bot.send_photo(
-                    chat_id=chat_id,
-                    photo=photo,
-                    caption=text,
-                    parse_mode=ParseMode.HTML,
-                    reply_markup=keyboard
-                )
-            else:
-                await callback.bot.send_message(
-                    chat_id=chat_id,
-                    text=text,
-                    parse_mode=ParseMode.HTML,
-                    reply_markup=keyboard
-                )
-        else:
-            await callback.message.edit_text(
-                text,
-                parse_mode=ParseMode.HTML,
-                reply_markup=keyboard
-            )
+        await navigate(callback, text, reply_markup=keyboard, photo_path=BANNER_PATH)
     await callback.answer()
 
 
@@ -300,13 +275,16 @@ async def show_product_detail(callback: CallbackQuery):
         if not product:
             await callback.answer("❌ Product not found!", show_alert=True)
             return
+        if not product.is_active:
+            await callback.answer("❌ This product is no longer available!", show_alert=True)
+            return
         
         stock_per_duration = await product_service.get_stock_per_duration(product_id)
         
         prices_with_stock = []
         total_stock = 0
         for pr in product.prices:
-            duration_stock = stock_per_duration.get(pr.duration, 0)
+            duration_stock = stock_per_duration.get(pr.duration_days, 0)
             # Ensure price is properly converted to float
             try:
                 price_float = float(pr.price) if pr.price is not None else 0.0
@@ -315,6 +293,7 @@ async def show_product_detail(callback: CallbackQuery):
             prices_with_stock.append({
                 "id": pr.id, 
                 "duration": pr.duration, 
+                "duration_days": pr.duration_days,
                 "price": price_float,
                 "in_stock": duration_stock > 0
             })
@@ -333,25 +312,13 @@ async def show_product_detail(callback: CallbackQuery):
         text = Templates.product_detail_user(product_data, is_premium=is_premium)
         keyboard = product_detail_keyboard(product_id, product_data["prices"], is_premium=is_premium, stock_per_duration=stock_per_duration)
         
-        if product.image_file_id:
-            from aiogram.types import InputMediaPhoto
-            if callback.message.content_type == ContentType.PHOTO:
-                await callback.message.edit_media(
-                    media=InputMediaPhoto(media=product.image_file_id, caption=text, parse_mode=ParseMode.HTML),
-                    reply_markup=keyboard
-                )
-            else:
-                chat_id = callback.message.chat.id
-                await callback.message.delete()
-                await callback.bot.send_photo(
-                    chat_id=chat_id,
-                    photo=product.image_file_id,
-                    caption=text,
-                    parse_mode=ParseMode.HTML,
-                    reply_markup=keyboard
-                )
-        else:
-            await edit_message(callback, text, keyboard)
+        await navigate(
+            callback,
+            text,
+            reply_markup=keyboard,
+            photo=product.image_file_id,
+            force_photo=True
+        )
     await callback.answer()
 
 
@@ -379,18 +346,15 @@ async def initiate_purchase(callback: CallbackQuery):
         if not product:
             await callback.answer("❌ Product not found!", show_alert=True)
             return
+        if not product.is_active:
+            await callback.answer("❌ This product is no longer available!", show_alert=True)
+            return
         
         price = next((p for p in product.prices if p.id == price_id), None)
         if not price:
             await callback.answer("❌ Price option not found!", show_alert=True)
             return
         
-        # Check if key is in stock
-        key = await product_service.get_available_key(product_id, price.duration)
-        if not key:
-            await callback.answer("❌ Out of stock! Please try again later.", show_alert=True)
-            return
-        
         price_value = float(price.price)
         balance_value = float(user.balance)
         
@@ -398,6 +362,17 @@ async def initiate_purchase(callback: CallbackQuery):
             await callback.answer(f"❌ Insufficient balance! Need ${price_value:.2f}, have ${balance_value:.2f}", show_alert=True)
             return
         
+        # Hold a key while the user looks at the confirm screen
+        key = await product_service.reserve_key(
+            product_id,
+            price.duration_days,
+            user.id,
+            ttl=config.bot.reservation_ttl
+        )
+        if not key:
+            await callback.answer("❌ Out of stock! Please try again later.", show_alert=True)
+            return
+        
         text = Templates.purchase_summary(
             product_name=product.name,
             duration=price.duration,
@@ -405,10 +380,24 @@ async def initiate_purchase(callback: CallbackQuery):
             current_balance=balance_value
         )
         
-        await edit_message(callback, text, confirm_purchase_keyboard(product_id, price_id))
+        purchase_token = secrets.token_urlsafe(6)
+        await edit_message(callback, text, confirm_purchase_keyboard(product_id, price_id, purchase_token, key.id))
     await callback.answer()
 
 
+async def show_purchase_receipt(callback: CallbackQuery, receipt: dict):
+    """Answer a repeated confirm with the order it already created instead of buying again"""
+    text = Templates.purchase_success(
+        product_name=receipt["product_name"],
+        duration=receipt["duration"],
+        price=receipt["price"],
+        key_value=receipt["key_value"],
+        admin_contact=config.bot.admin_username
+    )
+    await navigate(callback, text, reply_markup=back_to_menu_keyboard())
+    await callback.answer("✅ Already purchased")
+
+
 @router.callback_query(F.data.startswith("confirm_buy:"))
 async def confirm_purchase(callback: CallbackQuery):
     if await check_banned(callback, callback.from_user.id):
@@ -419,6 +408,9 @@ async def confirm_purchase(callback: CallbackQuery):
     parts = callback.data.split(":")
     product_id = int(parts[1])
     price_id = int(parts[2])
+    # Buttons sent before purchase tokens and reservations existed are shorter
+    purchase_token = parts[3] if len(parts) > 3 else None
+    reserved_key_id = int(parts[4]) if len(parts) > 4 else None
     
     async with async_session() as session:
         user_service = UserService(session)
@@ -430,10 +422,20 @@ async def confirm_purchase(callback: CallbackQuery):
             await callback.answer("❌ User not found!", show_alert=True)
             return
         
+        if purchase_token:
+            receipt = await order_service.get_purchase(user.id, purchase_token)
+            if receipt:
+                await show_purchase_receipt(callback, receipt)
+                return
+        
         product = await product_service.get_product(product_id)
         if not product:
             await callback.answer("❌ Product not found!", show_alert=True)
             return
+        # Held until the order commits, so the product can't be deactivated (and deleted) under it
+        if not await product_service.is_on_sale(product_id, lock=True):
+            await callback.answer("❌ This product is no longer available!", show_alert=True)
+            return
         
         price = next((p for p in product.prices if p.id == price_id), None)
         if not price:
@@ -447,13 +449,32 @@ async def confirm_purchase(callback: CallbackQuery):
             await callback.answer("❌ Insufficient balance!", show_alert=True)
             return
         
-        key = await product_service.get_available_key(product_id, price.duration)
+        key = None
+        if reserved_key_id:
+            key = await product_service.claim_reserved_key(reserved_key_id, user.id)
         if not key:
-            await callback.answer("❌ Out of stock! No keys available.", show_alert=True)
-            return
+            # The hold lapsed and someone else took the key; fall back to any free one
+            key = await product_service.get_available_key(product_id, price.duration_days, user_id=user.id)
+            if not key:
+                await callback.answer("❌ Out of stock! No keys available.", show_alert=True)
+                return
+            await product_service.mark_key_used(key.id, commit=False)
         
         key_value = key.key_value
-        await product_service.mark_key_used(key.id)
+        
+        # Conditional debit in the same transaction as the key and the order
+        new_balance = await user_service.change_balance(
+            user.id,
+            -price_value,
+            kind="purchase",
+            note=f"{product.name} | {price.duration}",
+            require_funds=True,
+            commit=False
+        )
+        if new_balance is None:
+            await session.rollback()
+            await callback.answer("❌ Insufficient balance!", show_alert=True)
+            return
         
         order = await order_service.create_order(
             user_id=user.id,
@@ -461,11 +482,19 @@ async def confirm_purchase(callback: CallbackQuery):
             product_name=product.name,
             duration=price.duration,
             price=price_value,
-            key_value=key_value
+            key_value=key_value,
+            purchase_token=purchase_token
         )
+        if not order:
+            # A concurrent confirm with the same token won; the key was not consumed
+            receipt = await order_service.get_purchase(user.id, purchase_token)
+            if receipt:
+                await show_purchase_receipt(callback, receipt)
+            else:
+                await callback.answer("❌ Purchase failed, please try again.", show_alert=True)
+            return
         
-        await user_service.update_balance(user.id, -price_value)
-        new_balance = balance_value - price_value
+        await user_service.cache_balance(user.id, new_balance, telegram_id=user.telegram_id)
         
         success_msg = Templates.purchase_success(
             product_name=product.name,
@@ -500,7 +529,7 @@ async def confirm_purchase(callback: CallbackQuery):
                         duration=price.duration,
                         price=price_value,
                         key_value=key_value,
-                        new_balance=new_balance,
+                        new_balance=float(new_balance),
                         order_time=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     )
                     
@@ -517,12 +546,15 @@ async def confirm_purchase(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "my_orders")
+@router.callback_query(F.data.startswith("my_orders:"))
 async def show_my_orders(callback: CallbackQuery):
     if await check_banned(callback, callback.from_user.id):
         return
     if await check_maintenance(callback, callback.from_user.id):
         return
     
+    cursor = callback.data.partition(":")[2] or None
+    
     async with async_session() as session:
         user_service = UserService(session)
         order_service = OrderService(session)
@@ -532,7 +564,7 @@ async def show_my_orders(callback: CallbackQuery):
             await callback.answer("❌ User not found!", show_alert=True)
             return
         
-        orders = await order_service.get_user_orders(user.id, limit=10)
+        page = await order_service.get_user_orders_page(user.id, cursor=cursor, limit=ORDERS_PAGE_SIZE)
         
         orders_data = [
             {
@@ -542,15 +574,52 @@ async def show_my_orders(callback: CallbackQuery):
                 "key": o.key_value,
                 "date": o.purchased_at.strftime("%Y-%m-%d %H:%M") if o.purchased_at else "Unknown"
             }
-            for o in orders
+            for o in page.items
         ]
         
         text = Templates.my_orders(orders_data)
+        keyboard = my_orders_keyboard(page.prev_cursor, page.next_cursor, has_orders=bool(orders_data))
         
-        await edit_message(callback, text, back_to_menu_keyboard())
+        await edit_message(callback, text, keyboard)
     await callback.answer()
 
 
+@router.callback_query(F.data == "my_orders_export")
+async def export_my_orders(callback: CallbackQuery):
+    if await check_banned(callback, callback.from_user.id):
+        return
+    if await check_maintenance(callback, callback.from_user.id):
+        return
+    
+    await callback.answer("📄 Preparing your file...")
+    
+    # Rows go straight from the database cursor to a temp file, never all in memory
+    file = tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8")
+    try:
+        count = 0
+        with file:
+            async with async_session() as session:
+                user_service = UserService(session)
+                order_service = OrderService(session)
+                
+                user = await user_service.get_user_by_telegram_id(callback.from_user.id)
+                if user:
+                    async for o in order_service.stream_user_orders(user.id):
+                        date = o.purchased_at.strftime("%Y-%m-%d %H:%M") if o.purchased_at else "Unknown"
+                        file.write(f"{date} | {o.product_name} | {o.duration} | ${o.price:.2f} | {o.key_value or '-'}\n")
+                        count += 1
+        
+        if not count:
+            await callback.message.answer("📦 You haven't made any purchases yet.")
+            return
+        await callback.message.answer_document(
+            FSInputFile(file.name, filename="my_keys.txt"),
+            caption=f"🔑 All your keys ({count} orders)"
+        )
+    finally:
+        os.remove(file.name)
+
+
 @router.callback_query(F.data == "add_balance")
 async def show_add_balance(callback: CallbackQuery):
     if await check_banned(callback, callback.from_user.id):
@@ -1,6 +1,6 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from typing import List
+from typing import List, Optional
 
 
 def admin_main_keyboard(maintenance_mode: bool = False) -> InlineKeyboardMarkup:
@@ -39,7 +39,18 @@ def admin_main_keyboard(maintenance_mode: bool = False) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def premium_users_keyboard(users: list) -> InlineKeyboardMarkup:
+def pager_row(builder: InlineKeyboardBuilder, prefix: str, prev_cursor: Optional[str], next_cursor: Optional[str]):
+    """Add ◀️/▶️ buttons whose callback data is `{prefix}:{cursor}`"""
+    buttons = []
+    if prev_cursor:
+        buttons.append(InlineKeyboardButton(text="◀️ Prev", callback_data=f"{prefix}:{prev_cursor}"))
+    if next_cursor:
+        buttons.append(InlineKeyboardButton(text="Next ▶️", callback_data=f"{prefix}:{next_cursor}"))
+    if buttons:
+        builder.row(*buttons)
+
+
+def premium_users_keyboard(users: list, prev_cursor: Optional[str] = None, next_cursor: Optional[str] = None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
     for u in users:
@@ -51,6 +62,7 @@ def premium_users_keyboard(users: list) -> InlineKeyboardMarkup:
             )
         )
     
+    pager_row(builder, "admin:premium:page", prev_cursor, next_cursor)
     builder.row(
         InlineKeyboardButton(text="➕ Add Premium User", callback_data="admin:premium:add")
     )
@@ -144,14 +156,18 @@ def keys_manage_keyboard(products: list) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def product_keys_keyboard(product_id: int) -> InlineKeyboardMarkup:
+def product_keys_keyboard(product_id: int, prev_cursor: Optional[str] = None, next_cursor: Optional[str] = None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
+    pager_row(builder, f"admin:keys:view:{product_id}", prev_cursor, next_cursor)
     builder.row(
         InlineKeyboardButton(text="➕ Add Keys", callback_data=f"admin:keys:add:{product_id}")
     )
     builder.row(
         InlineKeyboardButton(text="📋 View Keys", callback_data=f"admin:keys:view:{product_id}")
     )
+    builder.row(
+        InlineKeyboardButton(text="📦 Import Batches", callback_data=f"admin:keys:batches:{product_id}")
+    )
     builder.row(
         InlineKeyboardButton(text="🗑️ Delete Keys", callback_data=f"admin:keys:delete:{product_id}")
     )
@@ -187,7 +203,29 @@ def confirm_delete_keys_keyboard(action: str, product_id: int) -> InlineKeyboard
     return builder.as_markup()
 
 
-def admins_keyboard(admins: list, root_admin_id: int) -> InlineKeyboardMarkup:
+def key_batches_keyboard(product_id: int, batches: list) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for b in batches:
+        if b["remaining"]:
+            builder.row(
+                InlineKeyboardButton(text=f"🗑️ Delete batch #{b['id']}", callback_data=f"admin:keys:delete_batch:{b['id']}")
+            )
+    builder.row(
+        InlineKeyboardButton(text="◀️ Back", callback_data=f"admin:keys:{product_id}")
+    )
+    return builder.as_markup()
+
+
+def confirm_delete_batch_keyboard(batch_id: int, product_id: int) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="✅ Yes, Delete", callback_data=f"admin:keys:confirm_batch:{batch_id}"),
+        InlineKeyboardButton(text="❌ Cancel", callback_data=f"admin:keys:batches:{product_id}")
+    )
+    return builder.as_markup()
+
+
+def admins_keyboard(admins: list, root_admin_id: int, prev_cursor: Optional[str] = None, next_cursor: Optional[str] = None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
     for a in admins:
@@ -206,6 +244,7 @@ def admins_keyboard(admins: list, root_admin_id: int) -> InlineKeyboardMarkup:
             )
         )
     
+    pager_row(builder, "admin:admins:page", prev_cursor, next_cursor)
     builder.row(
         InlineKeyboardButton(text="➕ Add Admin", callback_data="admin:admin:add")
     )
@@ -377,6 +416,11 @@ def statistics_keyboard() -> InlineKeyboardMarkup:
     builder.row(
         InlineKeyboardButton(text="🏆 Top Sellers", callback_data="admin:stats:top_sellers")
     )
+    builder.row(
+        InlineKeyboardButton(text="📈 Last 24h", callback_data="admin:stats:sales:1"),
+        InlineKeyboardButton(text="📈 7 Days", callback_data="admin:stats:sales:7"),
+        InlineKeyboardButton(text="📈 30 Days", callback_data="admin:stats:sales:30")
+    )
     builder.row(
         InlineKeyboardButton(text="◀️ Back to Admin", callback_data="admin:back")
     )
@@ -385,6 +429,9 @@ def statistics_keyboard() -> InlineKeyboardMarkup:
 
 def user_management_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="🔍 Find User", callback_data="admin:finduser")
+    )
     builder.row(
         InlineKeyboardButton(text="💰 Add Balance", callback_data="admin:usermgmt:addbalance")
     )
@@ -406,6 +453,17 @@ def user_management_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+def user_search_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="🔍 Search Again", callback_data="admin:finduser")
+    )
+    builder.row(
+        InlineKeyboardButton(text="◀️ Back to User Management", callback_data="admin:usermgmt")
+    )
+    return builder.as_markup()
+
+
 def broadcast_cancel_inline_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -1,6 +1,6 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from typing import List
+from typing import List, Optional
 
 
 def main_menu_keyboard(is_premium: bool = False) -> InlineKeyboardMarkup:
@@ -30,6 +30,25 @@ def back_to_menu_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+def my_orders_keyboard(prev_cursor: Optional[str] = None, next_cursor: Optional[str] = None, has_orders: bool = False) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    nav = []
+    if prev_cursor:
+        nav.append(InlineKeyboardButton(text="◀️ Newer", callback_data=f"my_orders:{prev_cursor}"))
+    if next_cursor:
+        nav.append(InlineKeyboardButton(text="Older ▶️", callback_data=f"my_orders:{next_cursor}"))
+    if nav:
+        builder.row(*nav)
+    if has_orders:
+        builder.row(
+            InlineKeyboardButton(text="📄 Get All Keys as File", callback_data="my_orders_export")
+        )
+    builder.row(
+        InlineKeyboardButton(text="◀️ Back to Menu", callback_data="back_to_menu")
+    )
+    return builder.as_markup()
+
+
 def trusted_sellers_keyboard(manager_username: str, admin_username: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     clean_manager = manager_username.replace("@", "")
@@ -74,50 +93,17 @@ def products_keyboard(products: list, is_premium: bool = False) -> InlineKeyboar
     return builder.as_markup()
 
 
-def get_readable_duration(duration: str) -> str:
-    """Convert duration to readable format. Handles both old format '7d|7 Days' and new format '7 Days'"""
-    if '|' in duration:
-        return duration.split('|')[1]
-    return duration
-
-
-def get_sort_key(duration: str) -> int:
-    """Get sort key for duration to order prices properly. Handles both old and new formats."""
-    import re
-    
-    # Handle old format with pipe (e.g., "1d|1 Day")
-    if '|' in duration:
-        code = duration.split('|')[0]
-        match = re.match(r'^(\d+)(d|m)$', code)
-        if match:
-            num = int(match.group(1))
-            unit = match.group(2)
-            return num if unit == 'd' else num * 30
-    
-    # Handle new readable format (e.g., "1 Day", "3 Months")
-    match = re.match(r'^(\d+)\s*(Day|Days|Month|Months)$', duration, re.IGNORECASE)
-    if match:
-        num = int(match.group(1))
-        unit = match.group(2).lower()
-        if 'day' in unit:
-            return num
-        else:
-            return num * 30
-    
-    return 999
-
-
 def product_detail_keyboard(product_id: int, prices: list, is_premium: bool = True, stock_per_duration: dict = None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
-    sorted_prices = sorted(prices, key=lambda p: get_sort_key(p['duration']))
     stock_per_duration = stock_per_duration or {}
     
     if is_premium:
-        for price in sorted_prices:
-            readable = get_readable_duration(price['duration'])
+        # Prices come ordered by duration_days from the Product.prices relationship
+        for price in prices:
+            readable = price['duration']
             in_stock = price.get('in_stock', True)
-            duration_stock = stock_per_duration.get(price['duration'], 0)
+            duration_stock = stock_per_duration.get(price['duration_days'], 0)
             
             price_value = price['price']
             # Ensure price is converted to float and formatted correctly
@@ -152,12 +138,12 @@ def product_detail_keyboard(product_id: int, prices: list, is_premium: bool = Tr
     return builder.as_markup()
 
 
-def confirm_purchase_keyboard(product_id: int, price_id: int) -> InlineKeyboardMarkup:
+def confirm_purchase_keyboard(product_id: int, price_id: int, purchase_token: str, key_id: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(
         InlineKeyboardButton(
             text="✅ Confirm Purchase",
-            callback_data=f"confirm_buy:{product_id}:{price_id}"
+            callback_data=f"confirm_buy:{product_id}:{price_id}:{purchase_token}:{key_id}"
         )
     )
     builder.row(
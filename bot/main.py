@@ -1,15 +1,27 @@
 import asyncio
 import sys
+from aiohttp import web
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
+from aiogram.webhook.aiohttp_server import setup_application
 from loguru import logger
 
+from bot.startup import Phase, run_phases
 from bot.config import config
-from bot.database import init_db, async_session
+from bot.database import async_session
+from bot.migrations import migrate, pending_migrations
+from bot.fsm_storage import create_fsm_storage
 from bot.services.cache import cache
+from bot.services.profile_buffer import profile_buffer
+from bot.services.key_archiver import key_archiver
+from bot.services.jobs import job_manager
+from bot.services.cache_warmer import cache_warmer
 from bot.services.admin_service import AdminService
+from bot.middlewares.api_calls import HandlerTrackingMiddleware, ApiCallCounterMiddleware
+from bot.middlewares.sequencing import UserSequencingMiddleware
+from bot.middlewares.activity import ActivityMiddleware
+from bot.webhook import BackgroundRequestHandler, on_webhook_startup, webhook_secret
 from bot.handlers import user, admin
 
 
@@ -29,55 +41,123 @@ logger.add(
 )
 
 
-async def on_startup(bot: Bot):
-    logger.info("🚀 Starting Quantum Panel Bot...")
-    
-    await init_db()
-    
-    from bot.migrate_banned import migrate as migrate_banned
-    await migrate_banned()
-    
-    from bot.migrate_prices import migrate as migrate_prices
-    await migrate_prices()
-    
-    await cache.connect()
+async def prepare_database():
+    if config.db.auto_migrate:
+        await migrate()
+        return
     
+    pending = await pending_migrations()
+    if pending:
+        logger.warning(f"⚠️ {len(pending)} database migrations pending, run: python -m bot.migrations")
+
+
+async def ensure_root_admin():
     async with async_session() as session:
         admin_service = AdminService(session)
         await admin_service.ensure_root_admin()
+
+
+async def on_startup(bot: Bot, run_migrations: bool = True):
+    logger.info("🚀 Starting Quantum Panel Bot...")
+    bot_info = None
+    
+    async def get_me():
+        nonlocal bot_info
+        bot_info = await bot.get_me()
+    
+    # Steps without an `after` run concurrently; the Redis ping and getMe never wait on the DB
+    phases = [
+        Phase("cache", cache.connect),
+        Phase("get_me", get_me),
+    ]
+    if run_migrations:
+        # Background maintenance runs once per deployment, where the migrations run
+        phases += [
+            Phase("database", prepare_database),
+            Phase("key_archiver", key_archiver.start, after=("database",)),
+            # Loads in the background; the bot doesn't wait for a warm cache to take updates
+            Phase("cache_warmup", cache_warmer.start, after=("database", "cache")),
+        ]
+    phases.append(Phase("root_admin", ensure_root_admin, after=("database",) if run_migrations else ()))
+    await run_phases(phases)
+    # Sharded workers skip the warm-up but still re-warm what they invalidate
+    cache_warmer.install()
     
-    bot_info = await bot.get_me()
     logger.info(f"✅ Bot started: @{bot_info.username}")
 
 
 async def on_shutdown(bot: Bot):
     logger.info("🛑 Shutting down bot...")
+    await profile_buffer.close()
+    await key_archiver.close()
+    await job_manager.close()
+    await cache_warmer.close()
     await cache.disconnect()
     logger.info("👋 Bot stopped")
 
 
-async def main():
-    if not config.bot.token:
-        logger.error("❌ BOT_TOKEN not found in environment variables!")
-        sys.exit(1)
-    
+def create_bot() -> Bot:
     bot = Bot(
         token=config.bot.token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
-    
-    storage = MemoryStorage()
+    bot.session.middleware(ApiCallCounterMiddleware())
+    return bot
+
+
+def create_dispatcher() -> Dispatcher:
+    storage = create_fsm_storage()
     dp = Dispatcher(storage=storage)
     
+    # Broadcasts run inside the admin's update, so their cancel button must not queue behind them
+    dp.update.outer_middleware(UserSequencingMiddleware(
+        config.bot.max_in_flight_updates,
+        bypass=("admin:broadcast:stop",)
+    ))
+    dp.update.outer_middleware(ActivityMiddleware())
+    dp.message.middleware(HandlerTrackingMiddleware())
+    dp.callback_query.middleware(HandlerTrackingMiddleware())
+    
     dp.include_router(user.router)
     dp.include_router(admin.router)
     
     dp.startup.register(on_startup)
     dp.shutdown.register(on_shutdown)
+    return dp
+
+
+def setup_webhook(app: web.Application):
+    """Serve Telegram updates from the given aiohttp app instead of long polling"""
+    if not config.bot.token:
+        logger.error("❌ BOT_TOKEN not found in environment variables!")
+        sys.exit(1)
+    
+    bot = create_bot()
+    dp = create_dispatcher()
+    dp.startup.register(on_webhook_startup)
+    
+    BackgroundRequestHandler(
+        dp,
+        bot,
+        secret_token=webhook_secret()
+    ).register(app, path=config.webhook.path)
+    setup_application(app, dp, bot=bot)
+    
+    logger.info(f"📡 Webhook mode: listening on {config.webhook.path}")
+
+
+async def main():
+    if not config.bot.token:
+        logger.error("❌ BOT_TOKEN not found in environment variables!")
+        sys.exit(1)
+    
+    bot = create_bot()
+    dp = create_dispatcher()
     
     logger.info("📡 Starting polling...")
     
     try:
+        await bot.delete_webhook()
         await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
         await bot.session.close()
@@ -0,0 +1,20 @@
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+from bot.services.profile_buffer import profile_buffer
+
+
+class ActivityMiddleware(BaseMiddleware):
+    """Outer update middleware that records when each user was last seen, without a query"""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user: User = data.get("event_from_user")
+        if user is not None:
+            profile_buffer.seen(user.id)
+        return await handler(event, data)
@@ -0,0 +1,45 @@
+from contextvars import ContextVar
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod, Response
+from aiogram.types import TelegramObject
+
+from bot.services.metrics import metrics
+
+
+current_handler: ContextVar[str] = ContextVar("current_handler", default="background")
+
+
+class HandlerTrackingMiddleware(BaseMiddleware):
+    """Inner middleware that records which handler is running so API calls can be attributed to it"""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        
+        metrics.incr(f"handler.{name}.updates")
+        token = current_handler.set(name)
+        try:
+            return await handler(event, data)
+        finally:
+            current_handler.reset(token)
+
+
+class ApiCallCounterMiddleware(BaseRequestMiddleware):
+    """Bot session middleware counting Telegram API requests per method and per handler"""
+    
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ) -> Response:
+        metrics.incr(f"handler.{current_handler.get()}.api_calls")
+        metrics.incr(f"api.{method.__api_method__}")
+        return await make_request(bot, method)
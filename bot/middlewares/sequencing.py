@@ -0,0 +1,80 @@
+import asyncio
+import time
+from typing import Callable, Dict, Any, Awaitable, Iterable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+from bot.services.metrics import metrics
+from bot.startup import mark_first_update
+
+
+class UserSequencingMiddleware(BaseMiddleware):
+    """
+    Outer update middleware that runs each user's updates one at a time, in arrival order,
+    while different users run in parallel with at most `max_in_flight` updates executing.
+    
+    A user's queued updates don't take a global slot until it is their turn, so one busy
+    user can't starve everyone else. Callback data listed in `bypass` (e.g. a cancel button
+    for a long-running handler) skips the user's queue.
+    """
+    
+    def __init__(self, max_in_flight: int, bypass: Iterable[str] = ()):
+        self._semaphore = asyncio.Semaphore(max(1, max_in_flight))
+        self._bypass = frozenset(bypass)
+        # user_id -> lock, and the number of updates holding or waiting for it
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._depth: Dict[int, int] = {}
+        self._queued = 0
+        self._in_flight = 0
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        mark_first_update()
+        queued_at = time.monotonic()
+        self._queued += 1
+        metrics.set_gauge("updates.queued", self._queued)
+        
+        user: User = data.get("event_from_user")
+        if user is None or self._bypasses(event):
+            return await self._run(handler, event, data, queued_at)
+        
+        user_id = user.id
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        self._depth[user_id] = self._depth.get(user_id, 0) + 1
+        metrics.set_gauge("updates.user_queue_max", max(self._depth.values()))
+        
+        try:
+            async with lock:
+                return await self._run(handler, event, data, queued_at)
+        finally:
+            self._depth[user_id] -= 1
+            if not self._depth[user_id]:
+                del self._depth[user_id]
+                del self._locks[user_id]
+    
+    def _bypasses(self, event: TelegramObject) -> bool:
+        callback_query = getattr(event, "callback_query", None)
+        return callback_query is not None and callback_query.data in self._bypass
+    
+    async def _run(self, handler, event, data, queued_at: float) -> Any:
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._queued -= 1
+            metrics.set_gauge("updates.queued", self._queued)
+        
+        metrics.observe("updates.wait", time.monotonic() - queued_at)
+        self._in_flight += 1
+        metrics.set_gauge("updates.in_flight", self._in_flight)
+        try:
+            return await handler(event, data)
+        finally:
+            self._in_flight -= 1
+            metrics.set_gauge("updates.in_flight", self._in_flight)
+            self._semaphore.release()
@@ -0,0 +1,346 @@
+"""
+Versioned schema migrations.
+
+Every migration runs once; applied versions are recorded in the schema_migrations table, so a
+startup with nothing pending costs a single query. Run them as a separate deploy step with
+
+    python -m bot.migrations            # apply pending migrations
+    python -m bot.migrations --status   # list migrations and whether they are applied
+
+and set AUTO_MIGRATE=false to keep them out of bot startup entirely.
+"""
+import argparse
+import asyncio
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Tuple, Union
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import ProgrammingError
+from loguru import logger
+
+from bot.database import engine
+from bot.models import Base
+
+
+# Raw SQL, or a sync callable run with the connection (e.g. metadata.create_all)
+Step = Union[str, Callable[[Connection], None]]
+
+# pg_advisory_lock key, so two processes starting together don't migrate at the same time
+LOCK_KEY = 7_215_004
+
+CONCURRENT_INDEX = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE)
+
+INVALID_INDEX = """
+SELECT c.relname FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+WHERE c.relname = ANY(:names) AND pg_table_is_visible(c.oid) AND NOT i.indisvalid
+"""
+
+VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    applied_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+)
+"""
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    One schema change.
+    
+    A transactional migration runs its steps and records its version in one transaction.
+    Statements Postgres refuses inside a transaction (CREATE INDEX CONCURRENTLY) need
+    transactional=False: each step then commits on its own, so it must be safe to repeat. A
+    failed CONCURRENTLY build leaves an invalid index that IF NOT EXISTS would skip, so the
+    runner drops an invalid index before building it again, and only records the migration
+    once every index it builds is valid.
+    An optional migration that fails is logged and left pending, so it can't block startup
+    and is retried on the next run (e.g. once the missing privilege is granted).
+    """
+    version: int
+    name: str
+    steps: Tuple[Step, ...]
+    transactional: bool = True
+    optional: bool = False
+
+
+def _create_tables(connection: Connection):
+    Base.metadata.create_all(connection)
+
+
+def _duration_backfill(table: str) -> str:
+    """Fill duration_days (and rewrite the legacy "7d|7 Days" / "7d" labels) from the duration text"""
+    return rf"""
+    UPDATE {table} AS t
+    SET duration_days = p.num * CASE WHEN p.unit = 'm' THEN 30 ELSE 1 END,
+        duration = CASE
+            WHEN t.duration LIKE '%|%' THEN split_part(t.duration, '|', 2)
+            WHEN t.duration ~* '^\d+[dm]$' THEN p.num || CASE WHEN p.unit = 'm' THEN ' Month' ELSE ' Day' END
+                || CASE WHEN p.num > 1 THEN 's' ELSE '' END
+            ELSE t.duration
+        END
+    FROM (
+        SELECT id, m[1]::int AS num, lower(m[2]) AS unit
+        FROM (
+            SELECT id, regexp_match(split_part(duration, '|', 1), '^\s*(\d+)\s*(d|m)[a-z]*\s*$', 'i') AS m
+            FROM {table}
+        ) AS matched
+        WHERE m IS NOT NULL AND m[1]::int > 0
+    ) AS p
+    WHERE t.id = p.id
+      AND NOT EXISTS (SELECT 1 FROM {table} WHERE duration_days IS NOT NULL)
+    """
+
+
+def _report_unparsed_durations(connection: Connection):
+    """Warn about prices and keys whose label the backfill couldn't read: they are never sold"""
+    for table in ("product_prices", "product_keys"):
+        rows = connection.execute(text(f"""
+            SELECT duration, count(*) AS rows FROM {table}
+            WHERE duration_days IS NULL GROUP BY duration ORDER BY rows DESC
+        """)).all()
+        if not rows:
+            continue
+        total = sum(row.rows for row in rows)
+        labels = ", ".join(f"{row.duration!r} ({row.rows})" for row in rows[:10])
+        logger.warning(
+            f"⚠️ {total} rows in {table} have a duration that isn't a number of days or months "
+            f"and were left without duration_days; they don't count as stock and can't be sold "
+            f"until fixed. Labels: {labels}"
+        )
+
+
+MIGRATIONS: List[Migration] = [
+    # Everything the old startup scripts (migrate_banned, migrate_prices, migrate_purchases) did.
+    # Databases that already ran them find every step a no-op; the backfills check for that.
+    Migration(1, "baseline", (
+        _create_tables,
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS is_banned BOOLEAN NOT NULL DEFAULT FALSE",
+        """
+        DO $$
+        BEGIN
+            IF (SELECT data_type FROM information_schema.columns
+                WHERE table_name = 'product_prices' AND column_name = 'price') <> 'numeric' THEN
+                ALTER TABLE product_prices ALTER COLUMN price TYPE NUMERIC(10, 2);
+            END IF;
+            IF (SELECT data_type FROM information_schema.columns
+                WHERE table_name = 'users' AND column_name = 'balance') <> 'numeric' THEN
+                UPDATE users SET balance = 99999999.99 WHERE balance > 99999999.99;
+                ALTER TABLE users ALTER COLUMN balance TYPE NUMERIC(10, 2);
+            END IF;
+        END $$
+        """,
+        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS purchase_token VARCHAR(32)",
+        "ALTER TABLE product_keys ADD COLUMN IF NOT EXISTS reserved_until TIMESTAMP WITHOUT TIME ZONE",
+        "ALTER TABLE product_keys ADD COLUMN IF NOT EXISTS reserved_by INTEGER",
+        """
+        INSERT INTO sales_rollups (bucket, product_id, duration, orders_count, revenue)
+        SELECT date_trunc('hour', purchased_at), product_id, duration, COUNT(*), SUM(price)
+        FROM orders
+        WHERE NOT EXISTS (SELECT 1 FROM sales_rollups)
+        GROUP BY 1, 2, 3
+        """,
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS total_spent NUMERIC(12, 2) NOT NULL DEFAULT 0",
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS orders_count INTEGER NOT NULL DEFAULT 0",
+        """
+        ALTER TABLE product_keys ADD COLUMN IF NOT EXISTS batch_id INTEGER
+        REFERENCES key_batches (id) ON DELETE SET NULL
+        """,
+        """
+        UPDATE users
+        SET total_spent = totals.spent, orders_count = totals.orders
+        FROM (
+            SELECT user_id, SUM(price) AS spent, COUNT(*) AS orders
+            FROM orders
+            GROUP BY user_id
+        ) AS totals
+        WHERE users.id = totals.user_id
+          AND NOT EXISTS (SELECT 1 FROM users WHERE orders_count > 0)
+        """,
+        "ALTER TABLE product_prices ADD COLUMN IF NOT EXISTS duration_days INTEGER",
+        "ALTER TABLE product_keys ADD COLUMN IF NOT EXISTS duration_days INTEGER",
+        _duration_backfill("product_prices"),
+        _duration_backfill("product_keys"),
+        _report_unparsed_durations,
+    )),
+    # Indexes on tables that may already be large; built without blocking purchases
+    Migration(2, "indexes", (
+        """
+        CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_orders_user_purchase_token
+        ON orders (user_id, purchase_token)
+        """,
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_product_keys_stock
+        ON product_keys (product_id, is_used, reserved_until)
+        """,
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_total_spent ON users (total_spent DESC)",
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_user_history
+        ON orders (user_id, purchased_at DESC, id DESC)
+        INCLUDE (product_name, duration, price, key_value)
+        """,
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_username_lower
+        ON users (lower(username) text_pattern_ops)
+        """,
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_product_keys_batch_id ON product_keys (batch_id)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_product_keys_used_at ON product_keys (updated_at) WHERE is_used",
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_product_keys_duration_stock
+        ON product_keys (product_id, duration_days) WHERE NOT is_used
+        """,
+    ), transactional=False),
+    # Substring user search; needs the pg_trgm extension, without it search falls back to scans
+    Migration(3, "trigram_search", (
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_username_trgm
+        ON users USING gin (lower(username) gin_trgm_ops)
+        """,
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_first_name_trgm
+        ON users USING gin (lower(first_name) gin_trgm_ops)
+        """,
+    ), transactional=False, optional=True),
+    # The cache warm-up reads the most recently active users
+    Migration(4, "users_last_seen_at", (
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMP WITHOUT TIME ZONE",
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_last_seen_at
+        ON users (last_seen_at DESC NULLS LAST)
+        """,
+    ), transactional=False),
+    # Keys moved out by the archiver keep counting towards product and batch totals
+    Migration(5, "archived_keys_counts", (
+        "ALTER TABLE products ADD COLUMN IF NOT EXISTS archived_keys_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE key_batches ADD COLUMN IF NOT EXISTS archived_keys_count INTEGER NOT NULL DEFAULT 0",
+        """
+        UPDATE products SET archived_keys_count = archived.moved
+        FROM (SELECT product_id, count(*) AS moved FROM archived_keys GROUP BY product_id) AS archived
+        WHERE products.id = archived.product_id
+        """,
+        """
+        UPDATE key_batches SET archived_keys_count = archived.moved
+        FROM (
+            SELECT batch_id, count(*) AS moved FROM archived_keys
+            WHERE batch_id IS NOT NULL GROUP BY batch_id
+        ) AS archived
+        WHERE key_batches.id = archived.batch_id
+        """,
+    )),
+]
+
+
+async def applied_versions() -> set:
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(text("SELECT version FROM schema_migrations"))
+            return set(result.scalars().all())
+    except ProgrammingError:
+        # Fresh database: the version table is created by the first migrate()
+        return set()
+
+
+async def pending_migrations() -> List[Migration]:
+    applied = await applied_versions()
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+
+async def _invalid_indexes(conn, names: List[str]) -> List[str]:
+    result = await conn.execute(text(INVALID_INDEX), {"names": names})
+    return list(result.scalars().all())
+
+
+async def _run_steps(conn, migration: Migration):
+    built = []
+    for step in migration.steps:
+        if callable(step):
+            await conn.run_sync(step)
+            continue
+        match = CONCURRENT_INDEX.search(step)
+        if match:
+            name = match.group(1)
+            built.append(name)
+            # Left behind by an interrupted build; IF NOT EXISTS would keep it as it is
+            if await _invalid_indexes(conn, [name]):
+                logger.warning(f"⚠️ Dropping invalid index {name} before rebuilding it")
+                await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        await conn.execute(text(step))
+    
+    if built:
+        invalid = await _invalid_indexes(conn, built)
+        if invalid:
+            raise RuntimeError(f"indexes left invalid: {', '.join(invalid)}")
+    await _record(conn, migration)
+
+
+async def _record(conn, migration: Migration):
+    await conn.execute(
+        text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name) ON CONFLICT DO NOTHING"),
+        {"version": migration.version, "name": migration.name}
+    )
+
+
+async def _apply(migration: Migration) -> bool:
+    """Run one migration; False if it was optional and failed"""
+    started = time.monotonic()
+    try:
+        if migration.transactional:
+            async with engine.begin() as conn:
+                await _run_steps(conn, migration)
+        else:
+            async with engine.connect() as conn:
+                await conn.execution_options(isolation_level="AUTOCOMMIT")
+                await _run_steps(conn, migration)
+    except Exception as e:
+        if not migration.optional:
+            logger.error(f"❌ Migration {migration.version} ({migration.name}) failed: {e}")
+            raise
+        logger.warning(f"⚠️ Skipped optional migration {migration.version} ({migration.name}), retrying next run: {e}")
+        return False
+    logger.info(f"🗄️ Migration {migration.version} ({migration.name}) applied in {time.monotonic() - started:.1f}s")
+    return True
+
+
+async def migrate() -> int:
+    """Apply pending migrations in order and return how many ran"""
+    if not await pending_migrations():
+        logger.info("✅ Database schema is up to date")
+        return 0
+    
+    async with engine.connect() as lock:
+        await lock.execution_options(isolation_level="AUTOCOMMIT")
+        await lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": LOCK_KEY})
+        try:
+            await lock.execute(text(VERSION_TABLE))
+            # Another process may have applied some while we waited for the lock
+            applied = 0
+            for migration in await pending_migrations():
+                applied += await _apply(migration)
+        finally:
+            await lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+    
+    logger.info(f"✅ Applied {applied} migrations")
+    return applied
+
+
+async def _status():
+    applied = await applied_versions()
+    for migration in MIGRATIONS:
+        mark = "✅" if migration.version in applied else "⏳"
+        print(f"{mark} {migration.version:>4}  {migration.name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending database migrations")
+    parser.add_argument("--status", action="store_true", help="list migrations and whether they are applied")
+    args = parser.parse_args()
+    asyncio.run(_status() if args.status else migrate())
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,13 @@ from .base import Base, TimestampMixin
 from .user import User, UserStatus
 from .admin import Admin
 from .product import Product, ProductPrice
-from .key import ProductKey
+from .key import ProductKey, KeyBatch, ArchivedKey
 from .order import Order
 from .seller import TrustedSeller
+from .media import MediaFile
+from .fsm import FSMRecord
+from .ledger import BalanceTransaction
+from .sales import SalesRollup
 
 __all__ = [
     "Base",
@@ -15,6 +19,12 @@ __all__ = [
     "Product",
     "ProductPrice",
     "ProductKey",
+    "KeyBatch",
+    "ArchivedKey",
     "Order",
     "TrustedSeller",
+    "MediaFile",
+    "FSMRecord",
+    "BalanceTransaction",
+    "SalesRollup",
 ]
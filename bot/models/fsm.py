@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, Text, DateTime
+from .base import Base, TimestampMixin
+
+
+class FSMRecord(Base, TimestampMixin):
+    __tablename__ = "fsm_states"
+    
+    key = Column(String(255), primary_key=True)
+    state = Column(String(255), nullable=True)
+    data = Column(Text, nullable=True)  # JSON-encoded FSM data
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<FSMRecord(key={self.key}, state={self.state})>"
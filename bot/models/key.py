@@ -1,18 +1,70 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, ForeignKey, DateTime, Index, text
 from sqlalchemy.orm import relationship
 from .base import Base, TimestampMixin
 
 
+class KeyBatch(Base, TimestampMixin):
+    """One bulk key import; every key it added points back to it"""
+    __tablename__ = "key_batches"
+    __table_args__ = (
+        Index("ix_key_batches_product", "product_id", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    source = Column(String(16), nullable=False)  # bot | web
+    created_by = Column(BigInteger, nullable=True)  # Telegram ID of the admin who imported it
+    keys_count = Column(Integer, default=0, nullable=False)
+    # Claimed keys of this batch moved to archived_keys, kept up to date by the archiver
+    archived_keys_count = Column(Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f"<KeyBatch(id={self.id}, product_id={self.product_id}, keys_count={self.keys_count})>"
+
+
 class ProductKey(Base, TimestampMixin):
     __tablename__ = "product_keys"
+    __table_args__ = (
+        # Stock lookups and reservations filter on these together
+        Index("ix_product_keys_stock", "product_id", "is_used", "reserved_until"),
+        # Unused stock per duration: reservations and the per-duration counts
+        Index("ix_product_keys_duration_stock", "product_id", "duration_days", postgresql_where=text("NOT is_used")),
+        # Lets the archiver find old claimed keys without scanning live stock
+        Index("ix_product_keys_used_at", "updated_at", postgresql_where=text("is_used")),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     key_value = Column(String(500), nullable=False)
     duration = Column(String(100), nullable=False)
+    duration_days = Column(Integer, nullable=True)
     is_used = Column(Boolean, default=False, nullable=False)
+    # A hold placed when the user opens the confirm screen; expired holds are simply ignored
+    reserved_until = Column(DateTime, nullable=True)
+    reserved_by = Column(Integer, nullable=True)
+    batch_id = Column(Integer, ForeignKey("key_batches.id", ondelete="SET NULL"), nullable=True, index=True)
     
     product = relationship("Product", back_populates="keys")
     
     def __repr__(self):
         return f"<ProductKey(id={self.id}, product_id={self.product_id}, is_used={self.is_used})>"
+
+
+class ArchivedKey(Base):
+    """Cold storage for claimed keys moved out of product_keys by the key archiver"""
+    __tablename__ = "archived_keys"
+    __table_args__ = (
+        Index("ix_archived_keys_product", "product_id"),
+    )
+    
+    id = Column(Integer, primary_key=True)  # the key's id in product_keys
+    product_id = Column(Integer, nullable=False)
+    key_value = Column(String(500), nullable=False)
+    duration = Column(String(100), nullable=False)
+    batch_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<ArchivedKey(id={self.id}, product_id={self.product_id})>"
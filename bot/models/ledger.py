@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Numeric, ForeignKey, Index
+from .base import Base, TimestampMixin
+
+
+class BalanceTransaction(Base, TimestampMixin):
+    """Append-only record of every balance change; rows are never updated or deleted"""
+    __tablename__ = "balance_transactions"
+    __table_args__ = (
+        Index("ix_balance_transactions_user", "user_id", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    amount = Column(Numeric(10, 2), nullable=False)
+    balance_after = Column(Numeric(10, 2), nullable=False)
+    kind = Column(String(32), nullable=False)  # purchase | admin_credit | admin_debit | adjustment
+    note = Column(String(255), nullable=True)
+    actor_id = Column(BigInteger, nullable=True)  # Telegram ID of the admin who made the change
+    
+    def __repr__(self):
+        return f"<BalanceTransaction(user_id={self.user_id}, amount={self.amount}, kind={self.kind})>"
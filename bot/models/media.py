@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String
+from .base import Base, TimestampMixin
+
+
+class MediaFile(Base, TimestampMixin):
+    __tablename__ = "media_files"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    file_hash = Column(String(64), unique=True, nullable=False, index=True)
+    path = Column(String(500), nullable=False)
+    file_id = Column(String(500), nullable=False)
+    
+    def __repr__(self):
+        return f"<MediaFile(id={self.id}, path={self.path})>"
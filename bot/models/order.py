@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, BigInteger, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Float, ForeignKey, DateTime, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .base import Base, TimestampMixin
@@ -6,6 +6,10 @@ from .base import Base, TimestampMixin
 
 class Order(Base, TimestampMixin):
     __tablename__ = "orders"
+    __table_args__ = (
+        # A repeated confirm with the same token can never create a second order
+        UniqueConstraint("user_id", "purchase_token", name="uq_orders_user_purchase_token"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -15,9 +19,20 @@ class Order(Base, TimestampMixin):
     price = Column(Float, nullable=False)
     key_value = Column(String(500), nullable=True)
     purchased_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    purchase_token = Column(String(32), nullable=True)
     
     user = relationship("User", back_populates="orders")
     product = relationship("Product", back_populates="orders")
     
     def __repr__(self):
         return f"<Order(id={self.id}, user_id={self.user_id}, product_name={self.product_name})>"
+
+
+# A user's order history newest first; INCLUDE lets the list be read from the index alone
+Index(
+    "ix_orders_user_history",
+    Order.user_id,
+    Order.purchased_at.desc(),
+    Order.id.desc(),
+    postgresql_include=["product_name", "duration", "price", "key_value"]
+)
@@ -13,10 +13,19 @@ class Product(Base, TimestampMixin):
     description = Column(Text, nullable=True)
     image_file_id = Column(String(500), nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
+    # Claimed keys moved to archived_keys, kept up to date by the archiver; they still count as used
+    archived_keys_count = Column(Integer, default=0, nullable=False)
     
-    prices = relationship("ProductPrice", back_populates="product", lazy="selectin", cascade="all, delete-orphan")
-    keys = relationship("ProductKey", back_populates="product", lazy="selectin", cascade="all, delete-orphan")
-    orders = relationship("Order", back_populates="product", lazy="selectin")
+    prices = relationship(
+        "ProductPrice",
+        back_populates="product",
+        lazy="selectin",
+        cascade="all, delete-orphan",
+        order_by="ProductPrice.duration_days"
+    )
+    # Keys and orders are never loaded with the product; ProductService queries them directly
+    keys = relationship("ProductKey", back_populates="product", lazy="raise")
+    orders = relationship("Order", back_populates="product", lazy="raise")
     
     def __repr__(self):
         return f"<Product(id={self.id}, name={self.name})>"
@@ -27,7 +36,8 @@ class ProductPrice(Base, TimestampMixin):
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
-    duration = Column(String(100), nullable=False)
+    duration = Column(String(100), nullable=False)  # display label, e.g. "7 Days"
+    duration_days = Column(Integer, nullable=True)  # what keys, sorting and stock match on
     price = Column(Numeric(10, 2), nullable=False)
     
     product = relationship("Product", back_populates="prices")
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Index
+from .base import Base
+
+
+class SalesRollup(Base):
+    """Orders and revenue per hour, product and duration; maintained alongside every order"""
+    __tablename__ = "sales_rollups"
+    __table_args__ = (
+        Index("ix_sales_rollups_product", "product_id", "bucket"),
+    )
+    
+    bucket = Column(DateTime, primary_key=True)  # start of the hour, UTC
+    product_id = Column(Integer, primary_key=True)
+    duration = Column(String(100), primary_key=True)
+    orders_count = Column(Integer, default=0, nullable=False)
+    revenue = Column(Numeric(12, 2), default=0, nullable=False)
+    
+    def __repr__(self):
+        return f"<SalesRollup(bucket={self.bucket}, product_id={self.product_id}, duration={self.duration})>"
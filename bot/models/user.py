@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Numeric, DateTime, Enum as SQLEnum
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Numeric, DateTime, Index, func, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -24,8 +24,28 @@ class User(Base, TimestampMixin):
     is_reseller = Column(Boolean, default=False, nullable=False)
     is_banned = Column(Boolean, default=False, nullable=False)
     last_purchase_at = Column(DateTime, nullable=True)
+    # Written behind by profile_buffer, to the minute
+    last_seen_at = Column(DateTime, nullable=True)
+    # Lifetime purchase totals, kept up to date by each order's transaction
+    total_spent = Column(Numeric(12, 2), default=0, nullable=False)
+    orders_count = Column(Integer, default=0, nullable=False)
 
-    orders = relationship("Order", back_populates="user", lazy="selectin")
+    # Never loaded with the user; order history is read page by page through OrderService
+    orders = relationship("Order", back_populates="user", lazy="raise")
 
     def __repr__(self):
-        return f"<User(id={self.id}, telegram_id={self.telegram_id}, status={self.status})>"
\ No newline at end of file
+        return f"<User(id={self.id}, telegram_id={self.telegram_id}, status={self.status})>"
+
+
+# Top buyers leaderboard reads this index top-down
+Index("ix_users_total_spent", User.total_spent.desc())
+
+# Recently active users, preloaded into the cache after a deploy
+Index("ix_users_last_seen_at", User.last_seen_at.desc().nulls_last())
+
+# Case-insensitive username lookups and prefix search (LIKE 'abc%')
+Index(
+    "ix_users_username_lower",
+    func.lower(User.username).label("username_lower"),
+    postgresql_ops={"username_lower": "text_pattern_ops"}
+)
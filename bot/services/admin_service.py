@@ -1,35 +1,35 @@
-from typing import Optional, List
-from sqlalchemy import select, delete
+from typing import Optional, Set
+from sqlalchemy import select, delete, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 
 from bot.models import Admin
 from bot.services.cache import cache
 from bot.config import config
+from bot.utils.pagination import Page, paginate
+
+ADMIN_IDS_KEY = "admins:ids"
 
 
 class AdminService:
     def __init__(self, session: AsyncSession):
         self.session = session
     
-    async def is_admin(self, telegram_id: int) -> bool:
-        cache_key = f"is_admin:{telegram_id}"
-        cached = await cache.get(cache_key)
-        
+    async def get_admin_ids(self, refresh: bool = False) -> Set[int]:
+        """Telegram IDs of all admins, cached as one entry that answers for admins and non-admins alike"""
+        cached = None if refresh else await cache.get(ADMIN_IDS_KEY)
         if cached is not None:
-            return cached
+            return set(cached)
         
+        result = await self.session.execute(select(Admin.telegram_id))
+        admin_ids = set(result.scalars().all())
+        await cache.set(ADMIN_IDS_KEY, sorted(admin_ids), expire=600)
+        return admin_ids
+    
+    async def is_admin(self, telegram_id: int) -> bool:
         if telegram_id == config.bot.root_admin_id:
-            await cache.set(cache_key, True, expire=600)
             return True
-        
-        stmt = select(Admin).where(Admin.telegram_id == telegram_id)
-        result = await self.session.execute(stmt)
-        admin = result.scalar_one_or_none()
-        
-        is_admin = admin is not None
-        await cache.set(cache_key, is_admin, expire=600)
-        return is_admin
+        return telegram_id in await self.get_admin_ids()
     
     async def is_root_admin(self, telegram_id: int) -> bool:
         return telegram_id == config.bot.root_admin_id
@@ -46,7 +46,7 @@ class AdminService:
         )
         self.session.add(admin)
         await self.session.commit()
-        await cache.delete(f"is_admin:{telegram_id}")
+        await cache.delete(ADMIN_IDS_KEY)
         logger.info(f"👑 New admin added: {telegram_id}")
         return True
     
@@ -58,7 +58,7 @@ class AdminService:
         stmt = delete(Admin).where(Admin.telegram_id == telegram_id)
         result = await self.session.execute(stmt)
         await self.session.commit()
-        await cache.delete(f"is_admin:{telegram_id}")
+        await cache.delete(ADMIN_IDS_KEY)
         
         if result.rowcount > 0:
             logger.info(f"🗑️ Admin removed: {telegram_id}")
@@ -79,7 +79,7 @@ class AdminService:
         
         await self.session.delete(admin)
         await self.session.commit()
-        await cache.delete(f"is_admin:{admin.telegram_id}")
+        await cache.delete(ADMIN_IDS_KEY)
         logger.info(f"🗑️ Admin removed by ID: {admin_id}")
         return True
     
@@ -88,10 +88,18 @@ class AdminService:
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
     
-    async def get_all_admins(self) -> List[Admin]:
-        stmt = select(Admin).order_by(Admin.created_at.desc())
+    async def get_admins_page(self, cursor: Optional[str] = None, limit: int = 20) -> Page:
+        return await paginate(self.session, select(Admin), Admin.id, cursor=cursor, limit=limit)
+    
+    async def get_admins_count(self) -> int:
+        stmt = select(func.count(Admin.id))
         result = await self.session.execute(stmt)
-        return list(result.scalars().all())
+        return result.scalar() or 0
+    
+    async def get_admin_by_id(self, admin_id: int) -> Optional[Admin]:
+        stmt = select(Admin).where(Admin.id == admin_id)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
     
     async def ensure_root_admin(self):
         if config.bot.root_admin_id:
@@ -1,18 +1,26 @@
 import json
 import os
-from typing import Optional, Any
+from typing import Optional, Any, Callable, Dict, List, Tuple
 from urllib.parse import unquote
 import aiohttp
 from loguru import logger
 
 from bot.config import config
 
+DELETE_BATCH = 500
+PIPELINE_BATCH = 200
+
 
 class CacheService:
     def __init__(self):
         self._connected = False
         self._rest_url = None
         self._rest_token = None
+        self._listeners: List[Tuple[str, Callable[[List[str]], None]]] = []
+    
+    @property
+    def connected(self) -> bool:
+        return self._connected
     
     async def connect(self):
         self._rest_url = os.getenv("UPSTASH_REDIS_REST_URL", "").strip().strip('"\'') or os.getenv("REDIS_REST_URL", "").strip().strip('"\'')
@@ -61,6 +69,25 @@ class CacheService:
             logger.error(f"Redis REST error: {e}")
             return None
     
+    async def _pipeline(self, commands: List[list]) -> Optional[list]:
+        """Send several commands in one request through the REST /pipeline endpoint"""
+        if not self._connected:
+            return None
+        try:
+            async with aiohttp.ClientSession() as session:
+                headers = {"Authorization": f"Bearer {self._rest_token}"}
+                async with session.post(
+                    f"{self._rest_url}/pipeline",
+                    headers=headers,
+                    json=commands
+                ) as resp:
+                    if resp.status == 200:
+                        return await resp.json()
+                    return None
+        except Exception as e:
+            logger.error(f"Redis REST pipeline error: {e}")
+            return None
+    
     async def get(self, key: str) -> Optional[Any]:
         if not self._connected:
             return None
@@ -82,11 +109,31 @@ class CacheService:
         except Exception as e:
             logger.error(f"Redis set error: {e}")
     
+    async def set_many(self, values: Dict[str, Any], expire: int = 300):
+        """Set many keys with one pipelined request per PIPELINE_BATCH keys"""
+        if not self._connected or not values:
+            return
+        try:
+            commands = [["SET", key, json.dumps(value), "EX", str(expire)] for key, value in values.items()]
+            for start in range(0, len(commands), PIPELINE_BATCH):
+                await self._pipeline(commands[start:start + PIPELINE_BATCH])
+        except Exception as e:
+            logger.error(f"Redis set error: {e}")
+    
     async def delete(self, key: str):
-        if not self._connected:
+        await self.delete_many([key])
+    
+    async def delete_many(self, keys: List[str]):
+        """Delete any number of keys with one DEL per DELETE_BATCH keys instead of one request each"""
+        if not self._connected or not keys:
             return
+        await self._delete(keys)
+        self._notify(keys)
+    
+    async def _delete(self, keys: List[str]):
         try:
-            await self._request(["DEL", key])
+            for start in range(0, len(keys), DELETE_BATCH):
+                await self._request(["DEL", *keys[start:start + DELETE_BATCH]])
         except Exception as e:
             logger.error(f"Redis delete error: {e}")
     
@@ -101,12 +148,25 @@ class CacheService:
                     break
                 cursor, keys = result[0], result[1]
                 if keys:
-                    for key in keys:
-                        await self._request(["DEL", key])
+                    await self._delete(keys)
                 if cursor == "0":
                     break
         except Exception as e:
             logger.error(f"Redis invalidate error: {e}")
+        self._notify([pattern])
+    
+    def on_invalidate(self, prefix: str, callback: Callable[[List[str]], None]):
+        """
+        Call `callback` with the keys (or the pattern) under `prefix` every time they are
+        deleted, so whoever owns them can load fresh values before the next reader misses.
+        """
+        self._listeners.append((prefix, callback))
+    
+    def _notify(self, keys: List[str]):
+        for prefix, callback in self._listeners:
+            matched = [key for key in keys if key.startswith(prefix)]
+            if matched:
+                callback(matched)
 
 
 cache = CacheService()
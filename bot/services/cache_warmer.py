@@ -0,0 +1,106 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Set
+from loguru import logger
+
+from bot.config import config
+from bot.database import async_session
+from bot.services.admin_service import AdminService
+from bot.services.cache import cache
+from bot.services.metrics import metrics
+from bot.services.product_service import ProductService
+from bot.services.seller_service import SellerService
+from bot.services.user_service import UserService
+
+
+class CacheWarmer:
+    """
+    Loads what nearly every update reads (the catalog, sellers, admin IDs and recently active
+    users) into the cache after a deploy, and reloads a namespace right after it is
+    invalidated, so the next reader hits instead of going to Postgres.
+    
+    Reloads run in the background a moment after the invalidation, so a burst of changes
+    (a bulk price edit, a broadcast of balance updates) costs one reload per namespace.
+    """
+    
+    def __init__(self, recent_users: int, delay: float = 0.5):
+        self.recent_users = recent_users
+        self.delay = delay
+        self._warmers = {
+            "products:": self._warm_catalog,
+            "sellers:": self._warm_sellers,
+            "admins:": self._warm_admins,
+            "user:": self._warm_users,
+        }
+        self._pending: Dict[str, Set[str]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._startup_task: Optional[asyncio.Task] = None
+        self._installed = False
+    
+    def install(self):
+        """Re-warm namespaces after this process invalidates them; every process that writes needs it"""
+        if self._installed:
+            return
+        self._installed = True
+        for prefix in self._warmers:
+            cache.on_invalidate(prefix, lambda keys, prefix=prefix: self._invalidated(prefix, keys))
+    
+    def start(self):
+        """Preload every namespace in the background, and keep them warm from then on"""
+        self.install()
+        if cache.connected and (self._startup_task is None or self._startup_task.done()):
+            self._startup_task = asyncio.create_task(self.warm())
+    
+    async def warm(self):
+        started = time.monotonic()
+        await asyncio.gather(*(self._warm(prefix) for prefix in self._warmers))
+        logger.info(f"🔥 Cache warmed in {(time.monotonic() - started) * 1000:.0f} ms")
+    
+    def _invalidated(self, prefix: str, keys: List[str]):
+        self._pending.setdefault(prefix, set()).update(keys)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        while self._pending:
+            await asyncio.sleep(self.delay)
+            pending, self._pending = self._pending, {}
+            for prefix, keys in pending.items():
+                await self._warm(prefix, keys)
+    
+    async def _warm(self, prefix: str, keys: Optional[Set[str]] = None):
+        started = time.monotonic()
+        try:
+            async with async_session() as session:
+                await self._warmers[prefix](session, keys)
+        except Exception as e:
+            logger.warning(f"Cache warm-up of {prefix}* failed: {e}")
+            return
+        metrics.observe(f"cache.warm.{prefix.rstrip(':')}", time.monotonic() - started)
+    
+    async def _warm_catalog(self, session, keys):
+        await ProductService(session).get_catalog(refresh=True)
+    
+    async def _warm_sellers(self, session, keys):
+        seller_service = SellerService(session)
+        await seller_service.get_all_sellers(active_only=True, refresh=True)
+        await seller_service.get_all_sellers(active_only=False, refresh=True)
+    
+    async def _warm_admins(self, session, keys):
+        await AdminService(session).get_admin_ids(refresh=True)
+    
+    async def _warm_users(self, session, keys):
+        # Single invalidated users are reloaded by id; the startup run takes the most recent ones
+        suffixes = [key[len("user:"):] for key in keys or ()]
+        if suffixes and all(suffix.isdigit() for suffix in suffixes):
+            await UserService(session).cache_users([int(suffix) for suffix in suffixes])
+        else:
+            await UserService(session).cache_users(recent=self.recent_users)
+    
+    async def close(self):
+        for task in (self._task, self._startup_task):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+cache_warmer = CacheWarmer(recent_users=config.bot.cache_warm_users)
@@ -0,0 +1,146 @@
+import asyncio
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from loguru import logger
+
+from bot.database import async_session
+from bot.services.metrics import metrics
+from bot.services.product_service import ProductService
+
+REPORT_INTERVAL = 2.0
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    description: str
+    status: str = "running"  # running | done | failed
+    done: int = 0
+    total: Optional[int] = None
+    error: Optional[str] = None
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    report: Optional[Callable[["Job"], Awaitable[None]]] = field(default=None, repr=False)
+    _reported_at: float = field(default=0.0, repr=False)
+    
+    async def progress(self, count: int):
+        """Add `count` processed items and tell the reporter, at most every couple of seconds"""
+        self.done += count
+        if self.report and time.monotonic() - self._reported_at >= REPORT_INTERVAL:
+            self._reported_at = time.monotonic()
+            await self._report()
+    
+    async def _report(self):
+        try:
+            await self.report(self)
+        except Exception as e:
+            # A progress message that can't be edited must not stop the job itself
+            logger.warning(f"Job {self.id} progress report failed: {e}")
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "description": self.description,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "error": self.error,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobManager:
+    """
+    Runs long admin operations (bulk deletes) as background tasks of this process.
+    
+    The request that starts a job returns at once; progress goes to the job's reporter
+    (e.g. an admin message being edited) and can be polled by id. Only the most recent
+    finished jobs are remembered.
+    """
+    
+    def __init__(self, keep_finished: int = 50):
+        self.keep_finished = keep_finished
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+    
+    def submit(
+        self,
+        kind: str,
+        description: str,
+        work: Callable[[Job], Awaitable[Any]],
+        report: Optional[Callable[[Job], Awaitable[None]]] = None
+    ) -> Job:
+        job = Job(id=secrets.token_hex(4), kind=kind, description=description, report=report)
+        self._jobs[job.id] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job, work))
+        metrics.incr(f"jobs.{kind}.started")
+        logger.info(f"🧰 Job {job.id} started: {description}")
+        return job
+    
+    async def _run(self, job: Job, work: Callable[[Job], Awaitable[Any]]):
+        try:
+            await work(job)
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Job {job.id} ({job.description}) failed: {e}")
+        finally:
+            job.finished_at = datetime.utcnow()
+            self._tasks.pop(job.id, None)
+            metrics.incr(f"jobs.{job.kind}.{job.status}")
+            metrics.observe(f"jobs.{job.kind}.duration", (job.finished_at - job.started_at).total_seconds())
+            if job.report:
+                await job._report()
+            self._prune()
+        logger.info(f"🧰 Job {job.id} {job.status}: {job.done} items")
+    
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status != "running"]
+        for job_id in finished[:-self.keep_finished]:
+            del self._jobs[job_id]
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+    
+    def recent(self) -> List[Job]:
+        return list(reversed(self._jobs.values()))
+    
+    async def close(self, timeout: float = 10):
+        """Give running jobs a moment to finish their current chunk, then cancel them"""
+        tasks = list(self._tasks.values())
+        if not tasks:
+            return
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+
+def delete_keys_work(product_id: int, claimed_only: bool = False) -> Callable[[Job], Awaitable[None]]:
+    """Job body deleting a product's keys (or only its claimed ones) chunk by chunk"""
+    async def work(job: Job):
+        async with async_session() as session:
+            product_service = ProductService(session)
+            async for count in product_service.delete_keys_in_chunks(product_id, claimed_only=claimed_only):
+                await job.progress(count)
+    return work
+
+
+def delete_product_work(product_id: int) -> Callable[[Job], Awaitable[None]]:
+    """Job body deleting a product; progress counts its deleted keys"""
+    async def work(job: Job):
+        async with async_session() as session:
+            product_service = ProductService(session)
+            async for count in product_service.delete_product_in_chunks(product_id):
+                await job.progress(count)
+    return work
+
+
+job_manager = JobManager()
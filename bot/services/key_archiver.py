@@ -0,0 +1,124 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, delete, insert, update, literal, bindparam
+from loguru import logger
+
+from bot.config import config
+from bot.database import async_session
+from bot.models import Product, ProductKey, KeyBatch, ArchivedKey
+from bot.services.metrics import metrics
+
+
+class KeyArchiver:
+    """
+    Moves claimed keys older than `retention_days` from product_keys into archived_keys.
+    
+    Orders keep their own copy of the key value, so claimed keys are only history; moving
+    them out keeps product_keys (read by every stock check) the size of live inventory.
+    Each chunk is its own short transaction and skips rows another transaction holds; it
+    also adds what it moved to the products' and batches' archived_keys_count, so key
+    totals and used counts don't drop when keys leave product_keys.
+    """
+    
+    def __init__(self, retention_days: int, interval: float, chunk_size: int = 1000):
+        self.retention_days = retention_days
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        if self.retention_days <= 0:
+            logger.info("🗄️ Key archiving disabled")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        while True:
+            try:
+                await self.archive()
+            except Exception as e:
+                logger.error(f"Key archiving failed: {e}")
+            await asyncio.sleep(self.interval)
+    
+    async def _archive_chunk(self, cutoff: datetime) -> int:
+        # updated_at is the moment the key was claimed; used keys are never changed again
+        candidates = select(ProductKey.id).where(
+            ProductKey.is_used == True,
+            ProductKey.updated_at < cutoff
+        ).order_by(ProductKey.updated_at).limit(self.chunk_size).with_for_update(skip_locked=True).scalar_subquery()
+        
+        moved = delete(ProductKey).where(ProductKey.id.in_(candidates)).returning(
+            ProductKey.id,
+            ProductKey.product_id,
+            ProductKey.key_value,
+            ProductKey.duration,
+            ProductKey.batch_id,
+            ProductKey.created_at,
+            ProductKey.updated_at
+        ).cte("moved")
+        
+        stmt = insert(ArchivedKey).from_select(
+            ["id", "product_id", "key_value", "duration", "batch_id", "created_at", "used_at", "archived_at"],
+            select(
+                moved.c.id,
+                moved.c.product_id,
+                moved.c.key_value,
+                moved.c.duration,
+                moved.c.batch_id,
+                moved.c.created_at,
+                moved.c.updated_at,
+                literal(datetime.utcnow())
+            )
+        ).returning(ArchivedKey.product_id, ArchivedKey.batch_id)
+        
+        async with async_session() as session:
+            result = await session.execute(stmt)
+            rows = result.all()
+            if rows:
+                await self._add_archived_counts(session, rows)
+            await session.commit()
+            return len(rows)
+    
+    @staticmethod
+    async def _add_archived_counts(session, rows):
+        per_product = Counter(row.product_id for row in rows)
+        per_batch = Counter(row.batch_id for row in rows if row.batch_id is not None)
+        
+        for table, counts in ((Product.__table__, per_product), (KeyBatch.__table__, per_batch)):
+            if not counts:
+                continue
+            stmt = update(table).where(table.c.id == bindparam("row_id")).values(
+                archived_keys_count=table.c.archived_keys_count + bindparam("moved"),
+                updated_at=table.c.updated_at
+            )
+            await session.execute(stmt, [{"row_id": row_id, "moved": moved} for row_id, moved in counts.items()])
+    
+    async def archive(self) -> int:
+        """Archive everything past retention, chunk by chunk; returns the number of keys moved"""
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        total = 0
+        while True:
+            moved = await self._archive_chunk(cutoff)
+            total += moved
+            if moved < self.chunk_size:
+                break
+            # Let purchases waiting on the table in between chunks
+            await asyncio.sleep(0.1)
+        
+        if total:
+            metrics.incr("keys.archived", total)
+            logger.info(f"🗄️ Archived {total} claimed keys older than {self.retention_days} days")
+        return total
+    
+    async def close(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+
+key_archiver = KeyArchiver(
+    retention_days=config.bot.key_archive_days,
+    interval=config.bot.key_archive_interval
+)
@@ -0,0 +1,109 @@
+import hashlib
+import os
+from typing import Optional, Union, Dict, Tuple
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from aiogram.types import FSInputFile, Message
+from loguru import logger
+
+from bot.models import MediaFile
+from bot.services.cache import cache
+
+
+# path -> (mtime, size, sha256) so the file is only re-hashed when it changes on disk
+_hashes: Dict[str, Tuple[float, int, str]] = {}
+# sha256 -> Telegram file_id, shared by every handler in this process
+_file_ids: Dict[str, str] = {}
+
+
+def file_hash(path: str) -> str:
+    stat = os.stat(path)
+    known = _hashes.get(path)
+    if known and known[0] == stat.st_mtime and known[1] == stat.st_size:
+        return known[2]
+    
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    
+    _hashes[path] = (stat.st_mtime, stat.st_size, digest.hexdigest())
+    return _hashes[path][2]
+
+
+class MediaService:
+    """Resolves local media files to Telegram file_ids so they are uploaded only once."""
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+    
+    async def get_file_id(self, path: str) -> Optional[str]:
+        digest = file_hash(path)
+        
+        if digest in _file_ids:
+            return _file_ids[digest]
+        
+        cache_key = f"media:{digest}"
+        cached = await cache.get(cache_key)
+        if cached:
+            _file_ids[digest] = cached
+            return cached
+        
+        stmt = select(MediaFile.file_id).where(MediaFile.file_hash == digest)
+        result = await self.session.execute(stmt)
+        file_id = result.scalar_one_or_none()
+        
+        if file_id:
+            _file_ids[digest] = file_id
+            await cache.set(cache_key, file_id, expire=86400)
+        return file_id
+    
+    async def get_input(self, path: str) -> Union[str, FSInputFile]:
+        """Return a cached file_id for the file, or an upload if Telegram hasn't seen it yet"""
+        file_id = await self.get_file_id(path)
+        if file_id:
+            return file_id
+        return FSInputFile(path)
+    
+    async def remember(self, path: str, file_id: str):
+        digest = file_hash(path)
+        _file_ids[digest] = file_id
+        
+        stmt = select(MediaFile).where(MediaFile.file_hash == digest)
+        result = await self.session.execute(stmt)
+        media = result.scalar_one_or_none()
+        
+        if media:
+            media.file_id = file_id
+            media.path = path
+        else:
+            self.session.add(MediaFile(file_hash=digest, path=path, file_id=file_id))
+        
+        try:
+            await self.session.commit()
+        except IntegrityError:
+            # Another worker stored the same file concurrently; either file_id is valid
+            await self.session.rollback()
+        
+        await cache.set(f"media:{digest}", file_id, expire=86400)
+        logger.info(f"🖼 Cached Telegram file_id for {os.path.basename(path)}")
+    
+    async def remember_from_message(self, path: str, message: Message):
+        if message.photo:
+            await self.remember(path, message.photo[-1].file_id)
+        elif message.document:
+            await self.remember(path, message.document.file_id)
+    
+    async def forget(self, path: str):
+        """Drop a file_id Telegram rejected so the next send uploads the file again"""
+        digest = file_hash(path)
+        _file_ids.pop(digest, None)
+        await cache.delete(f"media:{digest}")
+        
+        stmt = select(MediaFile).where(MediaFile.file_hash == digest)
+        result = await self.session.execute(stmt)
+        media = result.scalar_one_or_none()
+        if media:
+            await self.session.delete(media)
+            await self.session.commit()
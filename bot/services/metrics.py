@@ -0,0 +1,61 @@
+from collections import defaultdict
+from typing import Dict
+
+
+class MetricsService:
+    """In-process counters, gauges and timings, exposed through /api/metrics."""
+    
+    def __init__(self):
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, dict] = {}
+    
+    def incr(self, name: str, value: float = 1):
+        self._counters[name] += value
+    
+    def set_gauge(self, name: str, value: float):
+        self._gauges[name] = value
+    
+    def observe(self, name: str, seconds: float):
+        timing = self._timings.get(name)
+        if timing is None:
+            timing = self._timings[name] = {"count": 0, "total": 0.0, "max": 0.0}
+        timing["count"] += 1
+        timing["total"] += seconds
+        timing["max"] = max(timing["max"], seconds)
+    
+    def get(self, name: str) -> float:
+        return self._counters.get(name, 0)
+    
+    def api_calls_per_handler(self) -> dict:
+        """Telegram API calls made per handled update, keyed by handler name"""
+        stats = {}
+        for name, value in self._counters.items():
+            if not name.startswith("handler.") or not name.endswith(".updates"):
+                continue
+            handler = name[len("handler."):-len(".updates")]
+            calls = self._counters.get(f"handler.{handler}.api_calls", 0)
+            stats[handler] = {
+                "updates": int(value),
+                "api_calls": int(calls),
+                "calls_per_update": round(calls / value, 2) if value else 0.0,
+            }
+        return stats
+    
+    def snapshot(self) -> dict:
+        return {
+            "counters": dict(self._counters),
+            "gauges": dict(self._gauges),
+            "timings": {
+                name: {
+                    "count": t["count"],
+                    "avg_ms": round(t["total"] / t["count"] * 1000, 2) if t["count"] else 0.0,
+                    "max_ms": round(t["max"] * 1000, 2),
+                }
+                for name, t in self._timings.items()
+            },
+            "api_calls": self.api_calls_per_handler(),
+        }
+
+
+metrics = MetricsService()
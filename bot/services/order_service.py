@@ -1,5 +1,6 @@
-from typing import Optional, List
+from typing import Optional, List, AsyncIterator
 from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from datetime import datetime
@@ -7,6 +8,8 @@ from loguru import logger
 
 from bot.models import Order, User, Product
 from bot.services.cache import cache
+from bot.services.sales_service import SalesService
+from bot.utils.pagination import Page, paginate
 
 
 class OrderService:
@@ -20,8 +23,15 @@ class OrderService:
         product_name: str,
         duration: str,
         price: float,
-        key_value: Optional[str] = None
-    ) -> Order:
+        key_value: Optional[str] = None,
+        purchase_token: Optional[str] = None
+    ) -> Optional[Order]:
+        """Create an order, or return None if this purchase_token was already used by the user.
+        
+        Anything else pending in the session (such as marking the key used) is committed
+        together with the order and rolled back with it on a duplicate.
+        """
+        purchased_at = datetime.utcnow()
         order = Order(
             user_id=user_id,
             product_id=product_id,
@@ -29,22 +39,71 @@ class OrderService:
             duration=duration,
             price=price,
             key_value=key_value,
-            purchased_at=datetime.utcnow()
+            purchased_at=purchased_at,
+            purchase_token=purchase_token
         )
-        self.session.add(order)
         
-        stmt = select(User).where(User.id == user_id)
-        result = await self.session.execute(stmt)
-        user = result.scalar_one_or_none()
-        if user:
-            user.last_purchase_at = datetime.utcnow()
+        # Autoflush sends the order with the next query, so the duplicate check covers it too
+        try:
+            self.session.add(order)
+            await SalesService(self.session).record_sale(product_id, duration, price, purchased_at)
+            
+            stmt = select(User).where(User.id == user_id)
+            result = await self.session.execute(stmt)
+            user = result.scalar_one_or_none()
+            if user:
+                user.last_purchase_at = purchased_at
+                # Incremented in SQL so concurrent orders of the same user can't lose an update
+                user.total_spent = User.total_spent + price
+                user.orders_count = User.orders_count + 1
+            
+            await self.session.commit()
+        except IntegrityError:
+            await self.session.rollback()
+            logger.warning(f"🔁 Duplicate purchase token {purchase_token} for user {user_id}")
+            return None
         
-        await self.session.commit()
         await self.session.refresh(order)
         await cache.invalidate_pattern("orders:*")
+        if purchase_token:
+            await cache.set(self._purchase_key(user_id, purchase_token), self._receipt(order), expire=86400)
         logger.info(f"📦 Order created: {order.id} for user {user_id}")
         return order
     
+    @staticmethod
+    def _purchase_key(user_id: int, purchase_token: str) -> str:
+        return f"purchase:{user_id}:{purchase_token}"
+    
+    @staticmethod
+    def _receipt(order: Order) -> dict:
+        return {
+            "order_id": order.id,
+            "product_name": order.product_name,
+            "duration": order.duration,
+            "price": order.price,
+            "key_value": order.key_value
+        }
+    
+    async def get_purchase(self, user_id: int, purchase_token: str) -> Optional[dict]:
+        """Receipt of the order created with this token, if the purchase already went through"""
+        cache_key = self._purchase_key(user_id, purchase_token)
+        cached = await cache.get(cache_key)
+        if cached:
+            return cached
+        
+        stmt = select(Order).where(
+            Order.user_id == user_id,
+            Order.purchase_token == purchase_token
+        )
+        result = await self.session.execute(stmt)
+        order = result.scalar_one_or_none()
+        if not order:
+            return None
+        
+        receipt = self._receipt(order)
+        await cache.set(cache_key, receipt, expire=86400)
+        return receipt
+    
     async def get_user_orders(self, user_id: int, limit: int = 10) -> List[Order]:
         stmt = select(Order).where(
             Order.user_id == user_id
@@ -52,6 +111,24 @@ class OrderService:
         result = await self.session.execute(stmt)
         return list(result.scalars().all())
     
+    # Columns of the order history screens; all of them live in ix_orders_user_history
+    HISTORY_COLUMNS = (Order.id, Order.product_name, Order.duration, Order.price, Order.key_value, Order.purchased_at)
+    
+    async def get_user_orders_page(self, user_id: int, cursor: Optional[str] = None, limit: int = 5) -> Page:
+        """One page of a user's orders, newest first, keyed on (purchased_at, id)"""
+        stmt = select(*self.HISTORY_COLUMNS).where(Order.user_id == user_id)
+        return await paginate(self.session, stmt, (Order.purchased_at, Order.id), cursor=cursor, limit=limit)
+    
+    async def stream_user_orders(self, user_id: int, batch_size: int = 500) -> AsyncIterator:
+        """Every order of a user, newest first, read from a server-side cursor in batches"""
+        stmt = select(*self.HISTORY_COLUMNS).where(
+            Order.user_id == user_id
+        ).order_by(Order.purchased_at.desc(), Order.id.desc()).execution_options(yield_per=batch_size)
+        
+        result = await self.session.stream(stmt)
+        async for row in result:
+            yield row
+    
     async def get_all_orders(self, limit: int = 100) -> List[Order]:
         stmt = select(Order).options(
             selectinload(Order.user)
@@ -60,10 +137,8 @@ class OrderService:
         return list(result.scalars().all())
     
     async def get_total_revenue(self) -> float:
-        stmt = select(func.sum(Order.price))
-        result = await self.session.execute(stmt)
-        total = result.scalar()
-        return float(total) if total else 0.0
+        totals = await SalesService(self.session).get_totals()
+        return totals["revenue"]
     
     async def get_orders_count(self) -> int:
         stmt = select(func.count(Order.id))
@@ -82,11 +157,9 @@ class OrderService:
             User.telegram_id,
             User.username,
             User.first_name,
-            func.sum(Order.price).label('total_spent'),
-            func.count(Order.id).label('orders_count')
-        ).join(Order, Order.user_id == User.id).group_by(
-            User.id, User.telegram_id, User.username, User.first_name
-        ).order_by(func.sum(Order.price).desc()).limit(limit)
+            User.total_spent,
+            User.orders_count
+        ).where(User.orders_count > 0).order_by(User.total_spent.desc()).limit(limit)
         
         result = await self.session.execute(stmt)
         rows = result.all()
@@ -1,11 +1,19 @@
-from typing import Optional, List
-from sqlalchemy import select, delete
+import asyncio
+from typing import Optional, List, Dict, Tuple, AsyncIterator
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, update, insert, or_, case, func, any_, literal, exists, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from loguru import logger
 
-from bot.models import Product, ProductPrice, ProductKey
+from bot.models import Product, ProductPrice, ProductKey, KeyBatch, Order
 from bot.services.cache import cache
+from bot.utils.pagination import Page, paginate
+
+DELETE_CHUNK_SIZE = 1000
+# Invalidated with the rest of products:* on every product or price change
+CATALOG_KEY = "products:catalog"
 
 
 class ProductService:
@@ -13,8 +21,6 @@ class ProductService:
         self.session = session
     
     async def get_all_products(self, active_only: bool = True) -> List[Product]:
-        cache_key = f"products:all:{active_only}"
-        
         stmt = select(Product).options(selectinload(Product.prices))
         if active_only:
             stmt = stmt.where(Product.is_active == True)
@@ -23,10 +29,35 @@ class ProductService:
         result = await self.session.execute(stmt)
         return list(result.scalars().all())
     
+    async def get_catalog(self, refresh: bool = False) -> List[dict]:
+        """Active products with their prices as plain dicts, the shape the shop screens render"""
+        cached = None if refresh else await cache.get(CATALOG_KEY)
+        if cached is not None:
+            return cached
+        
+        catalog = [
+            {
+                "id": p.id,
+                "name": p.name,
+                "description": p.description,
+                "prices": [
+                    {
+                        "id": pr.id,
+                        "duration": pr.duration,
+                        "duration_days": pr.duration_days,
+                        "price": float(pr.price) if pr.price is not None else 0.0
+                    }
+                    for pr in p.prices
+                ]
+            }
+            for p in await self.get_all_products(active_only=True)
+        ]
+        await cache.set(CATALOG_KEY, catalog, expire=3600)
+        return catalog
+    
     async def get_product(self, product_id: int) -> Optional[Product]:
         stmt = select(Product).options(
-            selectinload(Product.prices),
-            selectinload(Product.keys)
+            selectinload(Product.prices)
         ).where(Product.id == product_id)
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
@@ -75,20 +106,64 @@ class ProductService:
         logger.info(f"📦 Product updated: {product_id}")
         return product
     
+    async def is_on_sale(self, product_id: int, lock: bool = False) -> bool:
+        """Whether the product is active; with lock, it can't be deactivated until this transaction ends"""
+        stmt = select(Product.is_active).where(Product.id == product_id)
+        if lock:
+            stmt = stmt.with_for_update(read=True)
+        result = await self.session.execute(stmt)
+        return bool(result.scalar())
+    
+    async def product_has_orders(self, product_id: int) -> bool:
+        stmt = select(Order.id).where(Order.product_id == product_id).limit(1)
+        result = await self.session.execute(stmt)
+        return result.first() is not None
+    
     async def delete_product(self, product_id: int) -> bool:
         product = await self.get_product(product_id)
         if not product:
             return False
         
-        await self.session.delete(product)
+        async for _ in self.delete_product_in_chunks(product_id):
+            pass
+        return True
+    
+    async def delete_product_in_chunks(self, product_id: int, chunk_size: int = DELETE_CHUNK_SIZE) -> AsyncIterator[int]:
+        """
+        Delete a product with its prices and keys, yielding the count of each chunk of keys.
+        
+        The product is deactivated before its keys go. The purchase flow refuses inactive
+        products, and a confirming purchase holds a share lock on the product row until its
+        order commits, so the deactivation waits for it and the order check that follows sees
+        it. Orders are checked once more under a row lock right before the product row is
+        deleted; a product that got an order anyway raises ValueError and stays deactivated.
+        """
+        await self.session.execute(update(Product).where(Product.id == product_id).values(is_active=False))
+        await self.session.commit()
+        await cache.invalidate_pattern("products:*")
+        if await self.product_has_orders(product_id):
+            raise ValueError("the product has orders; it was deactivated instead")
+        
+        async for count in self.delete_keys_in_chunks(product_id, chunk_size=chunk_size):
+            yield count
+        
+        # An order insert locks the product row it references, so none can slip in after this check
+        await self.session.execute(select(Product.id).where(Product.id == product_id).with_for_update())
+        if await self.product_has_orders(product_id):
+            await self.session.rollback()
+            raise ValueError("the product was ordered while its keys were deleted; it was deactivated instead")
+        
+        await self.session.execute(delete(ProductPrice).where(ProductPrice.product_id == product_id))
+        await self.session.execute(delete(KeyBatch).where(KeyBatch.product_id == product_id))
+        await self.session.execute(delete(Product).where(Product.id == product_id))
         await self.session.commit()
         await cache.invalidate_pattern("products:*")
         logger.info(f"🗑️ Product deleted with all keys: {product_id}")
-        return True
     
-    async def add_price(self, product_id: int, duration: str, price: float) -> ProductPrice:
-        existing = await self.get_price(product_id, duration)
+    async def add_price(self, product_id: int, duration_days: int, duration: str, price: float) -> ProductPrice:
+        existing = await self.get_price(product_id, duration_days)
         if existing:
+            existing.duration = duration
             existing.price = price
             await self.session.commit()
             await cache.invalidate_pattern("products:*")
@@ -97,6 +172,7 @@ class ProductService:
         price_obj = ProductPrice(
             product_id=product_id,
             duration=duration,
+            duration_days=duration_days,
             price=price
         )
         self.session.add(price_obj)
@@ -106,11 +182,11 @@ class ProductService:
         logger.info(f"💰 Price added: {product_id} - {duration}: {price}")
         return price_obj
     
-    async def get_price(self, product_id: int, duration: str) -> Optional[ProductPrice]:
+    async def get_price(self, product_id: int, duration_days: int) -> Optional[ProductPrice]:
         stmt = select(ProductPrice).where(
             ProductPrice.product_id == product_id,
-            ProductPrice.duration == duration
-        )
+            ProductPrice.duration_days == duration_days
+        ).limit(1)
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
     
@@ -121,11 +197,12 @@ class ProductService:
         await cache.invalidate_pattern("products:*")
         return result.rowcount > 0
     
-    async def add_key(self, product_id: int, key_value: str, duration: str) -> ProductKey:
+    async def add_key(self, product_id: int, key_value: str, duration_days: int, duration: str) -> ProductKey:
         key = ProductKey(
             product_id=product_id,
             key_value=key_value,
-            duration=duration
+            duration=duration,
+            duration_days=duration_days
         )
         self.session.add(key)
         await self.session.commit()
@@ -133,39 +210,119 @@ class ProductService:
         logger.info(f"🔑 Key added for product {product_id}")
         return key
     
-    async def get_available_key(self, product_id: int, duration: str) -> Optional[ProductKey]:
+    @staticmethod
+    def _not_held(user_id: Optional[int] = None):
+        """Keys without an active reservation (or reserved by this user)"""
+        conditions = [
+            ProductKey.reserved_until == None,
+            ProductKey.reserved_until < datetime.utcnow()
+        ]
+        if user_id is not None:
+            conditions.append(ProductKey.reserved_by == user_id)
+        return or_(*conditions)
+    
+    async def get_available_key(self, product_id: int, duration_days: int, user_id: Optional[int] = None) -> Optional[ProductKey]:
         stmt = select(ProductKey).where(
             ProductKey.product_id == product_id,
-            ProductKey.duration == duration,
+            ProductKey.duration_days == duration_days,
+            ProductKey.is_used == False,
+            self._not_held(user_id)
+        ).limit(1).with_for_update(skip_locked=True)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+    
+    async def reserve_key(self, product_id: int, duration_days: int, user_id: int, ttl: int) -> Optional[ProductKey]:
+        """Hold an unused key for the user for `ttl` seconds, reusing a hold they already have"""
+        candidate = select(ProductKey.id).where(
+            ProductKey.product_id == product_id,
+            ProductKey.duration_days == duration_days,
+            ProductKey.is_used == False,
+            self._not_held(user_id)
+        ).order_by(
+            case((ProductKey.reserved_by == user_id, 0), else_=1),
+            ProductKey.id
+        ).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+        
+        stmt = update(ProductKey).where(ProductKey.id == candidate).values(
+            reserved_until=datetime.utcnow() + timedelta(seconds=ttl),
+            reserved_by=user_id
+        ).returning(ProductKey)
+        result = await self.session.execute(stmt)
+        key = result.scalar_one_or_none()
+        await self.session.commit()
+        return key
+    
+    async def claim_reserved_key(self, key_id: int, user_id: int) -> Optional[ProductKey]:
+        """Mark the user's reserved key used; committed together with the order.
+        
+        Works after the hold expired too, as long as nobody else reserved the key since.
+        """
+        stmt = update(ProductKey).where(
+            ProductKey.id == key_id,
+            ProductKey.reserved_by == user_id,
             ProductKey.is_used == False
-        ).limit(1)
+        ).values(is_used=True, reserved_until=None).returning(ProductKey)
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
     
-    async def mark_key_used(self, key_id: int) -> bool:
+    async def mark_key_used(self, key_id: int, commit: bool = True) -> bool:
         stmt = select(ProductKey).where(ProductKey.id == key_id)
         result = await self.session.execute(stmt)
         key = result.scalar_one_or_none()
         
         if key:
             key.is_used = True
-            await self.session.commit()
+            if commit:
+                await self.session.commit()
             return True
         return False
     
+    def _key_count_columns(self) -> list:
+        now = datetime.utcnow()
+        held = ProductKey.reserved_until > now
+        return [
+            func.count(ProductKey.id).label("total"),
+            func.count(ProductKey.id).filter(ProductKey.is_used == True).label("used"),
+            func.count(ProductKey.id).filter(ProductKey.is_used == False, held).label("reserved"),
+            func.count(ProductKey.id).filter(ProductKey.is_used == False, self._not_held()).label("available"),
+        ]
+    
+    @staticmethod
+    def _key_counts(row) -> dict:
+        # Archived keys are claimed keys that left product_keys; they still count as used
+        archived = row.archived or 0
+        return {
+            "total": (row.total or 0) + archived,
+            "available": row.available or 0,
+            "used": (row.used or 0) + archived,
+            "reserved": row.reserved or 0,
+        }
+    
     async def get_keys_count(self, product_id: Optional[int] = None) -> dict:
-        stmt = select(ProductKey)
+        archived = select(func.coalesce(func.sum(Product.archived_keys_count), 0))
+        stmt = select(*self._key_count_columns())
         if product_id:
+            archived = archived.where(Product.id == product_id)
             stmt = stmt.where(ProductKey.product_id == product_id)
         
+        result = await self.session.execute(stmt.add_columns(archived.scalar_subquery().label("archived")))
+        return self._key_counts(result.one())
+    
+    async def get_keys_counts_by_product(self) -> Dict[int, dict]:
+        """Key counts of every product that has live or archived keys, in one grouped query"""
+        live = select(ProductKey.product_id, *self._key_count_columns()).group_by(ProductKey.product_id).subquery()
+        stmt = select(
+            Product.id.label("product_id"),
+            Product.archived_keys_count.label("archived"),
+            live.c.total,
+            live.c.used,
+            live.c.reserved,
+            live.c.available
+        ).outerjoin(live, live.c.product_id == Product.id).where(
+            or_(live.c.product_id != None, Product.archived_keys_count > 0)
+        )
         result = await self.session.execute(stmt)
-        keys = list(result.scalars().all())
-        
-        total = len(keys)
-        available = len([k for k in keys if not k.is_used])
-        used = total - available
-        
-        return {"total": total, "available": available, "used": used}
+        return {row.product_id: self._key_counts(row) for row in result.all()}
     
     async def remove_key(self, key_id: int) -> bool:
         stmt = delete(ProductKey).where(ProductKey.id == key_id)
@@ -173,86 +330,213 @@ class ProductService:
         await self.session.commit()
         return result.rowcount > 0
     
-    async def get_keys_for_product(self, product_id: int, unused_only: bool = False) -> List[ProductKey]:
-        stmt = select(ProductKey).where(ProductKey.product_id == product_id)
+    async def remove_keys(self, key_ids: List[int]) -> int:
+        """Delete many keys by id with one statement; the ids travel as a single array parameter"""
+        if not key_ids:
+            return 0
+        stmt = delete(ProductKey).where(ProductKey.id == any_(literal(key_ids, ARRAY(Integer))))
+        result = await self.session.execute(stmt)
+        await self.session.commit()
+        logger.info(f"🗑️ Deleted {result.rowcount} of {len(key_ids)} selected keys")
+        return result.rowcount
+    
+    async def get_keys_page(
+        self,
+        product_id: Optional[int] = None,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        unused_only: bool = False
+    ) -> Page:
+        stmt = select(ProductKey)
+        if product_id:
+            stmt = stmt.where(ProductKey.product_id == product_id)
         if unused_only:
             stmt = stmt.where(ProductKey.is_used == False)
-        result = await self.session.execute(stmt)
-        return list(result.scalars().all())
+        return await paginate(self.session, stmt, ProductKey.id, cursor=cursor, limit=limit)
+    
+    async def list_keys(
+        self,
+        product_id: Optional[int] = None,
+        status: Optional[str] = None,
+        duration_days: Optional[int] = None,
+        cursor: Optional[str] = None,
+        limit: int = 20
+    ) -> Page:
+        """
+        One page of keys joined with their product name, for the web panel.
+        
+        status is "available", "reserved" or "used"; anything else lists every key.
+        """
+        stmt = select(
+            ProductKey.id,
+            ProductKey.product_id,
+            Product.name.label("product_name"),
+            ProductKey.key_value,
+            ProductKey.duration,
+            ProductKey.is_used,
+            ProductKey.reserved_until,
+            ProductKey.created_at
+        ).join(Product, Product.id == ProductKey.product_id)
+        
+        if product_id:
+            stmt = stmt.where(ProductKey.product_id == product_id)
+        if duration_days:
+            stmt = stmt.where(ProductKey.duration_days == duration_days)
+        if status == "available":
+            stmt = stmt.where(ProductKey.is_used == False, self._not_held())
+        elif status == "reserved":
+            stmt = stmt.where(ProductKey.is_used == False, ProductKey.reserved_until > datetime.utcnow())
+        elif status == "used":
+            stmt = stmt.where(ProductKey.is_used == True)
+        
+        return await paginate(self.session, stmt, ProductKey.id, cursor=cursor, limit=limit)
+    
+    async def delete_keys_in_chunks(
+        self,
+        product_id: int,
+        claimed_only: bool = False,
+        chunk_size: int = DELETE_CHUNK_SIZE
+    ) -> AsyncIterator[int]:
+        """
+        Delete a product's keys (or only its claimed ones) a chunk at a time, yielding each
+        chunk's count. Every chunk commits on its own, so purchases never wait long on it.
+        """
+        while True:
+            chunk = select(ProductKey.id).where(ProductKey.product_id == product_id)
+            if claimed_only:
+                chunk = chunk.where(ProductKey.is_used == True)
+            chunk = chunk.limit(chunk_size).scalar_subquery()
+            
+            result = await self.session.execute(delete(ProductKey).where(ProductKey.id.in_(chunk)))
+            await self.session.commit()
+            if result.rowcount:
+                yield result.rowcount
+            if result.rowcount < chunk_size:
+                return
+            await asyncio.sleep(0.05)
     
     async def delete_all_keys(self, product_id: int) -> int:
-        stmt = delete(ProductKey).where(ProductKey.product_id == product_id)
-        result = await self.session.execute(stmt)
-        await self.session.commit()
-        logger.info(f"🗑️ Deleted all keys for product {product_id}: {result.rowcount} keys")
-        return result.rowcount
+        deleted = 0
+        async for count in self.delete_keys_in_chunks(product_id):
+            deleted += count
+        logger.info(f"🗑️ Deleted all keys for product {product_id}: {deleted} keys")
+        return deleted
     
     async def delete_claimed_keys(self, product_id: int) -> int:
+        deleted = 0
+        async for count in self.delete_keys_in_chunks(product_id, claimed_only=True):
+            deleted += count
+        logger.info(f"🗑️ Deleted claimed keys for product {product_id}: {deleted} keys")
+        return deleted
+    
+    async def delete_last_generated_keys(self, product_id: int) -> int:
+        """Delete the product's most recent import batch that still has keys"""
+        # Batches emptied by delete-all/claimed or by the archiver stay as history; skip them
+        stmt = select(KeyBatch.id).where(
+            KeyBatch.product_id == product_id,
+            exists().where(ProductKey.batch_id == KeyBatch.id)
+        ).order_by(KeyBatch.id.desc()).limit(1)
+        result = await self.session.execute(stmt)
+        batch_id = result.scalar_one_or_none()
+        if batch_id is not None:
+            return await self.delete_key_batch(batch_id)
+        
+        # Keys imported before batches existed: the newest ones sharing a timestamp
+        latest = select(func.max(ProductKey.created_at)).where(
+            ProductKey.product_id == product_id
+        ).scalar_subquery()
         stmt = delete(ProductKey).where(
             ProductKey.product_id == product_id,
-            ProductKey.is_used == True
+            ProductKey.batch_id == None,
+            ProductKey.created_at == latest
         )
         result = await self.session.execute(stmt)
         await self.session.commit()
-        logger.info(f"🗑️ Deleted claimed keys for product {product_id}: {result.rowcount} keys")
+        logger.info(f"🗑️ Deleted last generated keys for product {product_id}: {result.rowcount} keys")
         return result.rowcount
     
-    async def delete_last_generated_keys(self, product_id: int) -> int:
-        stmt = select(ProductKey).where(ProductKey.product_id == product_id).order_by(ProductKey.created_at.desc())
-        result = await self.session.execute(stmt)
-        keys = list(result.scalars().all())
-        
+    async def add_keys_batch(
+        self,
+        product_id: int,
+        keys: List[Tuple[str, int, str]],
+        source: str,
+        created_by: Optional[int] = None
+    ) -> Optional[KeyBatch]:
+        """Insert (key_value, duration_days, duration) rows as one batch, in a single transaction"""
         if not keys:
-            return 0
+            return None
         
-        last_batch_time = keys[0].created_at
-        batch_keys = [k for k in keys if k.created_at == last_batch_time]
+        batch = KeyBatch(product_id=product_id, source=source, created_by=created_by, keys_count=len(keys))
+        self.session.add(batch)
+        await self.session.flush()
         
-        if batch_keys:
-            key_ids = [k.id for k in batch_keys]
-            delete_stmt = delete(ProductKey).where(ProductKey.id.in_(key_ids))
-            result = await self.session.execute(delete_stmt)
-            await self.session.commit()
-            logger.info(f"🗑️ Deleted last generated keys for product {product_id}: {result.rowcount} keys")
-            return result.rowcount
-        return 0
+        await self.session.execute(insert(ProductKey), [
+            {
+                "product_id": product_id,
+                "key_value": key_value,
+                "duration": duration,
+                "duration_days": duration_days,
+                "batch_id": batch.id
+            }
+            for key_value, duration_days, duration in keys
+        ])
+        await self.session.commit()
+        logger.info(f"🔑 Batch {batch.id}: {len(keys)} keys added for product {product_id}")
+        return batch
+    
+    async def get_key_batches(self, product_id: int, limit: int = 10) -> List[dict]:
+        """Most recent import batches of a product with their current key counts; archived keys count as used"""
+        stmt = select(KeyBatch).where(KeyBatch.product_id == product_id).order_by(KeyBatch.id.desc()).limit(limit)
+        result = await self.session.execute(stmt)
+        batches = list(result.scalars().all())
+        if not batches:
+            return []
+        
+        stmt = select(
+            ProductKey.batch_id,
+            func.count(ProductKey.id).label("total"),
+            func.count(ProductKey.id).filter(ProductKey.is_used == True).label("used")
+        ).where(ProductKey.batch_id.in_([b.id for b in batches])).group_by(ProductKey.batch_id)
+        result = await self.session.execute(stmt)
+        counts = {row.batch_id: row for row in result.all()}
+        
+        return [
+            {
+                "id": b.id,
+                "source": b.source,
+                "created_by": b.created_by,
+                "created_at": b.created_at,
+                "imported": b.keys_count,
+                "remaining": counts[b.id].total if b.id in counts else 0,
+                "used": (counts[b.id].used if b.id in counts else 0) + b.archived_keys_count
+            }
+            for b in batches
+        ]
+    
+    async def get_key_batch(self, batch_id: int) -> Optional[KeyBatch]:
+        stmt = select(KeyBatch).where(KeyBatch.id == batch_id)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+    
+    async def delete_key_batch(self, batch_id: int) -> int:
+        """Delete a batch and every key it imported"""
+        result = await self.session.execute(delete(ProductKey).where(ProductKey.batch_id == batch_id))
+        await self.session.execute(delete(KeyBatch).where(KeyBatch.id == batch_id))
+        await self.session.commit()
+        logger.info(f"🗑️ Deleted key batch {batch_id}: {result.rowcount} keys")
+        return result.rowcount
     
     async def get_product_stock(self, product_id: int) -> int:
         keys_data = await self.get_keys_count(product_id)
         return keys_data.get("available", 0)
     
-    async def get_stock_per_duration(self, product_id: int) -> dict:
-        """Get available stock count for each duration of a product"""
-        stmt = select(ProductKey).where(
+    async def get_stock_per_duration(self, product_id: int) -> Dict[int, int]:
+        """Available stock count per duration (in days) of a product"""
+        stmt = select(ProductKey.duration_days, func.count()).where(
             ProductKey.product_id == product_id,
-            ProductKey.is_used == False
-        )
+            ProductKey.duration_days != None,
+            ProductKey.is_used == False,
+            self._not_held()
+        ).group_by(ProductKey.duration_days)
         result = await self.session.execute(stmt)
-        keys = list(result.scalars().all())
-        
-        stock_by_duration = {}
-        for key in keys:
-            duration = key.duration
-            normalized_duration = self._normalize_duration(duration)
-            if normalized_duration not in stock_by_duration:
-                stock_by_duration[normalized_duration] = 0
-            stock_by_duration[normalized_duration] += 1
-        
-        return stock_by_duration
-    
-    def _normalize_duration(self, duration: str) -> str:
-        """Normalize duration string to readable format for consistent matching"""
-        import re
-        if '|' in duration:
-            return duration.split('|')[1]
-        
-        match = re.match(r'^(\d+)(d|m)$', duration.lower().strip())
-        if match:
-            num = int(match.group(1))
-            unit = match.group(2)
-            if unit == 'd':
-                return f"{num} Day{'s' if num > 1 else ''}"
-            else:
-                return f"{num} Month{'s' if num > 1 else ''}"
-        
-        return duration
+        return {duration_days: count for duration_days, count in result.all()}
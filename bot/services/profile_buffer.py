@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import update, bindparam, or_
+from loguru import logger
+
+from bot.config import config
+from bot.database import async_session
+from bot.models import User
+
+
+# users.last_seen_at is only rewritten once it is this much behind
+SEEN_RESOLUTION = timedelta(minutes=1)
+
+
+class ProfileBuffer:
+    """
+    Write-behind buffer for Telegram profile fields (username, first and last name) and
+    the time each user was last seen.
+    
+    Handlers only record the latest values per user; a background task writes all
+    pending changes every few seconds with one executemany UPDATE each, so a name change
+    or a button press never costs the request that noticed it a database round trip.
+    """
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: Dict[int, dict] = {}
+        self._seen: Dict[int, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def pending(self) -> int:
+        return len(self._pending) + len(self._seen)
+    
+    def add(self, telegram_id: int, username: Optional[str], first_name: Optional[str], last_name: Optional[str]):
+        self._pending[telegram_id] = {
+            "tid": telegram_id,
+            "new_username": username,
+            "new_first_name": first_name,
+            "new_last_name": last_name,
+        }
+        self._schedule()
+    
+    def seen(self, telegram_id: int):
+        self._seen[telegram_id] = datetime.utcnow()
+        self._schedule()
+    
+    def _schedule(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        while self._pending or self._seen:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+    
+    async def flush(self):
+        if self._pending:
+            await self._flush_profiles()
+        if self._seen:
+            await self._flush_seen()
+    
+    async def _flush_profiles(self):
+        batch, self._pending = list(self._pending.values()), {}
+        table = User.__table__
+        stmt = update(table).where(
+            table.c.telegram_id == bindparam("tid"),
+            or_(
+                table.c.username.is_distinct_from(bindparam("new_username")),
+                table.c.first_name.is_distinct_from(bindparam("new_first_name")),
+                table.c.last_name.is_distinct_from(bindparam("new_last_name"))
+            )
+        ).values(
+            username=bindparam("new_username"),
+            first_name=bindparam("new_first_name"),
+            last_name=bindparam("new_last_name")
+        )
+        
+        try:
+            async with async_session() as session:
+                await session.execute(stmt, batch)
+                await session.commit()
+            logger.debug(f"👤 Flushed {len(batch)} profile updates")
+        except Exception as e:
+            logger.error(f"Profile flush failed for {len(batch)} users: {e}")
+            for row in batch:
+                self._pending.setdefault(row["tid"], row)
+    
+    async def _flush_seen(self):
+        seen, self._seen = self._seen, {}
+        batch = [{"tid": tid, "seen_at": at, "stale_before": at - SEEN_RESOLUTION} for tid, at in seen.items()]
+        table = User.__table__
+        # Leaves updated_at alone: being seen isn't a change to the user
+        stmt = update(table).where(
+            table.c.telegram_id == bindparam("tid"),
+            or_(table.c.last_seen_at.is_(None), table.c.last_seen_at < bindparam("stale_before"))
+        ).values(last_seen_at=bindparam("seen_at"), updated_at=table.c.updated_at)
+        
+        try:
+            async with async_session() as session:
+                await session.execute(stmt, batch)
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Last-seen flush failed for {len(batch)} users: {e}")
+            for tid, at in seen.items():
+                self._seen.setdefault(tid, at)
+    
+    async def close(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        await self.flush()
+
+
+profile_buffer = ProfileBuffer(interval=config.bot.profile_flush_interval)
@@ -0,0 +1,123 @@
+from typing import Optional, List
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.models import SalesRollup, Product
+
+MAX_DAYS = 366
+MAX_HOURLY_DAYS = 14
+
+
+def hour_bucket(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class SalesService:
+    """
+    Sales over time, read from hourly rollups instead of the orders table.
+    
+    Every order adds itself to its (hour, product, duration) row in the same transaction,
+    so a chart costs one row per bucket and product no matter how many orders there are.
+    """
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+    
+    async def record_sale(self, product_id: int, duration: str, price: float, at: datetime):
+        """Add an order to its rollup row; committed (or rolled back) together with the order"""
+        stmt = insert(SalesRollup).values(
+            bucket=hour_bucket(at),
+            product_id=product_id,
+            duration=duration,
+            orders_count=1,
+            revenue=price
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SalesRollup.bucket, SalesRollup.product_id, SalesRollup.duration],
+            set_={
+                "orders_count": SalesRollup.orders_count + 1,
+                "revenue": SalesRollup.revenue + stmt.excluded.revenue
+            }
+        )
+        await self.session.execute(stmt)
+    
+    @staticmethod
+    def _range(days: int, granularity: str):
+        if granularity == "hour":
+            days = max(1, min(days, MAX_HOURLY_DAYS))
+            step = timedelta(hours=1)
+            since = hour_bucket(datetime.utcnow()) - step * (days * 24 - 1)
+        else:
+            days = max(1, min(days, MAX_DAYS))
+            step = timedelta(days=1)
+            since = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - step * (days - 1)
+        return since, step
+    
+    async def get_series(self, days: int = 30, granularity: str = "day", product_id: Optional[int] = None) -> List[dict]:
+        """Orders and revenue per day (or hour), oldest first, with empty periods filled in"""
+        granularity = "hour" if granularity == "hour" else "day"
+        since, step = self._range(days, granularity)
+        
+        period = func.date_trunc(granularity, SalesRollup.bucket).label("period")
+        stmt = select(
+            period,
+            func.sum(SalesRollup.orders_count).label("orders"),
+            func.sum(SalesRollup.revenue).label("revenue")
+        ).where(SalesRollup.bucket >= since).group_by(period)
+        if product_id:
+            stmt = stmt.where(SalesRollup.product_id == product_id)
+        
+        result = await self.session.execute(stmt)
+        rows = {row.period: row for row in result.all()}
+        
+        series = []
+        moment = since
+        now = datetime.utcnow()
+        while moment <= now:
+            row = rows.get(moment)
+            series.append({
+                "period": moment.isoformat(),
+                "orders": int(row.orders) if row else 0,
+                "revenue": float(row.revenue) if row else 0.0
+            })
+            moment += step
+        return series
+    
+    async def get_breakdown(self, days: int = 30, product_id: Optional[int] = None) -> List[dict]:
+        """Orders and revenue per product and duration over the last `days` days, best first"""
+        since, _ = self._range(days, "day")
+        revenue = func.sum(SalesRollup.revenue)
+        stmt = select(
+            SalesRollup.product_id,
+            Product.name.label("product_name"),
+            SalesRollup.duration,
+            func.sum(SalesRollup.orders_count).label("orders"),
+            revenue.label("revenue")
+        ).outerjoin(Product, Product.id == SalesRollup.product_id).where(
+            SalesRollup.bucket >= since
+        ).group_by(SalesRollup.product_id, Product.name, SalesRollup.duration).order_by(revenue.desc())
+        if product_id:
+            stmt = stmt.where(SalesRollup.product_id == product_id)
+        
+        result = await self.session.execute(stmt)
+        return [
+            {
+                "product_id": row.product_id,
+                "product_name": row.product_name or f"Product {row.product_id}",
+                "duration": row.duration,
+                "orders": int(row.orders),
+                "revenue": float(row.revenue)
+            }
+            for row in result.all()
+        ]
+    
+    async def get_totals(self) -> dict:
+        stmt = select(
+            func.coalesce(func.sum(SalesRollup.orders_count), 0).label("orders"),
+            func.coalesce(func.sum(SalesRollup.revenue), 0).label("revenue")
+        )
+        result = await self.session.execute(stmt)
+        row = result.one()
+        return {"orders": int(row.orders), "revenue": float(row.revenue)}
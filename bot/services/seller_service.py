@@ -23,9 +23,9 @@ class SellerService:
     def __init__(self, session: AsyncSession):
         self.session = session
     
-    async def get_all_sellers(self, active_only: bool = False) -> List[SellerData]:
+    async def get_all_sellers(self, active_only: bool = False, refresh: bool = False) -> List[SellerData]:
         cache_key = "sellers:active" if active_only else "sellers:all"
-        cached = await cache.get(cache_key)
+        cached = None if refresh else await cache.get(cache_key)
         
         if cached:
             return [SellerData(**s) for s in cached]
@@ -75,8 +75,7 @@ class SellerService:
         self.session.add(seller)
         await self.session.commit()
         await self.session.refresh(seller)
-        await cache.delete("sellers:all")
-        await cache.delete("sellers:active")
+        await cache.delete_many(["sellers:all", "sellers:active"])
         logger.info(f"⭐ Seller added: {username}")
         return seller
     
@@ -112,8 +111,7 @@ class SellerService:
         
         await self.session.commit()
         await self.session.refresh(seller)
-        await cache.delete("sellers:all")
-        await cache.delete("sellers:active")
+        await cache.delete_many(["sellers:all", "sellers:active"])
         logger.info(f"✏️ Seller updated: {seller_id}")
         return seller
     
@@ -121,8 +119,7 @@ class SellerService:
         stmt = delete(TrustedSeller).where(TrustedSeller.id == seller_id)
         result = await self.session.execute(stmt)
         await self.session.commit()
-        await cache.delete("sellers:all")
-        await cache.delete("sellers:active")
+        await cache.delete_many(["sellers:all", "sellers:active"])
         
         if result.rowcount > 0:
             logger.info(f"🗑️ Seller removed: {seller_id}")
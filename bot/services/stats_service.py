@@ -0,0 +1,106 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import select, func
+from loguru import logger
+
+from bot.config import config
+from bot.database import async_session
+from bot.models import User, UserStatus, Admin, Product, TrustedSeller, SalesRollup
+from bot.services.cache import cache
+from bot.services.product_service import ProductService
+
+CACHE_KEY = "stats:snapshot"
+
+
+class StatsService:
+    """
+    Panel statistics shared by the web dashboard and the Telegram admin panel.
+    
+    The counters come from a handful of aggregate queries that run concurrently, each on
+    its own session. The result is kept as a snapshot for `ttl` seconds, in this process
+    and in Redis, so repeated refreshes from either panel don't touch the database.
+    """
+    
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._snapshot: Optional[dict] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+    
+    async def get_snapshot(self, refresh: bool = False) -> dict:
+        if not refresh and self._fresh():
+            return self._snapshot
+        
+        # Concurrent refreshes wait for the one already computing the snapshot
+        async with self._lock:
+            if not refresh and self._fresh():
+                return self._snapshot
+            
+            snapshot = None if refresh else await cache.get(CACHE_KEY)
+            if snapshot is None:
+                snapshot = await self._compute()
+                await cache.set(CACHE_KEY, snapshot, expire=max(1, self.ttl))
+            
+            self._snapshot = snapshot
+            self._expires_at = time.monotonic() + self.ttl
+            return snapshot
+    
+    def _fresh(self) -> bool:
+        return self._snapshot is not None and time.monotonic() < self._expires_at
+    
+    async def _query(self, stmt):
+        async with async_session() as session:
+            result = await session.execute(stmt)
+            return result.one()
+    
+    async def _keys(self) -> dict:
+        async with async_session() as session:
+            return await ProductService(session).get_keys_count()
+    
+    async def _compute(self) -> dict:
+        started = time.monotonic()
+        
+        users_stmt = select(
+            func.count(User.id).label("total"),
+            func.count(User.id).filter(User.status == UserStatus.PREMIUM).label("premium"),
+            func.count(User.id).filter(User.is_reseller == True).label("resellers")
+        )
+        # Rollups hold one row per hour and product, far fewer than the orders they sum up
+        orders_stmt = select(
+            func.coalesce(func.sum(SalesRollup.orders_count), 0).label("total"),
+            func.coalesce(func.sum(SalesRollup.revenue), 0).label("revenue")
+        )
+        totals_stmt = select(
+            select(func.count(Product.id)).scalar_subquery().label("products"),
+            select(func.count(Admin.id)).scalar_subquery().label("admins"),
+            select(func.count(TrustedSeller.id)).scalar_subquery().label("sellers")
+        )
+        
+        users, orders, totals, keys = await asyncio.gather(
+            self._query(users_stmt),
+            self._query(orders_stmt),
+            self._query(totals_stmt),
+            self._keys()
+        )
+        
+        logger.debug(f"📊 Stats computed in {(time.monotonic() - started) * 1000:.0f}ms")
+        return {
+            "total_users": users.total,
+            "premium_users": users.premium,
+            "resellers": users.resellers,
+            "total_keys": keys["total"],
+            "available_keys": keys["available"],
+            "used_keys": keys["used"],
+            "reserved_keys": keys["reserved"],
+            "total_products": totals.products,
+            "total_admins": totals.admins,
+            "total_sellers": totals.sellers,
+            "total_orders": int(orders.total),
+            "total_revenue": float(orders.revenue),
+            "generated_at": datetime.utcnow().isoformat()
+        }
+
+
+stats_service = StatsService(ttl=config.bot.stats_cache_ttl)
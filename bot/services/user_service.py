@@ -1,12 +1,29 @@
-from typing import Optional, List
-from sqlalchemy import select, update
+from typing import Optional, List, Dict, AsyncIterator
+from sqlalchemy import select, update, func, or_, exists, false, true, literal, literal_column, union_all, any_, Integer, BigInteger
+from sqlalchemy.dialects.postgresql import insert, ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 from decimal import Decimal
 from loguru import logger
 
-from bot.models import User, UserStatus
+from bot.models import User, UserStatus, BalanceTransaction
 from bot.services.cache import cache
+from bot.services.profile_buffer import profile_buffer
+from bot.utils.pagination import Page, paginate, iterate
+
+
+SEARCH_LIMIT = 20
+
+
+def normalize_username(username: Optional[str]) -> Optional[str]:
+    """Usernames are stored without "@" and surrounding whitespace; an empty one becomes NULL"""
+    if username is None:
+        return None
+    return username.strip().lstrip("@").strip() or None
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
 
 
 class UserService:
@@ -20,37 +37,100 @@ class UserService:
         first_name: Optional[str] = None,
         last_name: Optional[str] = None
     ) -> User:
+        """
+        Return the user, creating it on first contact.
+        
+        A cache hit costs no statement; profile changes noticed there go through the
+        write-behind profile_buffer. A miss is a single upsert that also applies changes.
+        """
+        username = normalize_username(username)
         cache_key = f"user:{telegram_id}"
         cached = await cache.get(cache_key)
         
         if cached:
             logger.debug(f"📦 User {telegram_id} loaded from cache")
-            user = User(**cached)
-            return user
+            if (cached.get("username"), cached.get("first_name"), cached.get("last_name")) != (username, first_name, last_name):
+                profile_buffer.add(telegram_id, username, first_name, last_name)
+                cached.update(username=username, first_name=first_name, last_name=last_name)
+                await cache.set(cache_key, cached)
+            return self._user_from_cache(cached)
+        
+        table = User.__table__
+        now = datetime.utcnow()
+        inserted = insert(table).values(
+            telegram_id=telegram_id,
+            username=username,
+            first_name=first_name,
+            last_name=last_name,
+            last_seen_at=now,
+            balance=0,
+            status=UserStatus.FREE,
+            is_reseller=False,
+            is_banned=False,
+            total_spent=0,
+            orders_count=0,
+            created_at=now,
+            updated_at=now
+        )
+        inserted = inserted.on_conflict_do_update(
+            index_elements=[table.c.telegram_id],
+            set_={
+                "username": inserted.excluded.username,
+                "first_name": inserted.excluded.first_name,
+                "last_name": inserted.excluded.last_name,
+                "updated_at": inserted.excluded.updated_at,
+            },
+            where=or_(
+                table.c.username.is_distinct_from(inserted.excluded.username),
+                table.c.first_name.is_distinct_from(inserted.excluded.first_name),
+                table.c.last_name.is_distinct_from(inserted.excluded.last_name)
+            )
+        ).returning(*table.c, literal_column("xmax = 0").label("created")).cte("upserted")
+        
+        # An unchanged existing row is skipped by DO UPDATE ... WHERE, so read it in the same statement
+        existing = select(*table.c, false().label("created")).where(
+            table.c.telegram_id == telegram_id,
+            ~exists(select(inserted.c.id))
+        )
+        stmt = union_all(select(inserted), existing)
         
-        stmt = select(User).where(User.telegram_id == telegram_id)
         result = await self.session.execute(stmt)
-        user = result.scalar_one_or_none()
+        row = result.one_or_none()
+        if row is None:
+            # Lost a first-contact race: the winner's row is newer than this statement's
+            # snapshot, so neither branch saw it. A new statement gets a new snapshot.
+            result = await self.session.execute(select(*table.c, false().label("created")).where(
+                table.c.telegram_id == telegram_id
+            ))
+            row = result.one()
+        await self.session.commit()
         
-        if not user:
-            logger.info(f"👤 Creating new user: {telegram_id}")
-            user = User(
-                telegram_id=telegram_id,
-                username=username,
-                first_name=first_name,
-                last_name=last_name,
-            )
-            self.session.add(user)
-            await self.session.commit()
-            await self.session.refresh(user)
+        if row.created:
+            logger.info(f"👤 Created new user: {telegram_id}")
+        
+        user = User(**{column.key: getattr(row, column.key) for column in table.c})
+        await cache.set(cache_key, self._user_to_cache(user))
+        return user
+    
+    async def cache_users(self, telegram_ids: Optional[List[int]] = None, recent: int = 0) -> int:
+        """
+        Put fresh cache entries for the given users, or for the `recent` most recently
+        seen ones, with one query and one pipelined cache write.
+        """
+        stmt = select(User)
+        if telegram_ids is not None:
+            stmt = stmt.where(User.telegram_id == any_(literal(telegram_ids, ARRAY(BigInteger))))
         else:
-            if user.username != username or user.first_name != first_name:
-                user.username = username
-                user.first_name = first_name
-                user.last_name = last_name
-                await self.session.commit()
+            stmt = stmt.where(User.last_seen_at.isnot(None)).order_by(User.last_seen_at.desc().nulls_last()).limit(recent)
+        result = await self.session.execute(stmt)
+        users = result.scalars().all()
         
-        await cache.set(cache_key, {
+        await cache.set_many({f"user:{user.telegram_id}": self._user_to_cache(user) for user in users})
+        return len(users)
+    
+    @staticmethod
+    def _user_to_cache(user: User) -> dict:
+        return {
             "id": user.id,
             "telegram_id": user.telegram_id,
             "username": user.username,
@@ -60,27 +140,87 @@ class UserService:
             "status": user.status.value,
             "is_reseller": user.is_reseller,
             "is_banned": getattr(user, 'is_banned', False),
-        })
-        
-        return user
+            "last_purchase_at": user.last_purchase_at.isoformat() if user.last_purchase_at else None,
+        }
+    
+    @staticmethod
+    def _user_from_cache(cached: dict) -> User:
+        data = dict(cached)
+        # JSON has no enums or datetimes; restore them so callers can compare against UserStatus
+        data["status"] = UserStatus(data["status"])
+        data["balance"] = Decimal(str(data.get("balance", 0)))
+        last_purchase_at = data.get("last_purchase_at")
+        data["last_purchase_at"] = datetime.fromisoformat(last_purchase_at) if last_purchase_at else None
+        return User(**data)
     
     async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[User]:
         stmt = select(User).where(User.telegram_id == telegram_id)
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
     
-    async def update_balance(self, user_id: int, amount: float) -> bool:
-        stmt = select(User).where(User.id == user_id)
-        result = await self.session.execute(stmt)
-        user = result.scalar_one_or_none()
+    async def change_balance(
+        self,
+        user_id: int,
+        amount: float,
+        kind: str,
+        note: Optional[str] = None,
+        actor_id: Optional[int] = None,
+        require_funds: bool = False,
+        commit: bool = True
+    ) -> Optional[Decimal]:
+        """
+        Atomically add `amount` (negative to debit) to the user's balance and record it in the ledger.
         
-        if user:
-            user.balance += Decimal(str(amount))
+        With require_funds the debit only happens if the balance covers it. Returns the new
+        balance, or None if the user doesn't exist or has insufficient funds. With commit=False
+        the change joins the caller's transaction, and the caller must call cache_balance after
+        committing.
+        """
+        delta = Decimal(str(amount))
+        stmt = update(User).where(User.id == user_id)
+        if require_funds and delta < 0:
+            stmt = stmt.where(User.balance >= -delta)
+        stmt = stmt.values(balance=User.balance + delta).returning(User.balance, User.telegram_id)
+        
+        result = await self.session.execute(stmt, execution_options={"synchronize_session": False})
+        row = result.one_or_none()
+        if row is None:
+            return None
+        
+        self.session.add(BalanceTransaction(
+            user_id=user_id,
+            amount=delta,
+            balance_after=row.balance,
+            kind=kind,
+            note=note,
+            actor_id=actor_id
+        ))
+        
+        if commit:
             await self.session.commit()
-            await cache.delete(f"user:{user.telegram_id}")
-            logger.info(f"💰 Balance updated for user {user_id}: {amount:+.2f}")
-            return True
-        return False
+            await self.cache_balance(user_id, row.balance, telegram_id=row.telegram_id)
+        logger.info(f"💰 Balance updated for user {user_id}: {amount:+.2f} ({kind})")
+        return row.balance
+    
+    async def cache_balance(self, user_id: int, balance: Decimal, telegram_id: Optional[int] = None):
+        await cache.set(f"balance:{user_id}", float(balance), expire=3600)
+        if telegram_id:
+            await cache.delete(f"user:{telegram_id}")
+    
+    async def get_balance(self, user_id: int) -> Decimal:
+        cached = await cache.get(f"balance:{user_id}")
+        if cached is not None:
+            return Decimal(str(cached))
+        
+        stmt = select(User.balance).where(User.id == user_id)
+        result = await self.session.execute(stmt)
+        balance = result.scalar_one_or_none() or Decimal("0")
+        await cache.set(f"balance:{user_id}", float(balance), expire=3600)
+        return balance
+    
+    async def update_balance(self, user_id: int, amount: float) -> bool:
+        balance = await self.change_balance(user_id, amount, kind="adjustment")
+        return balance is not None
     
     async def set_premium(self, user_id: int, is_premium: bool = True) -> bool:
         stmt = select(User).where(User.id == user_id)
@@ -107,15 +247,39 @@ class UserService:
             return True
         return False
     
-    async def get_all_users(self) -> List[User]:
-        stmt = select(User).order_by(User.created_at.desc())
+    async def get_users_page(self, cursor: Optional[str] = None, limit: int = 20, premium_only: bool = False) -> Page:
+        stmt = select(User)
+        if premium_only:
+            stmt = stmt.where(User.status == UserStatus.PREMIUM)
+        return await paginate(self.session, stmt, User.id, cursor=cursor, limit=limit)
+    
+    async def iter_user_chat_ids(self) -> AsyncIterator[int]:
+        """Telegram IDs of all users, fetched in pages (for broadcasts)"""
+        stmt = select(User.id, User.telegram_id)
+        async for row in iterate(self.session, stmt, User.id):
+            yield row.telegram_id
+    
+    async def get_user_by_id(self, user_id: int) -> Optional[User]:
+        stmt = select(User).where(User.id == user_id)
         result = await self.session.execute(stmt)
-        return list(result.scalars().all())
+        return result.scalar_one_or_none()
+    
+    async def get_users_by_telegram_ids(self, telegram_ids: List[int]) -> Dict[int, User]:
+        if not telegram_ids:
+            return {}
+        stmt = select(User).where(User.telegram_id.in_(telegram_ids))
+        result = await self.session.execute(stmt)
+        return {u.telegram_id: u for u in result.scalars().all()}
+    
+    async def get_users_count(self) -> int:
+        stmt = select(func.count(User.id))
+        result = await self.session.execute(stmt)
+        return result.scalar() or 0
     
     async def get_premium_users_count(self) -> int:
-        stmt = select(User).where(User.status == UserStatus.PREMIUM)
+        stmt = select(func.count(User.id)).where(User.status == UserStatus.PREMIUM)
         result = await self.session.execute(stmt)
-        return len(list(result.scalars().all()))
+        return result.scalar() or 0
     
     async def get_resellers(self) -> List[User]:
         stmt = select(User).where(User.is_reseller == True).order_by(User.created_at.desc())
@@ -123,42 +287,65 @@ class UserService:
         return list(result.scalars().all())
     
     async def get_user_by_username(self, username: str) -> Optional[User]:
-        clean_username = username.lstrip('@')
-        stmt = select(User).where(User.username == clean_username)
+        clean_username = normalize_username(username)
+        if not clean_username:
+            return None
+        # Telegram usernames are case-insensitive; served by ix_users_username_lower
+        stmt = select(User).where(func.lower(User.username) == clean_username.lower()).limit(1)
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
     
-    async def set_banned(self, user_id: int, is_banned: bool = True) -> bool:
-        stmt = select(User).where(User.id == user_id)
+    async def search_users(self, query: str, limit: int = SEARCH_LIMIT) -> List[User]:
+        """
+        Find users by Telegram ID, username prefix, or (from three characters) a part of
+        their username or first name. Prefix matches come first.
+        """
+        query = normalize_username(query)
+        if not query:
+            return []
+        
+        if query.isdigit():
+            number = int(query)
+            conditions = [User.telegram_id == number]
+            if number < 2 ** 31:
+                conditions.append(User.id == number)
+            stmt = select(User).where(or_(*conditions)).limit(limit)
+            result = await self.session.execute(stmt)
+            return list(result.scalars().all())
+        
+        pattern = _like_escape(query.lower())
+        username = func.lower(User.username)
+        stmt = select(User).where(username.like(f"{pattern}%", escape="\\")).order_by(username).limit(limit)
         result = await self.session.execute(stmt)
-        user = result.scalar_one_or_none()
+        users = list(result.scalars().all())
         
-        if user:
-            user.is_banned = is_banned
-            await self.session.commit()
-            await cache.delete(f"user:{user.telegram_id}")
-            logger.info(f"{'🚫' if is_banned else '✅'} User {user_id} ban status: {is_banned}")
-            return True
-        return False
+        if len(users) < limit and len(query) >= 3:
+            # Substring matches use the pg_trgm indexes when the extension is available
+            stmt = select(User).where(
+                or_(
+                    username.like(f"%{pattern}%", escape="\\"),
+                    func.lower(User.first_name).like(f"%{pattern}%", escape="\\")
+                ),
+                User.id.notin_([u.id for u in users]) if users else true()
+            ).order_by(User.id.desc()).limit(limit - len(users))
+            result = await self.session.execute(stmt)
+            users.extend(result.scalars().all())
+        
+        return users
     
-    async def set_balance(self, user_id: int, amount: float) -> bool:
+    async def set_banned(self, user_id: int, is_banned: bool = True) -> bool:
         stmt = select(User).where(User.id == user_id)
         result = await self.session.execute(stmt)
         user = result.scalar_one_or_none()
         
         if user:
-            user.balance = Decimal(str(amount))
+            user.is_banned = is_banned
             await self.session.commit()
             await cache.delete(f"user:{user.telegram_id}")
-            logger.info(f"💰 Balance set for user {user_id}: {amount}")
+            logger.info(f"{'🚫' if is_banned else '✅'} User {user_id} ban status: {is_banned}")
             return True
         return False
     
-    async def get_premium_users(self) -> List[User]:
-        stmt = select(User).where(User.status == UserStatus.PREMIUM).order_by(User.created_at.desc())
-        result = await self.session.execute(stmt)
-        return list(result.scalars().all())
-    
     async def remove_premium_by_id(self, user_id: int) -> bool:
         stmt = select(User).where(User.id == user_id)
         result = await self.session.execute(stmt)
@@ -172,6 +359,22 @@ class UserService:
             return True
         return False
     
+    async def remove_premium_by_ids(self, user_ids: List[int]) -> int:
+        """Downgrade many premium users with one UPDATE and drop their cached profiles together"""
+        if not user_ids:
+            return 0
+        stmt = update(User).where(
+            User.id == any_(literal(user_ids, ARRAY(Integer))),
+            User.status == UserStatus.PREMIUM
+        ).values(status=UserStatus.FREE).returning(User.telegram_id)
+        result = await self.session.execute(stmt)
+        telegram_ids = result.scalars().all()
+        await self.session.commit()
+        
+        await cache.delete_many([f"user:{telegram_id}" for telegram_id in telegram_ids])
+        logger.info(f"⭐ Premium removed from {len(telegram_ids)} users")
+        return len(telegram_ids)
+    
     async def set_premium_by_telegram_id(self, telegram_id: int, is_premium: bool = True) -> bool:
         stmt = select(User).where(User.telegram_id == telegram_id)
         result = await self.session.execute(stmt)
@@ -0,0 +1,259 @@
+import asyncio
+import multiprocessing
+import os
+import secrets
+import signal
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+import aiohttp
+from aiohttp import web
+from aiogram.webhook.aiohttp_server import setup_application
+from loguru import logger
+
+from bot.config import config
+from bot.services.cache import cache
+from bot.services.cache_warmer import cache_warmer
+from bot.services.key_archiver import key_archiver
+from bot.services.metrics import metrics
+from bot.webhook import BackgroundRequestHandler, on_webhook_startup, update_user_id, webhook_secret
+
+
+WORKER_PATH = "/update"
+HEALTH_PATH = "/health"
+MONITOR_INTERVAL = 10
+FORWARD_ATTEMPTS = 5
+
+
+def shard_for(key: int, workers: int) -> int:
+    """Stable worker index for a user; the same user always lands on the same worker"""
+    return zlib.crc32(str(key).encode()) % workers
+
+
+class ShardRouter:
+    """
+    Front process of the sharded webhook mode.
+    
+    Accepts updates from Telegram, picks a worker by hash of the sender's id and
+    forwards them over localhost. Each worker has a single FIFO sender, so updates of
+    one user reach their worker in the order Telegram delivered them; the worker's
+    UserSequencingMiddleware then runs them one at a time.
+    """
+    
+    def __init__(self, workers: int, base_port: int, drain_timeout: int):
+        self.workers = workers
+        self.ports = [base_port + i for i in range(workers)]
+        self.drain_timeout = drain_timeout
+        self.queues: List[asyncio.Queue] = [asyncio.Queue() for _ in range(workers)]
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self._internal_secret = secrets.token_urlsafe(32)
+        self._context = multiprocessing.get_context("spawn")
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tasks: List[asyncio.Task] = []
+        self._accepting = False
+    
+    def register(self, app: web.Application, path: str):
+        app.router.add_post(path, self.handle)
+        app.on_startup.append(self._start)
+        app.on_shutdown.append(self._drain)
+        app["shard_router"] = self
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not secrets.compare_digest(token, webhook_secret()):
+            return web.Response(body="Unauthorized", status=401)
+        if not self._accepting:
+            # Telegram keeps the update and retries, so nothing is lost during a restart
+            return web.Response(body="Shutting down", status=503)
+        
+        update = await request.json()
+        key = update_user_id(update)
+        index = shard_for(key if key is not None else update.get("update_id", 0), self.workers)
+        
+        queue = self.queues[index]
+        queue.put_nowait(update)
+        metrics.set_gauge(f"shard.{index}.queue_depth", queue.qsize())
+        return web.json_response({})
+    
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=run_worker,
+            args=(index, self.ports[index], self._internal_secret),
+            name=f"bot-worker-{index}"
+        )
+        process.start()
+        self.processes[index] = process
+        logger.info(f"👷 Worker {index} started (pid {process.pid}, port {self.ports[index]})")
+    
+    async def _start(self, app: web.Application):
+        from bot.main import create_bot, create_dispatcher, prepare_database
+        
+        # Schema changes, maintenance jobs and the cache warm-up run once here instead of in every worker
+        await prepare_database()
+        key_archiver.start()
+        await cache.connect()
+        cache_warmer.start()
+        
+        bot = create_bot()
+        try:
+            await on_webhook_startup(bot, create_dispatcher())
+        finally:
+            await bot.session.close()
+        
+        for index in range(self.workers):
+            self._spawn(index)
+        
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+        self._tasks = [asyncio.create_task(self._sender(index)) for index in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._monitor()))
+        self._accepting = True
+        logger.info(f"🔀 Sharded webhook mode: {self.workers} workers")
+    
+    async def _sender(self, index: int):
+        queue = self.queues[index]
+        while True:
+            update = await queue.get()
+            try:
+                await self._forward(index, update)
+            finally:
+                queue.task_done()
+                metrics.set_gauge(f"shard.{index}.queue_depth", queue.qsize())
+    
+    async def _forward(self, index: int, update: Dict[str, Any]):
+        url = f"http://127.0.0.1:{self.ports[index]}{WORKER_PATH}"
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self._internal_secret}
+        
+        for attempt in range(FORWARD_ATTEMPTS):
+            try:
+                async with self._session.post(url, json=update, headers=headers) as response:
+                    if response.status == 200:
+                        metrics.incr(f"shard.{index}.forwarded")
+                        return
+                    logger.warning(f"Worker {index} answered {response.status}")
+            except aiohttp.ClientError as e:
+                logger.warning(f"Worker {index} unreachable: {e}")
+            # A worker that is (re)starting needs a moment before it listens
+            await asyncio.sleep(0.5 * 2 ** attempt)
+        
+        metrics.incr(f"shard.{index}.dropped")
+        logger.error(f"❌ Dropped update {update.get('update_id')} for worker {index}")
+    
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(MONITOR_INTERVAL)
+            if not self._accepting:
+                continue
+            for index, process in list(self.processes.items()):
+                if not process.is_alive():
+                    logger.error(f"💀 Worker {index} exited with code {process.exitcode}, restarting")
+                    metrics.incr(f"shard.{index}.restarts")
+                    self._spawn(index)
+    
+    async def _drain(self, app: web.Application):
+        self._accepting = False
+        logger.info("⏳ Draining worker queues...")
+        
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self.queues)),
+                timeout=self.drain_timeout
+            )
+        except asyncio.TimeoutError:
+            pending = sum(queue.qsize() for queue in self.queues)
+            logger.warning(f"⚠️ Drain timed out with {pending} updates still queued")
+        
+        await key_archiver.close()
+        await cache_warmer.close()
+        await cache.disconnect()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._session:
+            await self._session.close()
+        
+        # Workers finish their in-flight updates on SIGTERM before exiting
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        loop = asyncio.get_running_loop()
+        for index, process in self.processes.items():
+            await loop.run_in_executor(None, process.join, self.drain_timeout)
+            if process.is_alive():
+                logger.warning(f"⚠️ Worker {index} did not stop in time, killing it")
+                process.kill()
+        logger.info("👋 All workers stopped")
+    
+    async def health(self) -> List[Dict[str, Any]]:
+        """Status of every worker, as reported by the worker itself"""
+        async def probe(index: int) -> Dict[str, Any]:
+            process = self.processes.get(index)
+            status = {
+                "worker": index,
+                "pid": process.pid if process else None,
+                "alive": bool(process and process.is_alive()),
+                "queue_depth": self.queues[index].qsize(),
+            }
+            if not status["alive"] or not self._session:
+                return status
+            try:
+                url = f"http://127.0.0.1:{self.ports[index]}{HEALTH_PATH}"
+                async with self._session.get(url, timeout=aiohttp.ClientTimeout(total=2)) as response:
+                    status.update(await response.json())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status["error"] = str(e) or type(e).__name__
+            return status
+        
+        return list(await asyncio.gather(*(probe(index) for index in range(self.workers))))
+
+
+def setup_sharded_webhook(app: web.Application):
+    """Front half of the sharded mode: receive updates here, process them in worker processes"""
+    ShardRouter(
+        workers=config.sharding.workers,
+        base_port=config.sharding.base_port,
+        drain_timeout=config.sharding.drain_timeout
+    ).register(app, path=config.webhook.path)
+
+
+def run_worker(index: int, port: int, secret: str):
+    # Ctrl+C reaches the whole process group; the front decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker_main(index, port, secret))
+
+
+async def _worker_main(index: int, port: int, secret: str):
+    from bot.main import create_bot, create_dispatcher
+    
+    bot = create_bot()
+    dp = create_dispatcher()
+    dp["run_migrations"] = False
+    
+    handler = BackgroundRequestHandler(dp, bot, secret_token=secret)
+    started_at = time.time()
+    
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({
+            "pid": os.getpid(),
+            "in_flight": handler.in_flight,
+            "processed": metrics.get("webhook.updates"),
+            "uptime": round(time.time() - started_at),
+        })
+    
+    app = web.Application()
+    handler.register(app, path=WORKER_PATH)
+    app.router.add_get(HEALTH_PATH, health)
+    setup_application(app, dp, bot=bot)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    await stop.wait()
+    
+    logger.info(f"🛑 Worker {index} draining...")
+    await site.stop()
+    await handler.drain(config.sharding.drain_timeout)
+    await runner.cleanup()
@@ -0,0 +1,77 @@
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+from loguru import logger
+
+from bot.services.metrics import metrics
+
+
+# Reference point for "how long until the process is useful"; bot.main imports this module first
+PROCESS_STARTED = time.monotonic()
+_first_update_seen = False
+
+
+@dataclass
+class Phase:
+    name: str
+    run: Callable[[], Any]  # a coroutine function, or a plain function for instant steps
+    after: Tuple[str, ...] = ()
+
+
+async def run_phases(phases: List[Phase]) -> Dict[str, float]:
+    """
+    Run startup phases as a dependency graph: each phase starts as soon as the phases in its
+    `after` are done, so independent ones (a DB migration, a Redis ping, getMe) overlap.
+    
+    Every phase's duration is logged and recorded as the `startup.<name>` timing. The first
+    failing phase cancels the rest and its error is raised.
+    """
+    names = {phase.name for phase in phases}
+    for phase in phases:
+        missing = set(phase.after) - names
+        if missing:
+            raise ValueError(f"Startup phase {phase.name} depends on unknown phases: {sorted(missing)}")
+    
+    tasks: Dict[str, asyncio.Task] = {}
+    timings: Dict[str, float] = {}
+    
+    async def run(phase: Phase):
+        if phase.after:
+            await asyncio.gather(*(tasks[name] for name in phase.after))
+        started = time.monotonic()
+        result = phase.run()
+        if inspect.isawaitable(result):
+            await result
+        timings[phase.name] = elapsed = time.monotonic() - started
+        metrics.observe(f"startup.{phase.name}", elapsed)
+        logger.info(f"⏱ Startup phase {phase.name}: {elapsed * 1000:.0f} ms")
+    
+    started = time.monotonic()
+    for phase in phases:
+        tasks[phase.name] = asyncio.create_task(run(phase))
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+    
+    timings["total"] = elapsed = time.monotonic() - started
+    metrics.observe("startup.total", elapsed)
+    metrics.set_gauge("startup.ready_seconds", round(time.monotonic() - PROCESS_STARTED, 3))
+    logger.info(f"⏱ Startup finished in {elapsed * 1000:.0f} ms")
+    return timings
+
+
+def mark_first_update():
+    """Record seconds from process start to the first update; later calls are free"""
+    global _first_update_seen
+    if _first_update_seen:
+        return
+    _first_update_seen = True
+    seconds = time.monotonic() - PROCESS_STARTED
+    metrics.set_gauge("startup.first_update_seconds", round(seconds, 3))
+    logger.info(f"⏱ First update {seconds:.2f}s after process start")
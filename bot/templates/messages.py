@@ -1,4 +1,5 @@
 from datetime import datetime
+from html import escape
 from typing import List, Optional
 
 
@@ -489,6 +490,70 @@ Select an option to manage your panel:
 {Templates.DIVIDER}
 {seller_text}
 {Templates.DIVIDER}
+"""
+    
+    @staticmethod
+    def sales_chart(series: list, products: list, days: int) -> str:
+        hourly = days == 1
+        title = "LAST 24 HOURS" if hourly else f"LAST {days} DAYS"
+        peak = max((p["revenue"] for p in series), default=0) or 1
+        
+        chart_text = ""
+        for point in series:
+            label = point["period"][11:16] if hourly else point["period"][5:10]
+            bar = "▇" * round(point["revenue"] / peak * 10)
+            chart_text += f"<code>{label} {bar:<10} ${point['revenue']:.2f}</code>\n"
+        
+        products_text = ""
+        for item in products[:5]:
+            products_text += f"   • {item['product_name']} ({item['duration']}): {item['orders']} orders, <code>${item['revenue']:.2f}</code>\n"
+        
+        total_orders = sum(p["orders"] for p in series)
+        total_revenue = sum(p["revenue"] for p in series)
+        return f"""
+{Templates.DIVIDER}
+📈 <b>SALES - {title}</b>
+{Templates.DIVIDER}
+
+{chart_text}
+💰 <b>Total:</b> <code>{total_orders}</code> orders, <code>${total_revenue:.2f}</code>
+
+🏆 <b>Top Products</b>
+{Templates.DIVIDER_THIN}
+{products_text or "   <i>No sales in this period.</i>"}
+{Templates.DIVIDER}
+"""
+    
+    @staticmethod
+    def user_search_results(query: str, users: list) -> str:
+        if not users:
+            return f"""
+{Templates.DIVIDER}
+🔍 <b>FIND USER</b>
+{Templates.DIVIDER}
+
+<i>No users match</i> <code>{escape(query)}</code>
+
+{Templates.DIVIDER}
+"""
+        
+        users_text = ""
+        for user in users:
+            name = escape(user.first_name or "No name")
+            username = f" (@{escape(user.username)})" if user.username else ""
+            flags = " ⭐" if user.status.value == "premium" else ""
+            flags += " 🚫" if user.is_banned else ""
+            users_text += f"""
+👤 <b>{name}</b>{username}{flags}
+   🆔 <code>{user.telegram_id}</code> · 💰 <code>${float(user.balance):.2f}</code>
+"""
+        
+        return f"""
+{Templates.DIVIDER}
+🔍 <b>FIND USER</b> - {len(users)} result{"s" if len(users) != 1 else ""}
+{Templates.DIVIDER}
+{users_text}
+{Templates.DIVIDER}
 """
     
     @staticmethod
@@ -0,0 +1,22 @@
+import re
+from typing import Optional, Tuple
+
+
+DAYS_PER_MONTH = 30
+
+# "7d", "1m", "7 Days", "3 Months"; legacy values carry the code before a pipe ("7d|7 Days")
+_DURATION = re.compile(r'^\s*(\d+)\s*(d|m)[a-z]*\s*$', re.IGNORECASE)
+
+
+def parse_duration(value: str) -> Optional[Tuple[int, str]]:
+    """Turn a duration as admins type it into (days, display label), or None if it isn't one"""
+    match = _DURATION.match(value.split('|')[0])
+    if not match:
+        return None
+    
+    num = int(match.group(1))
+    if num < 1:
+        return None
+    if match.group(2).lower() == 'd':
+        return num, f"{num} Day{'s' if num > 1 else ''}"
+    return num * DAYS_PER_MONTH, f"{num} Month{'s' if num > 1 else ''}"
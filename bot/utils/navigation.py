@@ -0,0 +1,149 @@
+import os
+from collections import OrderedDict
+from typing import Optional, Tuple, Union
+from aiogram.types import CallbackQuery, Message, InputMediaPhoto, FSInputFile
+from aiogram.enums import ParseMode, ContentType
+from aiogram.exceptions import TelegramBadRequest
+from loguru import logger
+
+from bot.database import async_session
+from bot.services.media_service import MediaService
+
+
+KIND_TEXT = "text"
+KIND_PHOTO = "photo"
+
+# Telegram limits photo captions to 1024 characters (text messages allow 4096)
+CAPTION_LIMIT = 1024
+
+# Chats whose last screen is remembered; the least recently navigated are forgotten first
+MAX_TRACKED_SCREENS = 5000
+
+# chat_id -> (message_id, kind) of the last screen the bot rendered in that chat
+_screens: "OrderedDict[int, Tuple[int, str]]" = OrderedDict()
+
+
+def current_kind(message) -> str:
+    content_type = getattr(message, "content_type", None)
+    if content_type is not None:
+        return KIND_PHOTO if content_type == ContentType.PHOTO else KIND_TEXT
+    
+    # Inaccessible (old) messages carry no content; fall back to what we last rendered
+    tracked = _screens.get(message.chat.id)
+    if tracked and tracked[0] == message.message_id:
+        return tracked[1]
+    return KIND_TEXT
+
+
+def _track(chat_id: int, message_id: int, kind: str):
+    _screens[chat_id] = (message_id, kind)
+    _screens.move_to_end(chat_id)
+    if len(_screens) > MAX_TRACKED_SCREENS:
+        _screens.popitem(last=False)
+
+
+async def navigate(
+    callback: CallbackQuery,
+    text: str,
+    reply_markup=None,
+    photo: Optional[Union[str, FSInputFile]] = None,
+    photo_path: Optional[str] = None,
+    force_photo: bool = False
+) -> Optional[Message]:
+    """
+    Move the callback's message to a new screen, editing in place whenever Telegram allows it.
+    
+    Photo -> photo uses edit_media, photo -> text uses edit_caption (if the text fits in a caption)
+    and text -> text uses edit_text, so each of these costs one API call. A text message can't
+    become a photo, so that transition keeps the text unless force_photo is set, in which case
+    the message is replaced (delete + send).
+    """
+    message = callback.message
+    chat_id = message.chat.id
+    kind = current_kind(message)
+    
+    if photo is None and photo_path and os.path.exists(photo_path):
+        async with async_session() as session:
+            photo = await MediaService(session).get_input(photo_path)
+    
+    try:
+        if photo is not None and kind == KIND_PHOTO:
+            result = await message.edit_media(
+                media=InputMediaPhoto(media=photo, caption=text, parse_mode=ParseMode.HTML),
+                reply_markup=reply_markup
+            )
+            await _remember_upload(photo, photo_path, result)
+            _track(chat_id, message.message_id, KIND_PHOTO)
+            return result if isinstance(result, Message) else None
+        
+        if photo is not None and force_photo:
+            return await _replace(callback, text, reply_markup, photo, photo_path)
+        
+        if kind == KIND_PHOTO:
+            if len(text) > CAPTION_LIMIT:
+                return await _replace(callback, text, reply_markup)
+            result = await message.edit_caption(
+                caption=text,
+                parse_mode=ParseMode.HTML,
+                reply_markup=reply_markup
+            )
+            _track(chat_id, message.message_id, KIND_PHOTO)
+            return result if isinstance(result, Message) else None
+        
+        result = await message.edit_text(
+            text,
+            parse_mode=ParseMode.HTML,
+            reply_markup=reply_markup
+        )
+        _track(chat_id, message.message_id, KIND_TEXT)
+        return result if isinstance(result, Message) else None
+    except TelegramBadRequest as e:
+        if "message is not modified" in str(e):
+            return None
+        if photo_path and isinstance(photo, str) and "file" in str(e).lower():
+            async with async_session() as session:
+                await MediaService(session).forget(photo_path)
+            photo = FSInputFile(photo_path)
+        logger.debug(f"In-place navigation failed, replacing message: {e}")
+        return await _replace(callback, text, reply_markup, photo, photo_path)
+
+
+async def _replace(
+    callback: CallbackQuery,
+    text: str,
+    reply_markup=None,
+    photo: Optional[Union[str, FSInputFile]] = None,
+    photo_path: Optional[str] = None
+) -> Message:
+    chat_id = callback.message.chat.id
+    try:
+        await callback.message.delete()
+    except Exception:
+        pass
+    
+    if photo is not None:
+        sent = await callback.bot.send_photo(
+            chat_id=chat_id,
+            photo=photo,
+            caption=text,
+            parse_mode=ParseMode.HTML,
+            reply_markup=reply_markup
+        )
+        await _remember_upload(photo, photo_path, sent)
+        _track(chat_id, sent.message_id, KIND_PHOTO)
+        return sent
+    
+    sent = await callback.bot.send_message(
+        chat_id=chat_id,
+        text=text,
+        parse_mode=ParseMode.HTML,
+        reply_markup=reply_markup
+    )
+    _track(chat_id, sent.message_id, KIND_TEXT)
+    return sent
+
+
+async def _remember_upload(photo, photo_path: Optional[str], result):
+    if photo_path and isinstance(photo, FSInputFile) and isinstance(result, Message):
+        async with async_session() as session:
+            await MediaService(session).remember_from_message(photo_path, result)
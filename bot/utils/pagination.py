@@ -0,0 +1,124 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple
+from sqlalchemy import DateTime, Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+
+# Cursors are "a<id>" (rows after id, i.e. the next page) or "b<id>" (rows before id, the
+# previous page); composite keys join their values with "." and store datetimes as
+# microseconds since the epoch. They stay a few bytes long so they fit in Telegram callback data.
+AFTER = "a"
+BEFORE = "b"
+EPOCH = datetime(1970, 1, 1)
+
+
+@dataclass
+class Page:
+    items: List[Any] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+def make_cursor(direction: str, values: Sequence[Any]) -> str:
+    parts = [str((v - EPOCH) // timedelta(microseconds=1)) if isinstance(v, datetime) else str(v) for v in values]
+    return direction + ".".join(parts)
+
+
+def parse_cursor(cursor: Optional[str], columns: Sequence[Any]) -> Tuple[Optional[str], Optional[tuple]]:
+    if not cursor or cursor[0] not in (AFTER, BEFORE):
+        return None, None
+    parts = cursor[1:].split(".")
+    if len(parts) != len(columns) or not all(part.isdigit() for part in parts):
+        return None, None
+    values = tuple(
+        EPOCH + timedelta(microseconds=int(part)) if isinstance(column.type, DateTime) else int(part)
+        for column, part in zip(columns, parts)
+    )
+    return cursor[0], values
+
+
+def clamp_limit(limit: Any, default: int = DEFAULT_LIMIT) -> int:
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, MAX_LIMIT))
+
+
+async def paginate(
+    session: AsyncSession,
+    stmt: Select,
+    key_column,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_LIMIT
+) -> Page:
+    """
+    Keyset-paginate `stmt` newest first by a unique, indexed integer column (usually the PK),
+    or by a tuple of columns ending in one, such as (purchased_at, id).
+    
+    Each page is one indexed range scan of limit + 1 rows, so the cost doesn't grow with the
+    table size or with how deep the admin has paged.
+    """
+    columns = tuple(key_column) if isinstance(key_column, (tuple, list)) else (key_column,)
+    direction, values = parse_cursor(cursor, columns)
+    limit = clamp_limit(limit)
+    
+    key = columns[0] if len(columns) == 1 else tuple_(*columns)
+    if direction is not None:
+        bound = values[0] if len(columns) == 1 else tuple_(*values)
+    if direction == BEFORE:
+        stmt = stmt.where(key > bound).order_by(*(column.asc() for column in columns))
+    elif direction == AFTER:
+        stmt = stmt.where(key < bound).order_by(*(column.desc() for column in columns))
+    else:
+        stmt = stmt.order_by(*(column.desc() for column in columns))
+    
+    result = await session.execute(stmt.limit(limit + 1))
+    # Entity queries yield model instances, column queries yield rows with the same attributes
+    rows = list(result.scalars().all() if len(stmt.column_descriptions) == 1 else result.all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == BEFORE:
+        rows.reverse()
+    
+    if not rows:
+        # Rows may have been deleted since the cursor was issued; point back at the anchor
+        # (inclusive) so a pager that lands on an empty page still has a way out
+        if direction == BEFORE:
+            return Page(next_cursor=make_cursor(AFTER, (*values[:-1], values[-1] + 1)))
+        if direction == AFTER:
+            return Page(prev_cursor=make_cursor(BEFORE, (*values[:-1], values[-1] - 1)))
+        return Page()
+    
+    first = [getattr(rows[0], column.key) for column in columns]
+    last = [getattr(rows[-1], column.key) for column in columns]
+    if direction == BEFORE:
+        return Page(
+            rows,
+            next_cursor=make_cursor(AFTER, last),
+            prev_cursor=make_cursor(BEFORE, first) if has_more else None
+        )
+    return Page(
+        rows,
+        next_cursor=make_cursor(AFTER, last) if has_more else None,
+        prev_cursor=make_cursor(BEFORE, first) if direction == AFTER else None
+    )
+
+
+async def iterate(session: AsyncSession, stmt: Select, key_column, batch_size: int = MAX_LIMIT) -> AsyncIterator[Any]:
+    """Walk every row of `stmt` page by page without holding the whole result in memory.
+    
+    Prefer selecting plain columns here: model instances stay in the session's identity map.
+    """
+    cursor = None
+    while True:
+        page = await paginate(session, stmt, key_column, cursor=cursor, limit=batch_size)
+        for item in page.items:
+            yield item
+        if not page.next_cursor:
+            return
+        cursor = page.next_cursor
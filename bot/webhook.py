@@ -0,0 +1,74 @@
+import asyncio
+import hashlib
+from typing import Any, Dict, Optional
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from loguru import logger
+
+from bot.config import config
+from bot.services.metrics import metrics
+
+
+def webhook_secret() -> str:
+    """Secret Telegram sends in X-Telegram-Bot-Api-Secret-Token.
+    
+    Falls back to a value derived from the bot token so every instance behind a
+    load balancer agrees on it without extra configuration.
+    """
+    if config.webhook.secret:
+        return config.webhook.secret
+    return hashlib.sha256(f"webhook:{config.bot.token}".encode()).hexdigest()
+
+
+def update_user_id(update: Dict[str, Any]) -> Optional[int]:
+    """Telegram user (or chat, for updates without a sender) a raw update belongs to"""
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+        sender = value.get("from") or value.get("user")
+        if isinstance(sender, dict) and "id" in sender:
+            return sender["id"]
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return chat["id"]
+    return None
+
+
+class BackgroundRequestHandler(SimpleRequestHandler):
+    """Acknowledges updates immediately and processes them in background tasks.
+    
+    Ordering and the in-flight limit are enforced by UserSequencingMiddleware on the dispatcher.
+    """
+    
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, **kwargs: Any):
+        super().__init__(dispatcher, bot, handle_in_background=True, **kwargs)
+    
+    @property
+    def in_flight(self) -> int:
+        return len(self._background_feed_update_tasks)
+    
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        metrics.set_gauge("webhook.in_flight", self.in_flight)
+        await super()._background_feed_update(bot, update)
+        metrics.incr("webhook.updates")
+    
+    async def drain(self, timeout: float):
+        """Wait for updates that were already accepted to finish processing"""
+        tasks = set(self._background_feed_update_tasks)
+        if tasks:
+            logger.info(f"⏳ Draining {len(tasks)} in-flight updates...")
+            await asyncio.wait(tasks, timeout=timeout)
+
+
+async def on_webhook_startup(bot: Bot, dispatcher: Dispatcher):
+    if not config.webhook.base_url:
+        logger.error("❌ WEBHOOK_URL is not set, Telegram can't deliver updates!")
+        return
+    
+    await bot.set_webhook(
+        url=config.webhook.url,
+        secret_token=webhook_secret(),
+        max_connections=config.webhook.max_connections,
+        allowed_updates=dispatcher.resolve_used_update_types(),
+    )
+    logger.info(f"🔗 Webhook set: {config.webhook.url}")
@@ -0,0 +1,33 @@
+export interface Job {
+  id: string
+  kind: string
+  description: string
+  status: 'running' | 'done' | 'failed'
+  done: number
+  total: number | null
+  error: string | null
+}
+
+// Bulk deletes answer 202 with a job id; poll it until the job finishes
+export async function waitForJob(response: Response, onProgress?: (job: Job) => void): Promise<Job | null> {
+  const data = await response.json()
+  if (!response.ok) {
+    alert(data.error || 'Request failed')
+    return null
+  }
+  if (!data.job_id) return null
+
+  while (true) {
+    await new Promise(resolve => setTimeout(resolve, 1000))
+    const res = await fetch(`/api/jobs/${data.job_id}`, {
+      headers: { 'Authorization': `Bearer ${localStorage.getItem('auth_token')}` }
+    })
+    if (!res.ok) return null
+    const job: Job = await res.json()
+    onProgress?.(job)
+    if (job.status !== 'running') {
+      if (job.status === 'failed') alert(`${job.description} failed: ${job.error}`)
+      return job
+    }
+  }
+}
@@ -13,14 +13,21 @@ export default function Admins() {
   const [loading, setLoading] = useState(true)
   const [showAddModal, setShowAddModal] = useState(false)
   const [newAdminId, setNewAdminId] = useState('')
+  const [cursor, setCursor] = useState<string | null>(null)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [prevCursor, setPrevCursor] = useState<string | null>(null)
 
   const fetchAdmins = () => {
-    fetch('/api/admins', {
+    const params = new URLSearchParams()
+    if (cursor) params.set('cursor', cursor)
+    fetch(`/api/admins?${params}`, {
       headers: { 'Authorization': `Bearer ${localStorage.getItem('auth_token')}` }
     })
       .then(res => res.json())
       .then(data => {
         setAdmins(data.admins || [])
+        setNextCursor(data.next_cursor || null)
+        setPrevCursor(data.prev_cursor || null)
         setLoading(false)
       })
       .catch(() => setLoading(false))
@@ -28,7 +35,7 @@ export default function Admins() {
 
   useEffect(() => {
     fetchAdmins()
-  }, [])
+  }, [cursor])
 
   const handleAddAdmin = async () => {
     if (!newAdminId.trim()) return
@@ -71,7 +78,7 @@ export default function Admins() {
       </div>
 
       <div className="glass-card p-1">
-        <p className="text-gray-400 text-sm p-4">Total: {admins.length} admins</p>
+        <p className="text-gray-400 text-sm p-4">Showing {admins.length} admins</p>
       </div>
 
       {loading ? (
@@ -111,6 +118,24 @@ export default function Admins() {
           ))}
         </div>
       )}
+      {!loading && (prevCursor || nextCursor) && (
+        <div className="glass-card flex justify-between p-4 mt-6">
+          <button
+            onClick={() => setCursor(prevCursor)}
+            disabled={!prevCursor}
+            className="px-4 py-2 rounded-lg glass-input text-white disabled:opacity-40"
+          >
+            ← Prev
+          </button>
+          <button
+            onClick={() => setCursor(nextCursor)}
+            disabled={!nextCursor}
+            className="px-4 py-2 rounded-lg glass-input text-white disabled:opacity-40"
+          >
+            Next →
+          </button>
+        </div>
+      )}
 
       {showAddModal && (
         <div className="fixed inset-0 bg-black/50 flex items-center justify-center z-50">
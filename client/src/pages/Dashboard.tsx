@@ -13,9 +13,26 @@ interface Stats {
   total_revenue: number
 }
 
+interface SalesPoint {
+  period: string
+  orders: number
+  revenue: number
+}
+
 export default function Dashboard() {
   const [stats, setStats] = useState<Stats | null>(null)
   const [loading, setLoading] = useState(true)
+  const [days, setDays] = useState(30)
+  const [sales, setSales] = useState<SalesPoint[]>([])
+
+  useEffect(() => {
+    fetch(`/api/sales?days=${days}&granularity=${days === 1 ? 'hour' : 'day'}`, {
+      headers: { 'Authorization': `Bearer ${localStorage.getItem('auth_token')}` }
+    })
+      .then(res => res.json())
+      .then(data => setSales(data.series || []))
+      .catch(() => setSales([]))
+  }, [days])
 
   useEffect(() => {
     fetch('/api/stats', {
@@ -50,6 +67,8 @@ export default function Dashboard() {
     { label: 'Revenue', value: `$${(stats?.total_revenue || 0).toFixed(2)}`, icon: '💰', color: 'from-green-400 to-emerald-600' },
   ]
 
+  const peak = Math.max(...sales.map(p => p.revenue), 1)
+
   return (
     <div>
       <div className="mb-8">
@@ -68,6 +87,32 @@ export default function Dashboard() {
           </div>
         ))}
       </div>
+
+      <div className="glass-card p-6 mt-8">
+        <div className="flex justify-between items-center mb-6">
+          <h2 className="text-xl font-bold text-white">Revenue</h2>
+          <select
+            value={days}
+            onChange={(e) => setDays(Number(e.target.value))}
+            className="px-4 py-2 rounded-lg glass-input text-white"
+          >
+            <option value={1}>Last 24 hours</option>
+            <option value={7}>Last 7 days</option>
+            <option value={30}>Last 30 days</option>
+            <option value={90}>Last 90 days</option>
+          </select>
+        </div>
+        <div className="flex items-end gap-1 h-48">
+          {sales.map(point => (
+            <div
+              key={point.period}
+              title={`${point.period.slice(0, days === 1 ? 16 : 10)}: $${point.revenue.toFixed(2)} (${point.orders} orders)`}
+              className="flex-1 bg-gradient-to-t from-green-500 to-emerald-400 rounded-t"
+              style={{ height: `${(point.revenue / peak) * 100}%` }}
+            />
+          ))}
+        </div>
+      </div>
     </div>
   )
 }
@@ -1,4 +1,5 @@
 import { useEffect, useState } from 'react'
+import { waitForJob } from '../lib/jobs'
 
 interface Key {
   id: number
@@ -22,15 +23,23 @@ export default function Keys() {
   const [showAddModal, setShowAddModal] = useState(false)
   const [newKeys, setNewKeys] = useState('')
   const [selectedKeys, setSelectedKeys] = useState<number[]>([])
+  const [cursor, setCursor] = useState<string | null>(null)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [prevCursor, setPrevCursor] = useState<string | null>(null)
+  const [deleting, setDeleting] = useState<number | null>(null)
 
   const fetchKeys = () => {
-    const url = selectedProduct ? `/api/keys?product_id=${selectedProduct}` : '/api/keys'
-    fetch(url, {
+    const params = new URLSearchParams()
+    if (selectedProduct) params.set('product_id', String(selectedProduct))
+    if (cursor) params.set('cursor', cursor)
+    fetch(`/api/keys?${params}`, {
       headers: { 'Authorization': `Bearer ${localStorage.getItem('auth_token')}` }
     })
       .then(res => res.json())
       .then(data => {
         setKeys(data.keys || [])
+        setNextCursor(data.next_cursor || null)
+        setPrevCursor(data.prev_cursor || null)
         setLoading(false)
       })
       .catch(() => setLoading(false))
@@ -45,9 +54,13 @@ export default function Keys() {
   }, [])
 
   useEffect(() => {
-    fetchKeys()
+    setCursor(null)
   }, [selectedProduct])
 
+  useEffect(() => {
+    fetchKeys()
+  }, [selectedProduct, cursor])
+
   const handleAddKeys = async () => {
     if (!selectedProduct || !newKeys.trim()) return
     
@@ -85,10 +98,13 @@ export default function Keys() {
     if (!selectedProduct) return
     if (!confirm('Are you sure you want to delete ALL keys for this product?')) return
     
-    await fetch(`/api/keys/delete-all/${selectedProduct}`, {
+    setDeleting(0)
+    const res = await fetch(`/api/keys/delete-all/${selectedProduct}`, {
       method: 'DELETE',
       headers: { 'Authorization': `Bearer ${localStorage.getItem('auth_token')}` }
     })
+    await waitForJob(res, job => setDeleting(job.done))
+    setDeleting(null)
     
     fetchKeys()
   }
@@ -97,10 +113,13 @@ export default function Keys() {
     if (!selectedProduct) return
     if (!confirm('Are you sure you want to delete all CLAIMED keys?')) return
     
-    await fetch(`/api/keys/delete-claimed/${selectedProduct}`, {
+    setDeleting(0)
+    const res = await fetch(`/api/keys/delete-claimed/${selectedProduct}`, {
       method: 'DELETE',
       headers: { 'Authorization': `Bearer ${localStorage.getItem('auth_token')}` }
     })
+    await waitForJob(res, job => setDeleting(job.done))
+    setDeleting(null)
     
     fetchKeys()
   }
@@ -139,13 +158,16 @@ export default function Keys() {
           </select>
           {selectedProduct && (
             <>
+              {deleting !== null && (
+                <span className="text-gray-400">Deleting... {deleting} keys</span>
+              )}
               <button onClick={() => setShowAddModal(true)} className="px-4 py-2 rounded-lg btn-primary text-white">
                 + Add Keys
               </button>
-              <button onClick={handleDeleteClaimed} className="px-4 py-2 rounded-lg bg-orange-500/20 text-orange-400 hover:bg-orange-500/30">
+              <button onClick={handleDeleteClaimed} disabled={deleting !== null} className="px-4 py-2 rounded-lg bg-orange-500/20 text-orange-400 hover:bg-orange-500/30">
                 Delete Claimed
               </button>
-              <button onClick={handleDeleteAll} className="px-4 py-2 rounded-lg bg-red-500/20 text-red-400 hover:bg-red-500/30">
+              <button onClick={handleDeleteAll} disabled={deleting !== null} className="px-4 py-2 rounded-lg bg-red-500/20 text-red-400 hover:bg-red-500/30">
                 Delete All
               </button>
             </>
@@ -217,6 +239,24 @@ export default function Keys() {
           {keys.length === 0 && (
             <div className="text-center py-12 text-gray-400">No keys found</div>
           )}
+          {(prevCursor || nextCursor) && (
+            <div className="flex justify-between p-4 border-t border-white/10">
+              <button
+                onClick={() => setCursor(prevCursor)}
+                disabled={!prevCursor}
+                className="px-4 py-2 rounded-lg glass-input text-white disabled:opacity-40"
+              >
+                ← Prev
+              </button>
+              <button
+                onClick={() => setCursor(nextCursor)}
+                disabled={!nextCursor}
+                className="px-4 py-2 rounded-lg glass-input text-white disabled:opacity-40"
+              >
+                Next →
+              </button>
+            </div>
+          )}
         </div>
       )}
 
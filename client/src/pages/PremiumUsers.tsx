@@ -13,22 +13,31 @@ export default function PremiumUsers() {
   const [showAddModal, setShowAddModal] = useState(false)
   const [newUserId, setNewUserId] = useState('')
   const [selectedUsers, setSelectedUsers] = useState<number[]>([])
+  const [cursor, setCursor] = useState<string | null>(null)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [prevCursor, setPrevCursor] = useState<string | null>(null)
 
   const fetchUsers = () => {
-    fetch('/api/premium-users', {
+    const params = new URLSearchParams()
+    if (cursor) params.set('cursor', cursor)
+    fetch(`/api/premium-users?${params}`, {
       headers: { 'Authorization': `Bearer ${localStorage.getItem('auth_token')}` }
     })
       .then(res => res.json())
       .then(data => {
         setUsers(data.users || [])
+        setNextCursor(data.next_cursor || null)
+        setPrevCursor(data.prev_cursor || null)
         setLoading(false)
       })
       .catch(() => setLoading(false))
   }
 
   useEffect(() => {
+    // Selection only covers the rows on screen
+    setSelectedUsers([])
     fetchUsers()
-  }, [])
+  }, [cursor])
 
   const handleAddUser = async () => {
     if (!newUserId.trim()) return
@@ -102,7 +111,7 @@ export default function PremiumUsers() {
       </div>
 
       <div className="glass-card p-1">
-        <p className="text-gray-400 text-sm p-4">Total: {users.length} premium users</p>
+        <p className="text-gray-400 text-sm p-4">Showing {users.length} premium users</p>
       </div>
 
       {selectedUsers.length > 0 && (
@@ -174,6 +183,24 @@ export default function PremiumUsers() {
           {users.length === 0 && (
             <div className="text-center py-12 text-gray-400">No premium users found</div>
           )}
+          {(prevCursor || nextCursor) && (
+            <div className="flex justify-between p-4 border-t border-white/10">
+              <button
+                onClick={() => setCursor(prevCursor)}
+                disabled={!prevCursor}
+                className="px-4 py-2 rounded-lg glass-input text-white disabled:opacity-40"
+              >
+                ← Prev
+              </button>
+              <button
+                onClick={() => setCursor(nextCursor)}
+                disabled={!nextCursor}
+                className="px-4 py-2 rounded-lg glass-input text-white disabled:opacity-40"
+              >
+                Next →
+              </button>
+            </div>
+          )}
         </div>
       )}
 
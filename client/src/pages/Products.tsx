@@ -1,4 +1,5 @@
 import { useEffect, useState } from 'react'
+import { waitForJob } from '../lib/jobs'
 
 interface Product {
   id: number
@@ -64,10 +65,11 @@ export default function Products() {
   const handleDeleteProduct = async (id: number) => {
     if (!confirm('Are you sure? This will also delete all keys for this product!')) return
     
-    await fetch(`/api/products/${id}`, {
+    const res = await fetch(`/api/products/${id}`, {
       method: 'DELETE',
       headers: { 'Authorization': `Bearer ${localStorage.getItem('auth_token')}` }
     })
+    await waitForJob(res)
     
     fetchProducts()
   }
@@ -0,0 +1,86 @@
+"""list_keys and get_keys_counts_by_product cost the same number of queries for 1 or many products"""
+import asyncio
+import pytest
+
+from bot.models import Product, ProductKey
+from bot.services.product_service import ProductService
+
+
+KEYS_PER_PRODUCT = 6
+
+
+async def _seed(session, products: int, archived: int = 0):
+    for i in range(products):
+        product = Product(name=f"Product {i}", archived_keys_count=archived)
+        session.add(product)
+        await session.flush()
+        session.add_all([
+            ProductKey(
+                product_id=product.id,
+                key_value=f"KEY-{i}-{n}",
+                duration="7 Days",
+                duration_days=7,
+                is_used=n % 3 == 0
+            )
+            for n in range(KEYS_PER_PRODUCT)
+        ])
+    # Stay in the seeding transaction, so connection setup doesn't land in the measured call
+    await session.flush()
+
+
+def _measure(database, products: int, call, archived: int = 0):
+    """Seed `products` products, then return (statements issued by call, its result)"""
+    async def scenario():
+        async with database() as (session_factory, counter):
+            async with session_factory() as session:
+                await _seed(session, products, archived)
+                counter.count = 0
+                result = await call(ProductService(session))
+                return counter.count, result
+    
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("products", [1, 25])
+def test_list_keys_is_one_query(database, products):
+    count, page = _measure(database, products, lambda service: service.list_keys(limit=200))
+    
+    assert count == 1
+    assert len(page.items) == products * KEYS_PER_PRODUCT
+    assert {item.product_name for item in page.items} == {f"Product {i}" for i in range(products)}
+
+
+@pytest.mark.parametrize("products", [1, 25])
+def test_list_keys_with_filters_is_one_query(database, products):
+    count, page = _measure(database, products, lambda service: service.list_keys(status="available", limit=200))
+    
+    assert count == 1
+    assert len(page.items) == products * (KEYS_PER_PRODUCT - KEYS_PER_PRODUCT // 3)
+
+
+@pytest.mark.parametrize("products", [1, 25])
+def test_keys_counts_by_product_is_one_query(database, products):
+    count, counts = _measure(database, products, lambda service: service.get_keys_counts_by_product())
+    
+    assert count == 1
+    assert len(counts) == products
+    for product_counts in counts.values():
+        assert product_counts == {
+            "total": KEYS_PER_PRODUCT,
+            "used": KEYS_PER_PRODUCT // 3,
+            "reserved": 0,
+            "available": KEYS_PER_PRODUCT - KEYS_PER_PRODUCT // 3,
+        }
+
+
+def test_keys_counts_include_archived_keys(database):
+    count, counts = _measure(database, 3, lambda service: service.get_keys_counts_by_product(), archived=4)
+    
+    assert count == 1
+    for product_counts in counts.values():
+        assert product_counts["total"] == KEYS_PER_PRODUCT + 4
+        assert product_counts["used"] == KEYS_PER_PRODUCT // 3 + 4
+    
+    count, totals = _measure(database, 3, lambda service: service.get_keys_count(), archived=4)
+    assert count == 1
+    assert totals["total"] == 3 * (KEYS_PER_PRODUCT + 4)
@@ -5,13 +5,21 @@ import json
 import hashlib
 import secrets
 from datetime import datetime, timedelta
-from bot.main import main as bot_main
+import signal
+from bot.main import main as bot_main, setup_webhook
+from bot.sharding import setup_sharded_webhook
+from bot.config import config
 from bot.database import async_session
 from bot.services.user_service import UserService
 from bot.services.admin_service import AdminService
 from bot.services.product_service import ProductService
-from bot.services.order_service import OrderService
 from bot.services.seller_service import SellerService
+from bot.services.sales_service import SalesService
+from bot.services.metrics import metrics
+from bot.services.stats_service import stats_service
+from bot.services.jobs import job_manager, delete_keys_work, delete_product_work
+from bot.utils.pagination import clamp_limit
+from bot.utils.durations import parse_duration
 from loguru import logger
 
 WEB_USERS_FILE = "web_users.json"
@@ -90,74 +98,83 @@ async def get_stats(request):
     if not verify_token(request):
         return web.json_response({"error": "Unauthorized"}, status=401)
     
+    snapshot = await stats_service.get_snapshot(refresh=request.query.get("refresh") == "1")
+    return web.json_response(snapshot)
+
+async def get_sales(request):
+    if not verify_token(request):
+        return web.json_response({"error": "Unauthorized"}, status=401)
+    
+    try:
+        days = int(request.query.get("days") or 30)
+        product_id = int(request.query.get("product_id") or 0) or None
+    except ValueError:
+        return web.json_response({"error": "Invalid days or product_id"}, status=400)
+    granularity = request.query.get("granularity", "day")
+    
     async with async_session() as session:
-        user_service = UserService(session)
-        admin_service = AdminService(session)
-        product_service = ProductService(session)
-        order_service = OrderService(session)
-        seller_service = SellerService(session)
-        
-        all_users = await user_service.get_all_users()
-        premium_users = [u for u in all_users if u.is_premium]
-        keys_data = await product_service.get_keys_count()
-        products = await product_service.get_all_products(active_only=False)
-        admins = await admin_service.get_all_admins()
-        sellers = await seller_service.get_all_sellers(active_only=False)
-        total_orders = await order_service.get_orders_count()
-        total_revenue = await order_service.get_total_revenue()
+        sales_service = SalesService(session)
+        series = await sales_service.get_series(days, granularity, product_id)
+        breakdown = await sales_service.get_breakdown(days, product_id)
         
         return web.json_response({
-            "total_users": len(all_users),
-            "premium_users": len(premium_users),
-            "total_keys": keys_data["total"],
-            "available_keys": keys_data["available"],
-            "used_keys": keys_data["used"],
-            "total_products": len(products),
-            "total_admins": len(admins),
-            "total_sellers": len(sellers),
-            "total_orders": total_orders,
-            "total_revenue": total_revenue
+            "series": series,
+            "products": breakdown,
+            "total_orders": sum(p["orders"] for p in series),
+            "total_revenue": round(sum(p["revenue"] for p in series), 2)
         })
 
+async def get_metrics(request):
+    if not verify_token(request):
+        return web.json_response({"error": "Unauthorized"}, status=401)
+    
+    return web.json_response(metrics.snapshot())
+
+async def get_workers(request):
+    if not verify_token(request):
+        return web.json_response({"error": "Unauthorized"}, status=401)
+    
+    router = request.app.get("shard_router")
+    if router is None:
+        return web.json_response({"mode": "single", "workers": []})
+    return web.json_response({"mode": "sharded", "workers": await router.health()})
+
 async def get_keys(request):
     if not verify_token(request):
         return web.json_response({"error": "Unauthorized"}, status=401)
     
     product_id = request.query.get("product_id")
+    duration = parse_duration(request.query.get("duration", ""))
     
     async with async_session() as session:
         product_service = ProductService(session)
+        page = await product_service.list_keys(
+            product_id=int(product_id) if product_id else None,
+            status=request.query.get("status"),
+            duration_days=duration[0] if duration else None,
+            cursor=request.query.get("cursor"),
+            limit=clamp_limit(request.query.get("limit"), default=100)
+        )
         
-        if product_id:
-            keys = await product_service.get_keys_for_product(int(product_id))
-            product = await product_service.get_product(int(product_id))
-            keys_data = [
-                {
-                    "id": k.id,
-                    "product_name": product.name if product else "Unknown",
-                    "key_value": k.key_value,
-                    "duration": k.duration,
-                    "is_used": k.is_used,
-                    "created_at": k.created_at.isoformat() if k.created_at else None
-                }
-                for k in keys[:100]
-            ]
-        else:
-            products = await product_service.get_all_products(active_only=False)
-            keys_data = []
-            for p in products:
-                keys = await product_service.get_keys_for_product(p.id)
-                for k in keys[:50]:
-                    keys_data.append({
-                        "id": k.id,
-                        "product_name": p.name,
-                        "key_value": k.key_value,
-                        "duration": k.duration,
-                        "is_used": k.is_used,
-                        "created_at": k.created_at.isoformat() if k.created_at else None
-                    })
+        keys_data = [
+            {
+                "id": k.id,
+                "product_id": k.product_id,
+                "product_name": k.product_name,
+                "key_value": k.key_value,
+                "duration": k.duration,
+                "is_used": k.is_used,
+                "reserved_until": k.reserved_until.isoformat() if k.reserved_until else None,
+                "created_at": k.created_at.isoformat() if k.created_at else None
+            }
+            for k in page.items
+        ]
         
-        return web.json_response({"keys": keys_data[:200]})
+        return web.json_response({
+            "keys": keys_data,
+            "next_cursor": page.next_cursor,
+            "prev_cursor": page.prev_cursor
+        })
 
 async def add_keys_bulk(request):
     if not verify_token(request):
@@ -174,8 +191,8 @@ async def add_keys_bulk(request):
             if not product:
                 return web.json_response({"error": "Product not found"}, status=404)
             
-            valid_durations = {p.duration for p in product.prices}
-            added = 0
+            valid_durations = {p.duration_days: p.duration for p in product.prices}
+            new_keys = []
             
             for line in keys_text.strip().split("\n"):
                 line = line.strip()
@@ -185,27 +202,46 @@ async def add_keys_bulk(request):
                 if len(parts) != 2:
                     continue
                 duration_code, key_value = parts
-                duration = parse_duration_simple(duration_code)
-                if duration and duration in valid_durations:
-                    await product_service.add_key(product_id, key_value.strip(), duration)
-                    added += 1
+                parsed = parse_duration(duration_code)
+                if parsed and parsed[0] in valid_durations:
+                    new_keys.append((key_value.strip(), parsed[0], valid_durations[parsed[0]]))
             
-            return web.json_response({"success": True, "added": added})
+            batch = await product_service.add_keys_batch(product_id, new_keys, source="web")
+            return web.json_response({"success": True, "added": len(new_keys), "batch_id": batch.id if batch else None})
     except Exception as e:
         logger.error(f"Add keys error: {e}")
         return web.json_response({"error": str(e)}, status=500)
 
-def parse_duration_simple(code):
-    import re
-    match = re.match(r'^(\d+)(d|m)$', code.lower().strip())
-    if match:
-        num = int(match.group(1))
-        unit = match.group(2)
-        if unit == 'd':
-            return f"{num} Day{'s' if num > 1 else ''}"
-        else:
-            return f"{num} Month{'s' if num > 1 else ''}"
-    return None
+async def get_key_batches(request):
+    if not verify_token(request):
+        return web.json_response({"error": "Unauthorized"}, status=401)
+    
+    try:
+        product_id = int(request.query.get("product_id", ""))
+    except ValueError:
+        return web.json_response({"error": "product_id is required"}, status=400)
+    limit = clamp_limit(request.query.get("limit"), default=10)
+    
+    async with async_session() as session:
+        product_service = ProductService(session)
+        batches = await product_service.get_key_batches(product_id, limit=limit)
+        for b in batches:
+            b["created_at"] = b["created_at"].isoformat()
+        return web.json_response({"batches": batches})
+
+async def delete_key_batch(request):
+    if not verify_token(request):
+        return web.json_response({"error": "Unauthorized"}, status=401)
+    
+    try:
+        batch_id = int(request.match_info["batch_id"])
+    except ValueError:
+        return web.json_response({"error": "Invalid batch id"}, status=400)
+    
+    async with async_session() as session:
+        product_service = ProductService(session)
+        deleted = await product_service.delete_key_batch(batch_id)
+        return web.json_response({"success": True, "deleted": deleted})
 
 async def delete_keys_bulk(request):
     if not verify_token(request):
@@ -217,11 +253,7 @@ async def delete_keys_bulk(request):
         
         async with async_session() as session:
             product_service = ProductService(session)
-            deleted = 0
-            for kid in key_ids:
-                if await product_service.remove_key(kid):
-                    deleted += 1
-            
+            deleted = await product_service.remove_keys([int(kid) for kid in key_ids])
             return web.json_response({"success": True, "deleted": deleted})
     except Exception as e:
         return web.json_response({"error": str(e)}, status=500)
@@ -232,10 +264,12 @@ async def delete_all_keys(request):
     
     product_id = int(request.match_info["product_id"])
     
-    async with async_session() as session:
-        product_service = ProductService(session)
-        deleted = await product_service.delete_all_keys(product_id)
-        return web.json_response({"success": True, "deleted": deleted})
+    job = job_manager.submit(
+        "delete_keys",
+        f"Delete keys of product {product_id}",
+        delete_keys_work(product_id)
+    )
+    return web.json_response({"success": True, "job_id": job.id}, status=202)
 
 async def delete_claimed_keys(request):
     if not verify_token(request):
@@ -243,10 +277,12 @@ async def delete_claimed_keys(request):
     
     product_id = int(request.match_info["product_id"])
     
-    async with async_session() as session:
-        product_service = ProductService(session)
-        deleted = await product_service.delete_claimed_keys(product_id)
-        return web.json_response({"success": True, "deleted": deleted})
+    job = job_manager.submit(
+        "delete_keys",
+        f"Delete claimed keys of product {product_id}",
+        delete_keys_work(product_id, claimed_only=True)
+    )
+    return web.json_response({"success": True, "job_id": job.id}, status=202)
 
 async def get_products(request):
     if not verify_token(request):
@@ -256,9 +292,11 @@ async def get_products(request):
         product_service = ProductService(session)
         products = await product_service.get_all_products(active_only=False)
         
+        counts = await product_service.get_keys_counts_by_product()
+        
         products_data = []
         for p in products:
-            keys_data = await product_service.get_keys_count(p.id)
+            keys_data = counts.get(p.id, {"total": 0, "available": 0})
             products_data.append({
                 "id": p.id,
                 "name": p.name,
@@ -306,8 +344,28 @@ async def delete_product(request):
     
     async with async_session() as session:
         product_service = ProductService(session)
-        await product_service.delete_product(product_id)
-        return web.json_response({"success": True})
+        if not await product_service.get_product(product_id):
+            return web.json_response({"error": "Product not found"}, status=404)
+        if await product_service.product_has_orders(product_id):
+            return web.json_response({"error": "Product has orders; deactivate it instead"}, status=409)
+    
+    job = job_manager.submit("delete_product", f"Delete product {product_id}", delete_product_work(product_id))
+    return web.json_response({"success": True, "job_id": job.id}, status=202)
+
+async def get_jobs(request):
+    if not verify_token(request):
+        return web.json_response({"error": "Unauthorized"}, status=401)
+    
+    return web.json_response([job.to_dict() for job in job_manager.recent()])
+
+async def get_job(request):
+    if not verify_token(request):
+        return web.json_response({"error": "Unauthorized"}, status=401)
+    
+    job = job_manager.get(request.match_info["job_id"])
+    if not job:
+        return web.json_response({"error": "Job not found"}, status=404)
+    return web.json_response(job.to_dict())
 
 async def get_admins(request):
     if not verify_token(request):
@@ -315,14 +373,18 @@ async def get_admins(request):
     
     from bot.config import config
     
+    cursor = request.query.get("cursor")
+    limit = clamp_limit(request.query.get("limit"), default=100)
+    
     async with async_session() as session:
         admin_service = AdminService(session)
         user_service = UserService(session)
-        admins = await admin_service.get_all_admins()
+        page = await admin_service.get_admins_page(cursor=cursor, limit=limit)
+        users = await user_service.get_users_by_telegram_ids([a.telegram_id for a in page.items])
         
         admins_data = []
-        for a in admins:
-            user = await user_service.get_user_by_telegram_id(a.telegram_id)
+        for a in page.items:
+            user = users.get(a.telegram_id)
             admins_data.append({
                 "id": a.id,
                 "telegram_id": a.telegram_id,
@@ -331,7 +393,11 @@ async def get_admins(request):
                 "is_root": a.telegram_id == config.bot.root_admin_id
             })
         
-        return web.json_response({"admins": admins_data})
+        return web.json_response({
+            "admins": admins_data,
+            "next_cursor": page.next_cursor,
+            "prev_cursor": page.prev_cursor
+        })
 
 async def add_admin(request):
     if not verify_token(request):
@@ -359,23 +425,53 @@ async def remove_admin(request):
         await admin_service.remove_admin_by_id(admin_id)
         return web.json_response({"success": True})
 
+async def search_users(request):
+    if not verify_token(request):
+        return web.json_response({"error": "Unauthorized"}, status=401)
+    
+    query = request.query.get("q", "")
+    limit = clamp_limit(request.query.get("limit"), default=20)
+    
+    async with async_session() as session:
+        user_service = UserService(session)
+        users = await user_service.search_users(query, limit=limit)
+        
+        users_data = [{
+            "id": u.id,
+            "telegram_id": u.telegram_id,
+            "username": u.username,
+            "first_name": u.first_name,
+            "last_name": u.last_name,
+            "balance": float(u.balance),
+            "status": u.status.value,
+            "is_banned": u.is_banned
+        } for u in users]
+        
+        return web.json_response({"users": users_data})
+
 async def get_premium_users(request):
     if not verify_token(request):
         return web.json_response({"error": "Unauthorized"}, status=401)
     
+    cursor = request.query.get("cursor")
+    limit = clamp_limit(request.query.get("limit"), default=100)
+    
     async with async_session() as session:
         user_service = UserService(session)
-        users = await user_service.get_all_users()
-        premium = [u for u in users if u.is_premium]
+        page = await user_service.get_users_page(cursor=cursor, limit=limit, premium_only=True)
         
         users_data = [{
             "id": u.id,
             "telegram_id": u.telegram_id,
             "username": u.username,
             "first_name": u.first_name
-        } for u in premium]
+        } for u in page.items]
         
-        return web.json_response({"users": users_data})
+        return web.json_response({
+            "users": users_data,
+            "next_cursor": page.next_cursor,
+            "prev_cursor": page.prev_cursor
+        })
 
 async def add_premium_user(request):
     if not verify_token(request):
@@ -413,9 +509,8 @@ async def bulk_remove_premium(request):
         
         async with async_session() as session:
             user_service = UserService(session)
-            for uid in user_ids:
-                await user_service.remove_premium_by_id(uid)
-            return web.json_response({"success": True})
+            removed = await user_service.remove_premium_by_ids([int(uid) for uid in user_ids])
+            return web.json_response({"success": True, "removed": removed})
     except Exception as e:
         return web.json_response({"error": str(e)}, status=500)
 
@@ -533,25 +628,33 @@ async def serve_static(request):
         return web.FileResponse(dist_path)
     return web.FileResponse(os.path.join(os.path.dirname(__file__), 'client', 'dist', 'index.html'))
 
-async def start_web_server():
+def create_app() -> web.Application:
     app = web.Application()
     
     app.router.add_get('/health', health_check)
     app.router.add_post('/api/auth/login', auth_login)
     app.router.add_get('/api/auth/verify', auth_verify)
     app.router.add_get('/api/stats', get_stats)
+    app.router.add_get('/api/sales', get_sales)
+    app.router.add_get('/api/metrics', get_metrics)
+    app.router.add_get('/api/workers', get_workers)
     app.router.add_get('/api/keys', get_keys)
     app.router.add_post('/api/keys/bulk', add_keys_bulk)
     app.router.add_post('/api/keys/bulk-delete', delete_keys_bulk)
+    app.router.add_get('/api/keys/batches', get_key_batches)
+    app.router.add_post('/api/keys/batches/{batch_id}/delete', delete_key_batch)
     app.router.add_delete('/api/keys/delete-all/{product_id}', delete_all_keys)
     app.router.add_delete('/api/keys/delete-claimed/{product_id}', delete_claimed_keys)
     app.router.add_get('/api/products', get_products)
     app.router.add_post('/api/products', create_product)
     app.router.add_post('/api/products/{product_id}/toggle', toggle_product)
     app.router.add_delete('/api/products/{product_id}', delete_product)
+    app.router.add_get('/api/jobs', get_jobs)
+    app.router.add_get('/api/jobs/{job_id}', get_job)
     app.router.add_get('/api/admins', get_admins)
     app.router.add_post('/api/admins', add_admin)
     app.router.add_delete('/api/admins/{admin_id}', remove_admin)
+    app.router.add_get('/api/users/search', search_users)
     app.router.add_get('/api/premium-users', get_premium_users)
     app.router.add_post('/api/premium-users', add_premium_user)
     app.router.add_delete('/api/premium-users/{user_id}', remove_premium_user)
@@ -564,20 +667,45 @@ async def start_web_server():
     app.router.add_post('/api/web-users', add_web_user)
     app.router.add_delete('/api/web-users/{user_id}', remove_web_user)
     
+    if config.webhook.enabled and config.sharding.workers > 1:
+        setup_sharded_webhook(app)
+    elif config.webhook.enabled:
+        setup_webhook(app)
+    
     dist_assets = os.path.join(os.path.dirname(__file__), 'client', 'dist', 'assets')
     if os.path.exists(dist_assets):
         app.router.add_static('/assets', dist_assets)
     
     app.router.add_get('/{path:.*}', serve_static)
     app.router.add_get('/', index_page)
-    
-    runner = web.AppRunner(app)
+    return app
+
+async def start_web_server(app: web.Application = None):
+    runner = web.AppRunner(app or create_app())
     await runner.setup()
     site = web.TCPSite(runner, '0.0.0.0', 5000)
     await site.start()
     logger.info("Web server started on http://0.0.0.0:5000")
+    return runner
 
 async def main():
+    if config.webhook.enabled:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        
+        runner = await start_web_server()
+        try:
+            await stop.wait()
+        finally:
+            # Runs the shutdown hooks, which drain in-flight updates
+            await runner.cleanup()
+        return
+    
+    if config.sharding.workers > 1:
+        logger.warning("⚠️ BOT_WORKERS needs BOT_MODE=webhook, running a single polling process")
+    
     await asyncio.gather(
         start_web_server(),
         bot_main()